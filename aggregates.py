@@ -0,0 +1,160 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+# Итоги по дням и месяцам в разрезе типа и категории.
+# Операции без категории учитываются с category_id = 0, суммы - в копейках.
+AGGREGATE_TABLES = {
+    'daily_totals': ('day', '{row}.date'),
+    'monthly_totals': ('month', 'substr({row}.date, 1, 7)'),
+}
+
+
+def create_aggregates(cursor: sqlite3.Cursor):
+    """Таблицы итогов, триггеры на transactions и начальное заполнение"""
+    for table, (period, _) in AGGREGATE_TABLES.items():
+        cursor.execute(f'''
+                       CREATE TABLE IF NOT EXISTS {table}
+                       (
+                           {period} TEXT NOT NULL,
+                           type TEXT NOT NULL,
+                           category_id INTEGER NOT NULL DEFAULT 0,
+                           total INTEGER NOT NULL DEFAULT 0,
+                           count INTEGER NOT NULL DEFAULT 0,
+                           PRIMARY KEY ({period}, type, category_id)
+                       ) WITHOUT ROWID
+                       ''')
+
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_transactions_totals_insert
+                       AFTER INSERT ON transactions
+                   BEGIN
+                       {_add_statements('NEW', 1)}
+                   END
+                   ''')
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_transactions_totals_delete
+                       AFTER DELETE ON transactions
+                   BEGIN
+                       {_add_statements('OLD', -1)}
+                   END
+                   ''')
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_transactions_totals_update
+                       AFTER UPDATE OF date, amount, type, category_id ON transactions
+                   BEGIN
+                       {_add_statements('OLD', -1)}
+                       {_add_statements('NEW', 1)}
+                   END
+                   ''')
+
+    rebuild_aggregates(cursor)
+
+
+def rebuild_aggregates(cursor: sqlite3.Cursor):
+    """Пересчет итогов по таблице transactions"""
+    cursor.execute("DELETE FROM daily_totals")
+    cursor.execute("DELETE FROM monthly_totals")
+    cursor.execute('''
+                   INSERT INTO daily_totals (day, type, category_id, total, count)
+                   SELECT date, type, IFNULL(category_id, 0), SUM(amount), COUNT(*)
+                   FROM transactions
+                   GROUP BY date, type, IFNULL(category_id, 0)
+                   ''')
+    cursor.execute('''
+                   INSERT INTO monthly_totals (month, type, category_id, total, count)
+                   SELECT substr(day, 1, 7), type, category_id, SUM(total), SUM(count)
+                   FROM daily_totals
+                   GROUP BY substr(day, 1, 7), type, category_id
+                   ''')
+
+
+def _add_statements(row: str, sign: int) -> str:
+    """Операторы триггера, добавляющие строку row со знаком sign"""
+    statements = []
+    for table, (period, expression) in AGGREGATE_TABLES.items():
+        value = expression.format(row=row)
+        statements.append(f'''
+                       INSERT INTO {table} ({period}, type, category_id, total, count)
+                       VALUES ({value}, {row}.type, IFNULL({row}.category_id, 0),
+                               {sign} * {row}.amount, {sign})
+                       ON CONFLICT ({period}, type, category_id) DO UPDATE
+                           SET total = total + excluded.total,
+                               count = count + excluded.count;''')
+    return ''.join(statements)
+
+
+def split_range(start_date: Optional[date], end_date: Optional[date]
+                ) -> Tuple[Optional[Tuple[Optional[str], Optional[str]]], List[Tuple[str, str]]]:
+    """Разбиение диапазона на целые месяцы и неполные крайние дни
+
+    Возвращает диапазон месяцев 'ГГГГ-ММ' (или None) и список диапазонов дней.
+    Граница None означает отсутствие ограничения с этой стороны.
+    """
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+
+    if start_date and end_date and start_date > end_date:
+        return None, []
+
+    # Первый целый месяц и день сразу после последнего целого месяца
+    first_full = None
+    if start_date:
+        first_full = start_date if start_date.day == 1 else _next_month(start_date)
+
+    after_full = None
+    if end_date:
+        following = end_date + timedelta(days=1)
+        after_full = following if following.day == 1 else end_date.replace(day=1)
+
+    if first_full and after_full and first_full >= after_full:
+        return None, [(start_date.isoformat(), end_date.isoformat())]
+
+    months = (first_full.strftime('%Y-%m') if first_full else None,
+              (after_full - timedelta(days=1)).strftime('%Y-%m') if after_full else None)
+
+    days = []
+    if start_date and start_date < first_full:
+        days.append((start_date.isoformat(), (first_full - timedelta(days=1)).isoformat()))
+    if end_date and after_full <= end_date:
+        days.append((after_full.isoformat(), end_date.isoformat()))
+
+    return months, days
+
+
+def totals_source(start_date: Optional[date], end_date: Optional[date],
+                  columns: str = "type, category_id, total, count",
+                  schema: str = 'main') -> Tuple[str, List]:
+    """Подзапрос итогов за диапазон: целые месяцы плюс крайние дни
+
+    schema - база с таблицами итогов (рабочая или подключенный архив).
+    """
+    months, days = split_range(start_date, end_date)
+    parts = []
+    params = []
+
+    if months:
+        query = f"SELECT {columns} FROM {schema}.monthly_totals WHERE 1=1"
+        if months[0]:
+            query += " AND month >= ?"
+            params.append(months[0])
+        if months[1]:
+            query += " AND month <= ?"
+            params.append(months[1])
+        parts.append(query)
+
+    for first_day, last_day in days:
+        parts.append(f"SELECT {columns} FROM {schema}.daily_totals WHERE day >= ? AND day <= ?")
+        params.extend([first_day, last_day])
+
+    if not parts:
+        # Пустой диапазон
+        parts.append(f"SELECT {columns} FROM {schema}.daily_totals WHERE 0")
+
+    return " UNION ALL ".join(parts), params
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
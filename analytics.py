@@ -0,0 +1,227 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from money import from_minor, to_minor
+
+try:
+    import numpy as np
+except ImportError:  # numpy нужен только для аналитики
+    np = None
+
+# Сколько строк читается из базы за один fetchmany
+FETCH_SIZE = 50000
+
+# 1970-01-01 - четверг; (day + 3) % 7 дает 0 для понедельника
+_WEEKDAY_SHIFT = 3
+
+GROUP_KEYS = ('category', 'month', 'weekday')
+
+# Столбцы снимка в порядке Columns.FIELDS
+_SNAPSHOT_COLUMNS = '''
+                    id,
+                    CAST(julianday(date) - 2440587.5 AS INTEGER),
+                    amount,
+                    IFNULL(category_id, 0),
+                    type = 'income'
+                    '''
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Для аналитики нужен numpy: pip install numpy")
+
+
+def _as_date(value: Optional[date]) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _to_day(value: Optional[date]) -> Optional[int]:
+    """Дата -> номер дня от 1970-01-01"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - date(1970, 1, 1)).days
+
+
+class Columns:
+    """Транзакции по столбцам
+
+    id, day (дни от 1970-01-01), amount (копейки), category_id (0 - без
+    категории) и income (True для доходов) - массивы одной длины.
+    """
+
+    FIELDS = ('id', 'day', 'amount', 'category_id', 'income')
+
+    def __init__(self, id, day, amount, category_id, income):
+        self.id = id
+        self.day = day
+        self.amount = amount
+        self.category_id = category_id
+        self.income = income
+
+    @classmethod
+    def empty(cls) -> 'Columns':
+        return cls.from_rows(np.empty((0, 5), dtype=np.int64))
+
+    @classmethod
+    def from_rows(cls, rows) -> 'Columns':
+        """Столбцы из массива строк (id, day, amount, category_id, income)"""
+        return cls(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4].astype(bool))
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def select(self, mask) -> 'Columns':
+        return Columns(*(getattr(self, field)[mask] for field in self.FIELDS))
+
+    def extend(self, other: 'Columns') -> 'Columns':
+        return Columns(*(np.concatenate((getattr(self, field), getattr(other, field)))
+                         for field in self.FIELDS))
+
+    @property
+    def signed(self):
+        """Суммы со знаком: доходы положительные, расходы отрицательные"""
+        return np.where(self.income, self.amount, -self.amount)
+
+
+class LedgerAnalytics:
+    """Отчеты по транзакциям на столбцах NumPy
+
+    В памяти хранится снимок последнего запрошенного диапазона дат, вместе
+    с архивами закрытых лет (model.iter_transaction_columns); запросы
+    внутри него снимок не перечитывают. После добавления операций
+    (model.inserts) дочитываются только строки с id больше последнего
+    загруженного, после любых других изменений (model.revision: удаление,
+    удаление категории, архивация, запись из другого соединения) снимок
+    загружается заново. Суммы - в копейках, группировка - через np.unique
+    и np.bincount.
+    """
+
+    def __init__(self, model, fetch_size: int = FETCH_SIZE):
+        _require_numpy()
+        self.model = model
+        self.fetch_size = fetch_size
+        self._snapshot = None
+        self._range = (None, None)
+        self._inserts = self._revision = None
+        self.reloads = 0
+
+    def snapshot(self, start_date: Optional[date] = None,
+                 end_date: Optional[date] = None) -> Columns:
+        """Актуальный снимок, включающий диапазон дат (может быть шире)"""
+        self.model.check_data_version()
+        inserts, revision = self.model.inserts, self.model.revision
+        wanted = (_as_date(start_date), _as_date(end_date))
+
+        if (self._snapshot is None or revision != self._revision
+                or not self._covers(*wanted)):
+            self._range = wanted
+            self._snapshot = self._load(0)
+            self.reloads += 1
+        elif inserts != self._inserts:
+            last_id = int(self._snapshot.id.max()) if len(self._snapshot) else 0
+            added = self._load(last_id)
+            if len(added):
+                self._snapshot = self._snapshot.extend(added)
+
+        self._inserts, self._revision = inserts, revision
+        return self._snapshot
+
+    def _covers(self, start: Optional[date], end: Optional[date]) -> bool:
+        """Входит ли диапазон в загруженный"""
+        first, last = self._range
+        return ((first is None or (start is not None and start >= first))
+                and (last is None or (end is not None and end <= last)))
+
+    def columns(self, start_date: Optional[date] = None,
+                end_date: Optional[date] = None) -> Columns:
+        """Транзакции за диапазон дат"""
+        snapshot = self.snapshot(start_date, end_date)
+        mask = np.ones(len(snapshot), dtype=bool)
+        if start_date is not None:
+            mask &= snapshot.day >= _to_day(start_date)
+        if end_date is not None:
+            mask &= snapshot.day <= _to_day(end_date)
+        return snapshot.select(mask)
+
+    def group_by(self, key: str, start_date: Optional[date] = None,
+                 end_date: Optional[date] = None) -> Dict[str, object]:
+        """Итоги по категориям, месяцам или дням недели
+
+        Возвращает массивы одной длины: key (id категории, месяц
+        datetime64[M] или день недели 0-6 с понедельника), income,
+        expense (копейки) и count.
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Неизвестная группировка: {key}")
+
+        data = self.columns(start_date, end_date)
+        if key == 'category':
+            values = data.category_id
+        elif key == 'month':
+            values = data.day.astype('datetime64[D]').astype('datetime64[M]')
+        else:
+            values = (data.day + _WEEKDAY_SHIFT) % 7
+
+        keys, inverse = np.unique(values, return_inverse=True)
+        size = len(keys)
+        return {
+            'key': keys,
+            'income': self._sum(inverse, np.where(data.income, data.amount, 0), size),
+            'expense': self._sum(inverse, np.where(data.income, 0, data.amount), size),
+            'count': np.bincount(inverse, minlength=size),
+        }
+
+    def top_categories(self, n: int = 5, type_: str = 'expense',
+                       start_date: Optional[date] = None,
+                       end_date: Optional[date] = None) -> List[Tuple[Optional[int], str, Decimal]]:
+        """N категорий с наибольшей суммой: (id, название, сумма в рублях)"""
+        groups = self.group_by('category', start_date, end_date)
+        totals = groups[type_]
+        order = np.argsort(-totals, kind='stable')[:n]
+
+        result = []
+        for index in order:
+            if totals[index] == 0:
+                break
+            category_id = int(groups['key'][index]) or None
+            result.append((category_id, self.model.get_category_name(category_id),
+                           from_minor(int(totals[index]))))
+        return result
+
+    def running_balance(self, start_date: Optional[date] = None,
+                        end_date: Optional[date] = None):
+        """Баланс на конец каждого дня с операциями
+
+        Возвращает даты (datetime64[D]) и баланс в копейках с учетом
+        всех операций до start_date (по итогам модели, без загрузки строк).
+        """
+        opening = 0
+        if start_date is not None:
+            stats = self.model.get_statistics(None, start_date - timedelta(days=1))
+            opening = to_minor(stats['balance'])
+
+        data = self.columns(start_date, end_date)
+        days, inverse = np.unique(data.day, return_inverse=True)
+        daily = self._sum(inverse, data.signed, len(days))
+        return days.astype('datetime64[D]'), opening + np.cumsum(daily)
+
+    def _load(self, after_id: int) -> Columns:
+        """Строки загруженного диапазона с id больше after_id"""
+        chunks = [np.array(rows, dtype=np.int64)
+                  for rows in self.model.iter_transaction_columns(
+                      _SNAPSHOT_COLUMNS, *self._range, after_id=after_id,
+                      chunk_size=self.fetch_size)]
+
+        if not chunks:
+            return Columns.empty()
+        return Columns.from_rows(np.concatenate(chunks))
+
+    @staticmethod
+    def _sum(inverse, weights, size: int):
+        # bincount суммирует во float64: точно для сумм до 2**53 копеек
+        return np.rint(np.bincount(inverse, weights=weights, minlength=size)).astype(np.int64)
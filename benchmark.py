@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from database import Database
+from model import FinanceModel
+
+# Размеры журнала по умолчанию; 1000000 и 10000000 - через --sizes
+DEFAULT_SIZES = (10000, 100000)
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 42
+
+# Журнал заканчивается фиксированной датой, чтобы прогоны были сравнимы
+END_DATE = date(2024, 12, 31)
+YEARS = 5
+
+# Полное заполнение Treeview выше этого числа строк не измеряется
+TREEVIEW_LIMIT = 100000
+
+# Предельное ожидание первых данных при замере запуска, с
+STARTUP_TIMEOUT = 60.0
+
+# Во сколько раз медиана может вырасти, прежде чем это считается регрессией
+REGRESSION_THRESHOLD = 1.2
+
+# Профиль операций: название, тип, вес, типичная сумма, разброс,
+# множители по месяцам (1-12) и шаблоны описаний
+PROFILE = [
+    ('Зарплата', 'income', 2, 85000, 0.05, {12: 1.5}, ("Зарплата за {month}", "Аванс")),
+    ('Фриланс', 'income', 1, 15000, 0.6, {}, ("Оплата заказа №{number}", "Проект {number}")),
+    ('Прочее', 'income', 1, 3000, 0.8, {}, ("Возврат", "Кэшбэк", "Перевод от друга")),
+    ('Продукты', 'expense', 30, 1200, 0.7, {12: 1.4, 1: 0.8},
+     ("Пятерочка", "Магнит", "Перекресток", "Рынок", "ВкусВилл")),
+    ('Транспорт', 'expense', 15, 350, 0.5, {7: 0.8, 8: 0.8},
+     ("Метро", "Такси", "Бензин", "Каршеринг")),
+    ('Жилье', 'expense', 2, 25000, 0.1, {1: 1.2, 2: 1.2, 12: 1.15},
+     ("Аренда", "Коммунальные услуги", "Интернет")),
+    ('Развлечения', 'expense', 8, 2000, 0.9, {6: 1.3, 7: 1.5, 8: 1.4, 12: 1.6},
+     ("Кино", "Кафе", "Концерт", "Подписка")),
+    ('Прочее', 'expense', 5, 800, 1.0, {}, ("Подарок", "Аптека", "Разное")),
+]
+
+MONTH_NAMES = ('январь', 'февраль', 'март', 'апрель', 'май', 'июнь', 'июль',
+               'август', 'сентябрь', 'октябрь', 'ноябрь', 'декабрь')
+
+
+def generate_transactions(count: int, seed: int = DEFAULT_SEED, years: int = YEARS,
+                          end_date: date = END_DATE) -> Iterator[Tuple]:
+    """Детерминированный генератор операций
+
+    Строки - (date, amount, category_name, description, type): даты
+    равномерно за years лет до end_date, суммы - нормальный разброс вокруг
+    типичной суммы категории с сезонными множителями, округленные до копеек.
+    """
+    rng = random.Random(seed)
+    weights = [entry[2] for entry in PROFILE]
+    first_day = end_date - timedelta(days=365 * years - 1)
+    span = (end_date - first_day).days + 1
+
+    for number in range(1, count + 1):
+        name, type_, _, base, spread, season, templates = rng.choices(PROFILE, weights)[0]
+        day = first_day + timedelta(days=rng.randrange(span))
+
+        amount = base * season.get(day.month, 1.0) * max(0.05, rng.gauss(1.0, spread))
+        description = rng.choice(templates).format(month=MONTH_NAMES[day.month - 1], number=number)
+        yield day.isoformat(), Decimal(f"{amount:.2f}"), name, description, type_
+
+
+def measure(func: Callable, repeat: int) -> Dict[str, float]:
+    """Время выполнения func: лучшее и медиана из repeat запусков"""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return {'best': min(runs), 'median': statistics.median(runs), 'repeat': repeat}
+
+
+class Target:
+    """Измеряемый класс доступа к данным и его отличия в API"""
+
+    def __init__(self, name: str, factory: Callable):
+        self.name = name
+        self.factory = factory
+
+    def category_ids(self, store) -> Dict[Tuple[str, str], int]:
+        return {(row[1], row[2]): row[0] for row in store.get_categories()}
+
+    def lookup_category(self, store, name: str, type_: str):
+        if isinstance(store, FinanceModel):
+            return store.get_category_id_by_name(name, type_)
+        return store.get_category_id_by_name(name)
+
+    def first_page(self, store, start_date, end_date):
+        if isinstance(store, FinanceModel):
+            return store.get_display_transactions_page(start_date, end_date)
+        return store.get_transactions_page(start_date, end_date)
+
+
+TARGETS = {
+    'model': Target('FinanceModel', FinanceModel),
+    'database': Target('Database', Database),
+}
+
+
+def bench_store(target: Target, size: int, seed: int, repeat: int,
+                workdir: str) -> List[Dict]:
+    """Замеры одного класса доступа к данным на журнале из size операций"""
+    path = os.path.join(workdir, f"{target.name.lower()}_{size}.db")
+    store = target.factory(path)
+    results = []
+
+    def record(name, timing, rows=None):
+        results.append(dict(timing, size=size, target=target.name, name=name, rows=rows))
+
+    try:
+        ids = target.category_ids(store)
+        rows = ((day, amount, ids.get((name, type_)), description, type_)
+                for day, amount, name, description, type_ in generate_transactions(size, seed))
+        record('insert', measure(lambda: store.add_transactions_bulk(rows), 1), size)
+
+        month_start, month_end = datetime(2024, 12, 1), datetime(2024, 12, 31)
+        year_start = datetime(2024, 1, 1)
+        clear_cache = getattr(store, 'cache', None)
+
+        record('fetch_month', measure(
+            lambda: store.get_transactions(month_start, month_end), repeat),
+            len(store.get_transactions(month_start, month_end)))
+        record('fetch_year', measure(
+            lambda: store.get_transactions(year_start, month_end), repeat))
+        record('first_page_year', measure(
+            lambda: target.first_page(store, year_start, month_end), repeat))
+
+        def uncached_statistics(start_date=None, end_date=None):
+            if clear_cache is not None:
+                clear_cache.clear()
+            return store.get_statistics(start_date, end_date)
+
+        record('statistics_all', measure(uncached_statistics, repeat))
+        record('statistics_month', measure(
+            lambda: uncached_statistics(month_start, month_end), repeat))
+
+        names = [(entry[0], entry[1]) for entry in PROFILE] * 1000
+        record('category_lookup', measure(
+            lambda: [store.get_category_name(target.lookup_category(store, name, type_))
+                     for name, type_ in names], repeat), len(names))
+    finally:
+        store.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+    return results
+
+
+def bench_treeview(size: int, seed: int, repeat: int, workdir: str) -> List[Dict]:
+    """Заполнение таблицы FinanceView в скрытом окне
+
+    Без дисплея (TclError) замер пропускается.
+    """
+    try:
+        import tkinter as tk
+        from view import FinanceView
+    except ImportError as e:
+        print(f"Treeview пропущен: {e}", file=sys.stderr)
+        return []
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Treeview пропущен: {e}", file=sys.stderr)
+        return []
+
+    path = os.path.join(workdir, f"treeview_{size}.db")
+    model = FinanceModel(path)
+    results = []
+    try:
+        root.withdraw()
+        view = FinanceView(root)
+        ids = TARGETS['model'].category_ids(model)
+        model.add_transactions_bulk(
+            (day, amount, ids.get((name, type_)), description, type_)
+            for day, amount, name, description, type_ in generate_transactions(size, seed))
+
+        rows = min(size, TREEVIEW_LIMIT)
+        display_rows, _ = model.get_display_transactions_page(limit=rows)
+
+        def full_load():
+            view.load_transactions(display_rows)
+            root.update_idletasks()
+
+        def virtual_load():
+            def fetch_rows(offset, count):
+                return model.get_display_transactions_page(limit=count, offset=offset)[0]
+
+            view.load_virtual(model.count_transactions(), fetch_rows)
+            root.update_idletasks()
+
+        results.append(dict(measure(full_load, repeat), size=size, target='FinanceView',
+                            name='treeview_full', rows=rows))
+        results.append(dict(measure(virtual_load, repeat), size=size, target='FinanceView',
+                            name='treeview_virtual', rows=size))
+    finally:
+        model.close()
+        root.destroy()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+    return results
+
+
+def bench_startup(size: int, seed: int, repeat: int, workdir: str) -> List[Dict]:
+    """Запуск приложения на журнале size строк: до первого кадра и первых данных
+
+    Окно скрыто, ожидание первых данных - не дольше STARTUP_TIMEOUT.
+    Без дисплея (TclError) замер пропускается.
+    """
+    try:
+        import tkinter as tk
+        from controller import FinanceController
+    except ImportError as e:
+        print(f"Запуск пропущен: {e}", file=sys.stderr)
+        return []
+
+    path = os.path.join(workdir, f"startup_{size}.db")
+    model = FinanceModel(path)
+    try:
+        ids = TARGETS['model'].category_ids(model)
+        model.add_transactions_bulk(
+            (day, amount, ids.get((name, type_)), description, type_)
+            for day, amount, name, description, type_ in generate_transactions(size, seed))
+    finally:
+        model.close()
+
+    frames, data = [], []
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            try:
+                root = tk.Tk()
+            except tk.TclError as e:
+                print(f"Запуск пропущен: {e}", file=sys.stderr)
+                return []
+
+            try:
+                root.withdraw()
+                app = FinanceController(root, path, started=started)
+                deadline = started + STARTUP_TIMEOUT
+                while app.first_data_ms is None and time.perf_counter() < deadline:
+                    root.update()
+                app.close()
+            finally:
+                root.destroy()
+
+            if app.first_frame_ms is not None and app.first_data_ms is not None:
+                frames.append(app.first_frame_ms / 1000)
+                data.append(app.first_data_ms / 1000)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+    if not frames:
+        return []
+    return [dict(best=min(runs), median=statistics.median(runs), repeat=len(runs),
+                 size=size, target='FinanceController', name=name, rows=size)
+            for name, runs in (('first_frame', frames), ('first_data', data))]
+
+
+def run(sizes=DEFAULT_SIZES, targets=tuple(TARGETS), seed: int = DEFAULT_SEED,
+        repeat: int = DEFAULT_REPEAT, gui: bool = True,
+        progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """Полный прогон: результаты и сведения об окружении в виде словаря для JSON"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for key in targets:
+                if progress:
+                    progress(f"{TARGETS[key].name}: {size}")
+                results.extend(bench_store(TARGETS[key], size, seed, repeat, workdir))
+            if gui:
+                if progress:
+                    progress(f"FinanceView: {size}")
+                results.extend(bench_treeview(size, seed, repeat, workdir))
+                results.extend(bench_startup(size, seed, repeat, workdir))
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict,
+            threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """Замеры, медиана которых выросла больше чем в threshold раз"""
+    def key(result):
+        return result['target'], result['name'], result['size']
+
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old and old['median'] > 0 and result['median'] / old['median'] > threshold:
+            regressions.append({'target': result['target'], 'name': result['name'],
+                                'size': result['size'], 'before': old['median'],
+                                'after': result['median'],
+                                'ratio': result['median'] / old['median']})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности на синтетическом журнале")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--no-gui', action='store_true', help="Без замеров Treeview и запуска окна")
+    parser.add_argument('--output', help="Файл для результатов JSON (по умолчанию stdout)")
+    parser.add_argument('--compare', help="JSON предыдущего прогона для сравнения")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.targets, args.seed, args.repeat, not args.no_gui,
+                 progress=lambda text: print(text, file=sys.stderr))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for item in regressions:
+            print(f"Регрессия: {item['target']}.{item['name']} ({item['size']}): "
+                  f"{item['before']:.4f} -> {item['after']:.4f} с (x{item['ratio']:.2f})",
+                  file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
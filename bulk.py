@@ -0,0 +1,89 @@
+import sqlite3
+from datetime import datetime
+from typing import Iterable, Optional, Set, Tuple
+
+from money import to_minor
+
+# Пакетная загрузка операций: общая для FinanceModel и Database, чтобы
+# правила проверки строк и запись пачками не расходились
+
+# Размер пакета executemany при массовой загрузке
+BULK_BATCH_SIZE = 1000
+
+INSERT_TRANSACTION_SQL = '''
+                         INSERT INTO transactions (date, amount, category_id, description, type)
+                         VALUES (?, ?, ?, ?, ?)
+                         '''
+
+
+def prepare_transaction_row(row, number: int) -> Tuple:
+    """Проверка и приведение строки к параметрам INSERT
+
+    Строка - кортеж (date, amount, category_id, description, type_) или
+    словарь с такими ключами; number - номер строки для сообщения об ошибке.
+    """
+    if isinstance(row, dict):
+        row = (row.get('date'), row.get('amount'), row.get('category_id'),
+               row.get('description'), row.get('type', row.get('type_')))
+
+    try:
+        date, amount, category_id, description, type_ = row
+    except (TypeError, ValueError):
+        raise ValueError(f"Строка {number}: ожидается 5 полей")
+
+    if isinstance(date, datetime):
+        date = date.strftime('%Y-%m-%d')
+    else:
+        try:
+            date = datetime.strptime(str(date), '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"Строка {number}: неверный формат даты")
+
+    try:
+        amount = to_minor(amount)
+    except ValueError:
+        raise ValueError(f"Строка {number}: неверная сумма")
+    if amount <= 0:
+        raise ValueError(f"Строка {number}: сумма должна быть положительной")
+
+    if type_ not in ('income', 'expense'):
+        raise ValueError(f"Строка {number}: неизвестный тип операции")
+
+    return date, amount, category_id, description or '', type_
+
+
+def insert_transactions(cursor: sqlite3.Cursor, rows: Iterable,
+                        batch_size: int = BULK_BATCH_SIZE,
+                        dates: Optional[Set[str]] = None) -> int:
+    """Добавление строк пачками executemany в одной транзакции БД
+
+    rows - любой итерируемый объект, в том числе генератор. Ошибка в любой
+    строке откатывает все. dates - множество, в которое добавляются даты
+    строк. Возвращает количество добавленных строк.
+    """
+    if batch_size <= 0:
+        raise ValueError("Размер пакета должен быть положительным")
+
+    count = 0
+    batch = []
+    cursor.execute("BEGIN")
+    try:
+        for number, row in enumerate(rows, 1):
+            batch.append(prepare_transaction_row(row, number))
+            if dates is not None:
+                dates.add(batch[-1][0])
+            if len(batch) >= batch_size:
+                cursor.executemany(INSERT_TRANSACTION_SQL, batch)
+                count += len(batch)
+                batch.clear()
+
+        if batch:
+            cursor.executemany(INSERT_TRANSACTION_SQL, batch)
+            count += len(batch)
+
+        cursor.connection.commit()
+    except Exception:
+        cursor.connection.rollback()
+        raise
+
+    return count
@@ -0,0 +1,60 @@
+import copy
+import functools
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+# Сколько результатов запросов хранит модель
+CACHE_SIZE = 128
+
+
+class QueryCache:
+    """LRU-кэш результатов запросов со счетчиками попаданий"""
+
+    def __init__(self, max_size: int = CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Поиск результата: (найден ли, значение)"""
+        if key in self._items:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return True, self._items[key]
+
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Hashable, value: Any):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
+
+
+def cached_query(method):
+    """Кэширование результата метода модели по имени и параметрам
+
+    Перед обращением модель проверяет PRAGMA data_version, поэтому
+    изменения из других соединений сбрасывают кэш. Возвращается копия,
+    чтобы вызывающий код не мог испортить сохраненный результат.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.check_data_version()
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+
+        found, value = self.cache.get(key)
+        if not found:
+            value = method(self, *args, **kwargs)
+            self.cache.put(key, value)
+        return copy.copy(value)
+
+    return wrapper
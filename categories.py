@@ -0,0 +1,189 @@
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CATEGORY_COLUMNS = "id, name, type"
+
+# Таблица замыкания иерархии: пара (предок, потомок) на каждый путь
+# по дереву, включая саму категорию с depth = 0
+TREE_TABLE = 'category_tree'
+TREE_COLUMNS = "ancestor_id, descendant_id, depth"
+
+
+def create_category_tree(cursor: sqlite3.Cursor):
+    """parent_id у категорий, таблица замыкания, триггеры и заполнение"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(categories)")]
+    if 'parent_id' not in columns:
+        cursor.execute("ALTER TABLE categories ADD COLUMN parent_id INTEGER REFERENCES categories (id)")
+
+    cursor.execute(f'''
+                   CREATE TABLE IF NOT EXISTS {TREE_TABLE}
+                   (
+                       ancestor_id INTEGER NOT NULL,
+                       descendant_id INTEGER NOT NULL,
+                       depth INTEGER NOT NULL,
+                       PRIMARY KEY (ancestor_id, descendant_id)
+                   ) WITHOUT ROWID
+                   ''')
+    # Свертка итогов идет от категории операции к ее предкам
+    cursor.execute(f'''
+                   CREATE INDEX IF NOT EXISTS idx_category_tree_descendant
+                       ON {TREE_TABLE} (descendant_id, ancestor_id)
+                   ''')
+
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_categories_tree_insert
+                       AFTER INSERT ON categories
+                   BEGIN
+                       INSERT INTO {TREE_TABLE} ({TREE_COLUMNS})
+                       SELECT ancestor_id, NEW.id, depth + 1 FROM {TREE_TABLE}
+                       WHERE descendant_id = NEW.parent_id
+                       UNION ALL
+                       SELECT NEW.id, NEW.id, 0;
+                   END
+                   ''')
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_categories_tree_cycle
+                       BEFORE UPDATE OF parent_id ON categories
+                       WHEN NEW.parent_id IS NOT NULL
+                   BEGIN
+                       SELECT RAISE(ABORT, 'category cycle') WHERE EXISTS (
+                           SELECT 1 FROM {TREE_TABLE}
+                           WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id);
+                   END
+                   ''')
+    # Перенос поддерева: пути от старых предков удаляются, от новых - добавляются
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_categories_tree_move
+                       AFTER UPDATE OF parent_id ON categories
+                   BEGIN
+                       DELETE FROM {TREE_TABLE}
+                       WHERE descendant_id IN (SELECT descendant_id FROM {TREE_TABLE}
+                                               WHERE ancestor_id = NEW.id)
+                         AND ancestor_id IN (SELECT ancestor_id FROM {TREE_TABLE}
+                                             WHERE descendant_id = NEW.id AND ancestor_id != NEW.id);
+                       INSERT INTO {TREE_TABLE} ({TREE_COLUMNS})
+                       SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+                       FROM {TREE_TABLE} above, {TREE_TABLE} below
+                       WHERE above.descendant_id = NEW.parent_id AND below.ancestor_id = NEW.id;
+                   END
+                   ''')
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_categories_tree_delete
+                       AFTER DELETE ON categories
+                   BEGIN
+                       DELETE FROM {TREE_TABLE}
+                       WHERE descendant_id = OLD.id OR ancestor_id = OLD.id;
+                   END
+                   ''')
+
+    rebuild_category_tree(cursor)
+
+
+def rebuild_category_tree(cursor: sqlite3.Cursor):
+    """Пересчет таблицы замыкания по parent_id"""
+    cursor.execute(f"DELETE FROM {TREE_TABLE}")
+    cursor.execute(f'''
+                   INSERT INTO {TREE_TABLE} ({TREE_COLUMNS})
+                   WITH RECURSIVE paths(ancestor_id, descendant_id, depth) AS (
+                       SELECT id, id, 0 FROM categories
+                       UNION ALL
+                       SELECT p.ancestor_id, c.id, p.depth + 1
+                       FROM paths p JOIN categories c ON c.parent_id = p.descendant_id
+                   )
+                   SELECT ancestor_id, descendant_id, MIN(depth) FROM paths
+                   GROUP BY ancestor_id, descendant_id
+                   ''')
+
+
+class CategoryIndex:
+    """Справочник категорий в памяти
+
+    Строки - кортежи (id, name, type). Поиск по id, по (name, type) без учета
+    регистра и списки по типу, отсортированные по названию, как ORDER BY name.
+    Иерархия загружается из таблицы замыкания (строки ancestor_id,
+    descendant_id, depth): предки и потомки категории - поиском в словаре.
+    """
+
+    def __init__(self, rows: Iterable[Tuple] = (), tree: Iterable[Tuple] = ()):
+        self.load(rows)
+        self.load_tree(tree)
+
+    def load(self, rows: Iterable[Tuple]):
+        self.by_id: Dict[int, Tuple] = {}
+        self.by_name_type: Dict[Tuple[str, str], Tuple] = {}
+        for row in rows:
+            self._put(row)
+        self._sort()
+
+    def load_tree(self, paths: Iterable[Tuple]):
+        # Предки по возрастанию depth: сначала родитель, в конце корень
+        ancestors: Dict[int, List[Tuple[int, int]]] = {}
+        descendants: Dict[int, List[int]] = {}
+        for ancestor_id, descendant_id, depth in paths:
+            if depth:
+                ancestors.setdefault(descendant_id, []).append((depth, ancestor_id))
+                descendants.setdefault(ancestor_id, []).append(descendant_id)
+        self._ancestors = {category_id: tuple(ancestor_id for _, ancestor_id in sorted(items))
+                           for category_id, items in ancestors.items()}
+        self._descendants = {category_id: tuple(items) for category_id, items in descendants.items()}
+
+    def ancestors(self, category_id: int) -> Tuple[int, ...]:
+        """Предки категории от родителя к корню"""
+        return self._ancestors.get(category_id, ())
+
+    def descendants(self, category_id: int) -> Tuple[int, ...]:
+        """Все подкатегории на любой глубине"""
+        return self._descendants.get(category_id, ())
+
+    def parent(self, category_id: int) -> Optional[int]:
+        ancestors = self.ancestors(category_id)
+        return ancestors[0] if ancestors else None
+
+    def level(self, category_id: int) -> int:
+        """Глубина в дереве: 0 - корневая категория"""
+        return len(self.ancestors(category_id))
+
+    def path(self, category_id: int, separator: str = ' / ') -> str:
+        """Полное название, например Еда / Продукты"""
+        names = [self.by_id[id_][1] for id_ in reversed((category_id,) + self.ancestors(category_id))
+                 if id_ in self.by_id]
+        return separator.join(names)
+
+    def add(self, row: Tuple):
+        self._put(row)
+        self._sort()
+
+    def remove(self, category_id: int):
+        row = self.by_id.pop(category_id, None)
+        if row is not None:
+            self.by_name_type.pop(self._name_key(row[1], row[2]), None)
+            self._sort()
+
+    def get(self, category_id: Optional[int]) -> Optional[Tuple]:
+        return self.by_id.get(category_id)
+
+    def find(self, name: str, type_: str) -> Optional[Tuple]:
+        return self.by_name_type.get(self._name_key(name, type_))
+
+    def of_type(self, type_: Optional[str] = None) -> List[Tuple]:
+        """Категории типа type_ (или все), отсортированные по названию"""
+        if type_ is None:
+            return list(self.rows)
+        return list(self.by_type.get(type_, ()))
+
+    def _put(self, row: Tuple):
+        old = self.by_id.get(row[0])
+        if old is not None:
+            self.by_name_type.pop(self._name_key(old[1], old[2]), None)
+        self.by_id[row[0]] = row
+        self.by_name_type[self._name_key(row[1], row[2])] = row
+
+    def _sort(self):
+        self.rows = sorted(self.by_id.values(), key=lambda row: row[1])
+        self.by_type: Dict[str, List[Tuple]] = {}
+        for row in self.rows:
+            self.by_type.setdefault(row[2], []).append(row)
+
+    @staticmethod
+    def _name_key(name: str, type_: str) -> Tuple[str, str]:
+        return (name or '').strip().casefold(), type_
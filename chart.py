@@ -0,0 +1,90 @@
+import tkinter as tk
+from decimal import Decimal
+from typing import List, Sequence, Tuple
+
+# Панель графика: доходы и расходы по корзинам ряда (model.get_series)
+# и крупнейшие категории расходов за период (model.get_category_rollup)
+CHART_HEIGHT = 220
+PADDING = 30
+LEGEND_WIDTH = 260
+TOP_CATEGORIES = 8
+
+INCOME_COLOR = '#4caf50'
+EXPENSE_COLOR = '#e53935'
+AXIS_COLOR = 'gray'
+
+BIN_NAMES = {'day': "по дням", 'week': "по неделям", 'month': "по месяцам"}
+
+
+class ChartPanel(tk.Canvas):
+    """Столбцы доходов и расходов по времени и разбивка расходов по категориям
+
+    Данные передаются уже сведенными в корзины, поэтому число столбцов не
+    зависит от числа операций. Перерисовка - по изменению размера.
+    """
+
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, height=CHART_HEIGHT, background='white',
+                         highlightthickness=0, **kwargs)
+        self.bin_ = None
+        self.points: List[Tuple[str, Decimal, Decimal]] = []
+        self.categories: List[Tuple[str, Decimal]] = []
+        self.bind('<Configure>', lambda event: self.redraw())
+
+    def show(self, bin_: str, points: Sequence[Tuple], categories: Sequence[Tuple]):
+        """points - (ключ корзины, доходы, расходы), categories - (название, сумма)"""
+        self.bin_ = bin_
+        self.points = list(points)
+        self.categories = sorted(categories, key=lambda item: item[1], reverse=True)[:TOP_CATEGORIES]
+        self.redraw()
+
+    def redraw(self):
+        self.delete('all')
+        width = self.winfo_width()
+        height = self.winfo_height()
+        if width <= 1 or height <= 1:
+            return
+
+        if not self.points:
+            self.create_text(width // 2, height // 2, text="Нет данных за период", fill=AXIS_COLOR)
+            return
+
+        self._draw_series(PADDING, PADDING, width - LEGEND_WIDTH - PADDING, height - PADDING)
+        self._draw_categories(width - LEGEND_WIDTH + 10, PADDING, width - 10)
+
+    def _draw_series(self, left, top, right, bottom):
+        """Пара столбцов на корзину: доходы слева, расходы справа"""
+        self.create_text(left, top - 15, anchor='w',
+                         text=f"Доходы и расходы {BIN_NAMES.get(self.bin_, '')}")
+        self.create_line(left, bottom, right, bottom, fill=AXIS_COLOR)
+
+        peak = max(max(income, expense) for _, income, expense in self.points) or 1
+        step = (right - left) / len(self.points)
+        bar = max(step / 2 - 1, 1)
+        scale = (bottom - top) / float(peak)
+
+        for number, (key, income, expense) in enumerate(self.points):
+            x = left + number * step
+            self.create_rectangle(x, bottom - float(income) * scale, x + bar, bottom,
+                                  fill=INCOME_COLOR, width=0)
+            self.create_rectangle(x + bar, bottom - float(expense) * scale, x + 2 * bar, bottom,
+                                  fill=EXPENSE_COLOR, width=0)
+
+        # Подписи первой и последней корзины и максимума шкалы
+        self.create_text(left, bottom + 10, anchor='w', text=self.points[0][0], fill=AXIS_COLOR)
+        self.create_text(right, bottom + 10, anchor='e', text=self.points[-1][0], fill=AXIS_COLOR)
+        self.create_text(left - 5, top, anchor='e', text=f"{peak:.0f}", fill=AXIS_COLOR)
+
+    def _draw_categories(self, left, top, right):
+        """Горизонтальные полосы крупнейших категорий расходов"""
+        self.create_text(left, top - 15, anchor='w', text="Расходы по категориям")
+        if not self.categories:
+            return
+
+        peak = float(self.categories[0][1]) or 1.0
+        for number, (name, total) in enumerate(self.categories):
+            y = top + number * 20
+            length = (right - left) * float(total) / peak
+            self.create_rectangle(left, y, left + length, y + 14, fill=EXPENSE_COLOR, width=0,
+                                  stipple='gray50')
+            self.create_text(left + 2, y + 7, anchor='w', text=f"{name}: {total:.2f}")
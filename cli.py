@@ -0,0 +1,166 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from decimal import Decimal
+from typing import Callable, Sequence
+
+import export
+import importer
+import partitions
+from export import parse_date
+from model import FinanceModel
+
+# Консольный режим без окна: отчеты из cron и на серверах без дисплея.
+# tkinter не импортируется ни здесь, ни в используемых модулях.
+
+OUTPUT_FORMATS = ('text', 'csv', 'json')
+
+# Ширина столбцов текстового вывода (остальные - по содержимому)
+TEXT_WIDTHS = {'id': 8, 'date': 10, 'amount': 14, 'type': 7, 'category': 30,
+               'income': 14, 'expense': 14, 'balance': 14, 'total': 14, 'count': 8}
+NUMERIC_COLUMNS = {'id', 'amount', 'income', 'expense', 'balance', 'total', 'count', 'level'}
+
+# Команды, которые передаются модулям со своим разбором аргументов
+PASSTHROUGH = {
+    'import': (importer.main, "Импорт банковской выписки CSV"),
+    'export': (export.main, "Выгрузка в CSV, JSON Lines или Parquet"),
+    'archive': (partitions.main, "Перенос закрытых лет в архивные файлы"),
+}
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Неподдерживаемый тип: {type(value).__name__}")
+
+
+def row_writer(fmt: str, columns: Sequence[str], stream=None) -> Callable[[Sequence], None]:
+    """Построчный вывод: заголовок пишется сразу, строки - по мере поступления
+
+    json - JSON Lines (объект на строку), удобно для jq и других программ.
+    """
+    stream = stream or sys.stdout
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        return writer.writerow
+
+    if fmt == 'json':
+        def write_json(row):
+            stream.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                                    default=_json_value) + '\n')
+        return write_json
+
+    def cell(column, value):
+        width = TEXT_WIDTHS.get(column, 0)
+        if isinstance(value, Decimal):
+            value = f"{value:.2f}"
+        elif value is None:
+            value = ''
+        return f"{value:>{width}}" if column in NUMERIC_COLUMNS else f"{value:<{width}}"
+
+    def write_text(row):
+        stream.write('  '.join(cell(column, value) for column, value in zip(columns, row)).rstrip()
+                     + '\n')
+
+    write_text(columns)
+    return write_text
+
+
+def cmd_stats(model: FinanceModel, args) -> int:
+    """Итоги за период"""
+    stats = model.get_statistics(args.start_date, args.end_date)
+    write = row_writer(args.format, ('from', 'to', 'income', 'expense', 'balance', 'count'))
+    write((args.start_date.strftime('%Y-%m-%d') if args.start_date else '',
+           args.end_date.strftime('%Y-%m-%d') if args.end_date else '',
+           stats['income'], stats['expense'], stats['balance'], stats['total_count']))
+    return 0
+
+
+def cmd_categories(model: FinanceModel, args) -> int:
+    """Итоги по категориям вместе с подкатегориями"""
+    rollup = model.get_category_rollup(args.start_date, args.end_date, args.level)
+    index = model.categories
+    write = row_writer(args.format, ('id', 'category', 'type', 'level', 'total', 'count'))
+
+    rows = [(category_id, index.path(category_id), index.get(category_id)[2],
+             index.level(category_id), total, count)
+            for category_id, (total, count) in rollup.items() if index.get(category_id)]
+    for row in sorted(rows, key=lambda row: (row[2], row[1])):
+        if args.type is None or row[2] == args.type:
+            write(row)
+    return 0
+
+
+def cmd_list(model: FinanceModel, args) -> int:
+    """Операции за период, порциями по chunk_size строк"""
+    write = row_writer(args.format, export.COLUMNS)
+    exporter = export.Exporter(model, start_date=args.start_date, end_date=args.end_date,
+                               chunk_size=args.chunk_size)
+    for rows in exporter.chunks():
+        for row in rows:
+            write(row)
+    return 0
+
+
+REPORTS = {
+    'stats': (cmd_stats, "Доходы, расходы и баланс за период"),
+    'categories': (cmd_categories, "Итоги по категориям с учетом подкатегорий"),
+    'list': (cmd_list, "Список операций (потоково)"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default='finance.db', help="Файл базы данных")
+    common.add_argument('--from', dest='start_date', type=parse_date, help="ГГГГ-ММ-ДД")
+    common.add_argument('--to', dest='end_date', type=parse_date, help="ГГГГ-ММ-ДД")
+    common.add_argument('--format', choices=OUTPUT_FORMATS, default='text',
+                        help="text - для чтения, csv и json (JSON Lines) - для программ")
+
+    parser = argparse.ArgumentParser(description="Учет личных финансов: отчеты без окна")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, (_, help_text) in REPORTS.items():
+        commands.add_parser(name, parents=[common], help=help_text)
+    commands.choices['categories'].add_argument('--level', type=int, default=None,
+                                                help="Только уровень дерева (0 - корневые)")
+    commands.choices['categories'].add_argument('--type', choices=('income', 'expense'))
+    commands.choices['list'].add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+
+    for name, (_, help_text) in PASSTHROUGH.items():
+        command = commands.add_parser(name, help=help_text, add_help=False)
+        command.add_argument('args', nargs=argparse.REMAINDER)
+    return parser
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Аргументы import/export/archive (включая --help) разбирает сам модуль
+    if argv and argv[0] in PASSTHROUGH:
+        return PASSTHROUGH[argv[0]][0](argv[1:])
+
+    args = build_parser().parse_args(argv)
+
+    # Отчеты только читают: открываются на соединении mode=ro
+    try:
+        model = FinanceModel(args.db, read_only=True)
+        try:
+            return REPORTS[args.command][0](model, args)
+        finally:
+            model.close()
+    except sqlite3.Error as e:
+        print(f"Ошибка базы данных: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # Вывод оборвал получатель (например, head): это не ошибка,
+        # остаток буфера stdout отправляется в никуда
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
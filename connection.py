@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Ожидание блокировки другим соединением, с
+BUSY_TIMEOUT = 5.0
+
+# Настройки соединения: WAL допускает чтение параллельно с записью,
+# synchronous=NORMAL в режиме WAL не теряет целостность при сбое
+PRAGMAS: Dict[str, object] = {
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,  # 16 МБ
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class ConnectionManager:
+    """Соединения SQLite, по одному на поток
+
+    Соединение создается при первом обращении из потока и дальше
+    используется только этим потоком. Рабочая база переводится в режим WAL,
+    соединения read_only открываются с mode=ro и подходят для отчетов,
+    которые выполняются параллельно с записью.
+    """
+
+    def __init__(self, db_name: str = 'finance.db', read_only: bool = False,
+                 pragmas: Optional[Dict[str, object]] = None,
+                 timeout: float = BUSY_TIMEOUT):
+        self.db_name = db_name
+        self.read_only = read_only
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+        # Состояние текущего потока: соединение, курсор и т.п.
+        self.local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._connect_hooks: List[Callable[[sqlite3.Connection], None]] = []
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = self._connect()
+            self.local.cursor = connection.cursor()
+        return connection
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        self.connection
+        return self.local.cursor
+
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False нужен только для close_all из другого потока
+        if self.read_only:
+            uri = Path(self.db_name).resolve().as_uri() + '?mode=ro'
+            connection = sqlite3.connect(uri, uri=True, timeout=self.timeout,
+                                         check_same_thread=False)
+        else:
+            connection = sqlite3.connect(self.db_name, timeout=self.timeout,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+
+        with self._lock:
+            self._connections.append(connection)
+            hooks = list(self._connect_hooks)
+        for hook in hooks:
+            hook(connection)
+        return connection
+
+    def add_connect_hook(self, hook: Callable[[sqlite3.Connection], None]):
+        """Настройка уже открытых и всех будущих соединений (трассировка и т.п.)"""
+        with self._lock:
+            self._connect_hooks.append(hook)
+            connections = list(self._connections)
+        for connection in connections:
+            hook(connection)
+
+    def journal_mode(self) -> str:
+        return self.connection.execute("PRAGMA journal_mode").fetchone()[0]
+
+    def close(self):
+        """Закрытие соединения текущего потока"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            with self._lock:
+                self._connections.remove(connection)
+            connection.close()
+            self.local.connection = self.local.cursor = None
+
+    def close_all(self):
+        """Закрытие соединений всех потоков"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self.local = threading.local()
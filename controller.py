@@ -1,58 +1,288 @@
+import sqlite3
+import threading
+import time
 import tkinter as tk
-from tkinter import messagebox, Toplevel, ttk
+from tkinter import filedialog, messagebox, Toplevel, ttk
 from datetime import datetime
 from view import FinanceView
 from model import FinanceModel
+from export import ExportCancelled, Exporter
+from importer import CsvImporter
+from instrumentation import Instrumentation, slow_log_path
+from money import to_decimal
+from pager import PAGE_SIZE, SEARCH_PREFETCH_PAGES, SearchPager, TransactionPager
+from worker import QueryExecutor
 
 
 class FinanceController:
-    def __init__(self, root):
-        self.model = FinanceModel()
+    def __init__(self, root, db_name='finance.db', started=None, slow_log=None):
+        # Время запуска считается от started (начало main) до первого кадра и данных
+        self.started = time.perf_counter() if started is None else started
+        self.first_frame_ms = None
+        self.first_data_ms = None
+        # Замеры запросов; медленные пишутся в журнал с планом выполнения
+        # (по умолчанию - рядом с файлом базы)
+        self.instrumentation = Instrumentation(slow_log=slow_log or slow_log_path(db_name))
+        self.model = self.instrumentation.instrument(FinanceModel(db_name))
         self.view = FinanceView(root)
+        # Запросы к базе выполняются в фоновом потоке, окно не блокируется
+        self.executor = QueryExecutor(root, self.model.db_name, on_busy=self.view.set_loading,
+                                      on_model=self.instrumentation.instrument)
+        # Отчеты и выгрузка - отдельным потоком на соединении только для чтения
+        self.reports = QueryExecutor(root, self.model.db_name, read_only=True)
+        self.export_cancel = None
+        self.pager = None
+        self.search_pages = None
+        self.filter_dates = (None, None)
+        self.search_text = ''
+        # Даты последней запрошенной загрузки (еще не показанной - тоже)
+        self.requested_dates = (None, None)
+        self.stats = None
 
         self.setup_events()
-        self.load_data()
+        # Окно сразу показывает прошлые итоги, таблица заполняется в фоне
+        self.show_snapshot()
+        root.after_idle(self.on_first_frame)
+        self.load_data(*self.view.get_filter_dates())
+
+    def show_snapshot(self):
+        """Итоги, сохраненные при прошлом закрытии"""
+        snapshot = self.model.get_stats_snapshot()
+        if snapshot is None:
+            return
+        self.view.update_statistics(snapshot)
+        self.view.set_status(f"Итоги на {snapshot['saved_at']}, обновление...")
+
+    def on_first_frame(self):
+        """Окно отрисовано: время до первого кадра"""
+        seconds = time.perf_counter() - self.started
+        self.first_frame_ms = seconds * 1000
+        self.instrumentation.record('first_frame', seconds)
 
     def setup_events(self):
         """Настройка обработчиков событий"""
         self.view.add_button.config(command=self.open_add_transaction)
         self.view.refresh_button.config(command=self.load_data)
-        self.view.filter_button.config(command=self.apply_filter)
+        self.view.import_button.config(command=self.import_csv)
+        self.view.export_button.config(command=self.export)
+        self.view.chart_button.config(command=self.toggle_chart)
+        self.view.bind_filter(self.apply_filter)
         self.view.context_menu.entryconfig("Удалить", command=self.delete_transaction)
+        self.view.bind_search(self.search)
 
     def load_data(self, start_date=None, end_date=None):
         """Загрузка всех данных"""
-        # Загрузка транзакций
-        transactions = self.model.get_transactions(start_date, end_date)
-        self.view.load_transactions(transactions)
-
-        # Обновление названий категорий
-        self.update_category_names()
+        text = self.search_text
+        self.requested_dates = (start_date, end_date)
+
+        def query(model):
+            started = time.perf_counter()
+            if text:
+                # Несколько первых страниц сразу: прокрутка не ждет ранжирования
+                total = model.count_search_results(text, start_date, end_date)
+                first_page, _ = model.search_transactions(
+                    text, start_date, end_date, limit=PAGE_SIZE * SEARCH_PREFETCH_PAGES,
+                    display=True)
+            else:
+                total = model.count_transactions(start_date, end_date)
+                first_page, _ = model.get_display_transactions_page(start_date, end_date, PAGE_SIZE)
+            stats = model.get_statistics(start_date, end_date)
+            return total, first_page, stats, time.perf_counter() - started
+
+        # Новая загрузка вытесняет предыдущую: ожидающая отменяется,
+        # выполняемая прерывается, показан будет только последний фильтр
+        self.executor.submit(
+            'load', query,
+            on_done=lambda result: self.show_data(start_date, end_date, text, *result),
+            on_error=self.show_error
+        )
+
+    def search_pager(self, text, start_date, end_date, total, first_rows):
+        """Страницы результатов поиска, заказываемые фоновому потоку"""
+        def request_rows(offset, limit):
+            def query(model):
+                if self.search_pages is not pager:
+                    return []  # результаты уже сменил новый поиск или фильтр
+                return model.search_transactions(text, start_date, end_date, limit=limit,
+                                                 offset=offset, display=True)[0]
+
+            def done(rows):
+                pager.store(offset, rows)
+                if self.search_pages is pager:
+                    self.view.refresh_rows()
+
+            def failed(error):
+                pager.failed(offset, limit)
+                self.show_error(error)
+
+            self.executor.submit(None, query, on_done=done, on_error=failed)
+
+        pager = self.search_pages = SearchPager(request_rows, total, first_rows=first_rows)
+        return pager
+
+    def transaction_pager(self, start_date, end_date, total, first_page):
+        """Страницы операций фильтра, читаемые фоновым потоком"""
+        def request_page(limit, after, offset, deliver):
+            def query(model):
+                if self.pager is not pager:
+                    return []  # таблицу уже сменил новый фильтр
+                return model.get_display_transactions_page(start_date, end_date, limit,
+                                                           after, offset)[0]
+
+            def done(rows):
+                deliver(rows)
+                if self.pager is pager:
+                    self.view.refresh_rows()
+
+            def failed(error):
+                deliver(None)
+                self.show_error(error)
+
+            self.executor.submit(None, query, on_done=done, on_error=failed)
+
+        pager = self.pager = TransactionPager(None, total, first_page=first_page,
+                                              request_page=request_page)
+        return pager
+
+    def search(self, text):
+        """Поиск по описанию в текущем фильтре дат"""
+        if text != self.search_text:
+            self.search_text = text
+            self.load_data(*self.filter_dates)
+
+    def show_data(self, start_date, end_date, text, total, first_page, stats, query_time=0.0):
+        """Вывод загруженных данных"""
+        started = time.perf_counter()
+        self.filter_dates = (start_date, end_date)
+
+        if text:
+            # Результаты поиска упорядочены по релевантности: страницы по смещению
+            # кэшируются и подгружаются в фоне, а не в потоке окна
+            self.pager = None
+            self.view.load_virtual(total, self.search_pager(text, start_date, end_date, total,
+                                                            first_page).get_rows)
+        else:
+            # Загрузка транзакций: страницы подгружаются в фоне по мере прокрутки
+            self.search_pages = None
+            self.view.load_virtual(total, self.transaction_pager(start_date, end_date, total,
+                                                                 first_page).get_rows)
 
         # Обновление статистики
-        stats = self.model.get_statistics(start_date, end_date)
-        self.view.update_statistics(stats)
+        self.stats = stats
+        self.view.update_statistics(self.stats)
+
+        # Время обновления: запросы в фоне и отрисовка в потоке Tk
+        self.view.root.update_idletasks()
+        self.view.set_timing(query_time * 1000, (time.perf_counter() - started) * 1000)
+
+        self.load_chart()
+
+        if self.first_data_ms is None:
+            seconds = time.perf_counter() - self.started
+            self.first_data_ms = seconds * 1000
+            self.instrumentation.record('first_data', seconds)
+            self.view.set_status("")
+            self.view.set_startup_timing(self.first_frame_ms, self.first_data_ms)
+
+    def toggle_chart(self):
+        """Открытие и закрытие графика"""
+        if self.view.toggle_chart():
+            self.load_chart()
+
+    def load_chart(self):
+        """Ряд за текущий фильтр дат и итоги корневых категорий расходов
+
+        Строится в фоне из сведенных корзин модели: после записи
+        пересчитываются только корзины измененных дат.
+        """
+        if not self.view.chart_visible():
+            return
+        start_date, end_date = self.filter_dates
+
+        def query(model):
+            bin_, points = model.get_series(start_date, end_date)
+            rollup = model.get_category_rollup(start_date, end_date, level=0)
+            index = model.categories
+            categories = [(index.get(category_id)[1], total)
+                          for category_id, (total, _) in rollup.items()
+                          if index.get(category_id) and index.get(category_id)[2] == 'expense'
+                          and total]
+            return bin_, points, categories
+
+        self.executor.submit('chart', query,
+                             on_done=lambda result: self.view.show_chart(*result),
+                             on_error=self.show_error)
+
+    def show_error(self, error):
+        """Сообщение об ошибке фонового запроса"""
+        messagebox.showerror("Ошибка", f"Произошла ошибка: {str(error)}")
+
+    def in_filter(self, date_str):
+        """Попадает ли дата операции в текущий фильтр"""
+        start_date, end_date = self.filter_dates
+        if start_date and date_str < start_date.strftime('%Y-%m-%d'):
+            return False
+        if end_date and date_str > end_date.strftime('%Y-%m-%d'):
+            return False
+        return True
+
+    def on_transaction_added(self, row, amount, type_):
+        """Вставка новой операции в таблицу и итоги без перезагрузки"""
+        if row is None or not self.in_filter(row[1]):
+            return
+        if self.pager is None:
+            # Результаты поиска ранжированы: место строки знает только запрос
+            self.load_data(*self.filter_dates)
+            return
 
-    def update_category_names(self):
-        """Обновление названий категорий"""
-        category_map = {}
-        for cat in self.model.get_categories():
-            category_map[cat[0]] = cat[1]
+        self.pager.insert((row[1], row[0]))
+        self.view.insert_row(row)
+        self.adjust_statistics(type_, amount, 1)
+        self.load_chart()
 
-        # Добавляем для None (если категория не указана)
-        category_map[None] = "Без категории"
+    def on_transaction_deleted(self, row):
+        """Удаление операции из таблицы и итогов без перезагрузки"""
+        id_, date_str, amount, category_id, description, type_ = row
+        if not self.in_filter(date_str):
+            return
+        if self.pager is None:
+            self.load_data(*self.filter_dates)
+            return
+
+        self.pager.remove((date_str, id_))
+        self.view.delete_row((date_str, id_))
+        self.adjust_statistics(type_, amount, -1)
+        self.load_chart()
 
-        self.view.update_category_names(category_map)
+    def adjust_statistics(self, type_, amount, sign):
+        """Изменение итогов на одну операцию"""
+        self.stats[type_] += sign * amount
+        self.stats['total_count'] += sign
+        self.stats['balance'] = self.stats['income'] - self.stats['expense']
+        self.view.update_statistics(self.stats)
 
-    def apply_filter(self):
-        """Применение фильтра"""
+    def apply_filter(self, final=True):
+        """Применение фильтра
+
+        final=False - вызов после паузы во вводе дат: незаконченная дата
+        молча пропускается.
+        """
         start_date, end_date = self.view.get_filter_dates()
 
         if start_date is None and self.view.start_date_entry.get():
-            messagebox.showerror("Ошибка", "Неверный формат начальной даты")
+            if final:
+                messagebox.showerror("Ошибка", "Неверный формат начальной даты")
             return
         if end_date is None and self.view.end_date_entry.get():
-            messagebox.showerror("Ошибка", "Неверный формат конечной даты")
+            if final:
+                messagebox.showerror("Ошибка", "Неверный формат конечной даты")
+            return
+
+        # Повторное нажатие, пока грузится тот же фильтр, запрос не перезапускает;
+        # после ввода дат без изменений перезагрузка тоже не нужна
+        dates = (start_date, end_date)
+        if dates == self.requested_dates and (
+                self.executor.pending('load') or (not final and dates == self.filter_dates)):
             return
 
         self.load_data(start_date, end_date)
@@ -63,11 +293,113 @@ class FinanceController:
         if not transaction_id:
             return
 
-        if messagebox.askyesno("Подтверждение", "Удалить выбранную операцию?"):
-            if self.model.delete_transaction(transaction_id):
-                self.load_data()
+        if not messagebox.askyesno("Подтверждение", "Удалить выбранную операцию?"):
+            return
+
+        def delete(model):
+            row = model.get_transaction(transaction_id)
+            if row and model.delete_transaction(transaction_id):
+                return row
+            return None
+
+        def done(row):
+            if row:
+                self.on_transaction_deleted(row)
                 messagebox.showinfo("Успех", "Операция удалена")
 
+        self.executor.submit(None, delete, on_done=done, on_error=self.show_error)
+
+    def import_csv(self):
+        """Импорт банковской выписки из CSV"""
+        path = filedialog.askopenfilename(
+            parent=self.view.root,
+            title="Импорт выписки",
+            filetypes=[("CSV", "*.csv"), ("Все файлы", "*.*")]
+        )
+        if not path:
+            return
+
+        def task(model, report):
+            return CsvImporter(model, progress=lambda stats: report(f"Импорт: {stats}")).run(path)
+
+        def done(stats):
+            self.load_data()
+            messagebox.showinfo("Успех", f"Импорт завершен. {stats}")
+
+        def failed(error):
+            messagebox.showerror("Ошибка", f"Не удалось импортировать файл: {str(error)}")
+
+        self.run_with_progress(self.executor, task, "Импорт...", done, failed)
+
+    def export(self):
+        """Выгрузка операций текущего фильтра дат; повторное нажатие - отмена"""
+        if self.export_cancel is not None:
+            self.export_cancel.set()
+            return
+
+        path = filedialog.asksaveasfilename(
+            parent=self.view.root,
+            title="Экспорт операций",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet")]
+        )
+        if not path:
+            return
+
+        start_date, end_date = self.filter_dates
+        cancel = self.export_cancel = threading.Event()
+        self.view.export_button.config(text="Отменить экспорт")
+
+        def task(model, report):
+            return Exporter(model, start_date=start_date, end_date=end_date, cancel=cancel,
+                            progress=lambda stats: report(f"Экспорт: {stats}")).run(path)
+
+        def finish():
+            self.export_cancel = None
+            self.view.export_button.config(text="Экспорт")
+
+        def done(stats):
+            finish()
+            messagebox.showinfo("Успех", f"Экспорт завершен. {stats}")
+
+        def failed(error):
+            finish()
+            if not isinstance(error, ExportCancelled):
+                messagebox.showerror("Ошибка", f"Не удалось выгрузить данные: {str(error)}")
+
+        self.run_with_progress(self.reports, task, "Экспорт...", done, failed)
+
+    def run_with_progress(self, executor, task, title, on_done, on_error):
+        """Фоновая задача task(model, report) с прогрессом в строке состояния
+
+        report(text) вызывается из фонового потока, поэтому текст только
+        запоминается, а выводится опросом из потока Tk.
+        """
+        progress = {'text': title, 'running': True}
+
+        def report(text):
+            progress['text'] = text
+
+        def show_progress():
+            if progress['running']:
+                self.view.set_status(progress['text'])
+                self.view.root.after(200, show_progress)
+
+        def stop():
+            progress['running'] = False
+            self.view.set_status("")
+
+        def done(result):
+            stop()
+            on_done(result)
+
+        def failed(error):
+            stop()
+            on_error(error)
+
+        executor.submit(None, lambda model: task(model, report), on_done=done, on_error=failed)
+        show_progress()
+
     def open_add_transaction(self):
         """Открытие диалога добавления транзакции"""
         dialog = Toplevel(self.view.root)
@@ -80,9 +412,6 @@ class FinanceController:
         type_var = tk.StringVar(value="expense")
         category_var = tk.StringVar()
 
-        # Загрузка категорий
-        categories = self.model.get_categories()
-
         # Элементы формы
         ttk.Label(dialog, text="Дата (ГГГГ-ММ-ДД):").grid(row=0, column=0, sticky='e', padx=5, pady=5)
         date_entry = ttk.Entry(dialog)
@@ -95,9 +424,8 @@ class FinanceController:
         type_combo.grid(row=1, column=1, padx=5, pady=5, sticky='ew')
 
         def update_categories():
-            type_ = type_var.get()
-            filtered_categories = [cat for cat in categories if cat[2] == type_]
-            category_names = [cat[1] for cat in filtered_categories]
+            # Категории берутся из справочника модели в памяти
+            category_names = [cat[1] for cat in self.model.get_categories(type_var.get())]
             category_combo['values'] = category_names
             if category_names:
                 category_combo.set(category_names[0])
@@ -129,7 +457,7 @@ class FinanceController:
                 if not amount_str:
                     raise ValueError("Введите сумму")
 
-                amount = float(amount_str)
+                amount = to_decimal(amount_str.replace(',', '.'))
                 if amount <= 0:
                     raise ValueError("Сумма должна быть положительной")
 
@@ -141,23 +469,26 @@ class FinanceController:
                 category_name = category_var.get()
 
                 # Получаем ID категории
-                category_id = None
-                for cat in categories:
-                    if cat[1] == category_name and cat[2] == type_:
-                        category_id = cat[0]
-                        break
+                category_id = self.model.get_category_id_by_name(category_name, type_)
 
                 if not category_id:
                     raise ValueError("Выберите категорию")
 
-                # Сохраняем транзакцию
-                self.model.add_transaction(date, amount, category_id, description, type_)
+                # Сохраняем транзакцию в фоне
+                def add(model):
+                    transaction_id = model.add_transaction(date, amount, category_id,
+                                                           description, type_)
+                    return model.get_transaction(transaction_id, display=True)
 
-                # Обновляем интерфейс
-                self.load_data()
-                dialog.destroy()
+                def done(row):
+                    # Обновляем интерфейс
+                    self.on_transaction_added(row, amount, type_)
+                    if dialog.winfo_exists():
+                        dialog.destroy()
 
-                messagebox.showinfo("Успех", "Операция успешно добавлена")
+                    messagebox.showinfo("Успех", "Операция успешно добавлена")
+
+                self.executor.submit(None, add, on_done=done, on_error=self.show_error)
 
             except ValueError as e:
                 messagebox.showerror("Ошибка", str(e))
@@ -178,4 +509,13 @@ class FinanceController:
 
     def close(self):
         """Закрытие приложения"""
+        if self.export_cancel is not None:
+            self.export_cancel.set()
+        self.reports.shutdown()
+        self.executor.shutdown()
+        if self.stats is not None:
+            try:
+                self.model.save_stats_snapshot(*self.filter_dates, self.stats)
+            except sqlite3.Error:
+                pass  # без снимка следующий запуск просто покажет нули до загрузки
         self.model.close()
\ No newline at end of file
@@ -1,15 +1,35 @@
-import sqlite3
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+
+import aggregates
+import migrations
+from bulk import BULK_BATCH_SIZE, insert_transactions
+from connection import ConnectionManager
+from money import Amount, from_minor, rows_from_minor, to_minor
+
+PAGE_SIZE = 500
 
 
 class Database:
-    def __init__(self, db_name='finance.db'):
-        self.connection = sqlite3.connect(db_name)
-        self.cursor = self.connection.cursor()
-        self.create_tables()
+    def __init__(self, db_name='finance.db', read_only=False):
+        # Соединение и курсор у каждого потока свои, база в режиме WAL
+        self.connections = ConnectionManager(db_name, read_only=read_only)
+        if not read_only:
+            self.create_tables()
+
+    @property
+    def connection(self):
+        return self.connections.connection
+
+    @property
+    def cursor(self):
+        return self.connections.cursor
 
     def create_tables(self):
+        # Схема актуальна - пропускаем DDL
+        if migrations.is_current(self.connection):
+            return
+
         # Таблица категорий
         self.cursor.execute('''
                             CREATE TABLE IF NOT EXISTS categories
@@ -57,7 +77,7 @@ class Database:
                                 NOT
                                 NULL,
                                 amount
-                                REAL
+                                INTEGER
                                 NOT
                                 NULL,
                                 category_id
@@ -87,6 +107,7 @@ class Database:
         # Создание начальных категорий
         self.create_default_categories()
         self.connection.commit()
+        migrations.migrate(self.connection)
 
     def create_default_categories(self):
         self.cursor.execute("SELECT COUNT(*) FROM categories")
@@ -116,7 +137,7 @@ class Database:
                     (name, type_)
                 )
 
-    def add_transaction(self, date: datetime, amount: float,
+    def add_transaction(self, date: datetime, amount: Amount,
                         category_id: Optional[int], description: str,
                         type_: str) -> int:
         self.cursor.execute('''
@@ -124,7 +145,7 @@ class Database:
                             VALUES (?, ?, ?, ?, ?)
                             ''', (
                                 date.strftime('%Y-%m-%d'),
-                                amount,
+                                to_minor(amount),
                                 category_id,
                                 description,
                                 type_
@@ -132,9 +153,60 @@ class Database:
         self.connection.commit()
         return self.cursor.lastrowid
 
+    # Пакетная загрузка: executemany пачками внутри одной транзакции,
+    # возвращает количество добавленных строк
+    def add_transactions_bulk(self, rows: Iterable, batch_size: int = BULK_BATCH_SIZE) -> int:
+        return insert_transactions(self.cursor, rows, batch_size)
+
     def get_transactions(self, start_date: Optional[datetime] = None,
                          end_date: Optional[datetime] = None,
                          category_id: Optional[int] = None) -> List[Tuple]:
+        query, params = self._transactions_query(start_date, end_date, category_id)
+        query += " ORDER BY date DESC, id DESC"
+
+        # Суммы хранятся в копейках, наружу - в рублях
+        self.cursor.execute(query, params)
+        return rows_from_minor(self.cursor.fetchall())
+
+    # Keyset-пагинация по (date, id): возвращает строки страницы
+    # и ключ следующей страницы (None, если страниц больше нет)
+    def get_transactions_page(self, start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None,
+                              category_id: Optional[int] = None,
+                              limit: int = PAGE_SIZE,
+                              after: Optional[Tuple[str, int]] = None
+                              ) -> Tuple[List[Tuple], Optional[Tuple[str, int]]]:
+        query, params = self._transactions_query(start_date, end_date, category_id)
+
+        if after:
+            query += " AND date <= ? AND (date < ? OR id < ?)"
+            params.extend([after[0], after[0], after[1]])
+
+        query += " ORDER BY date DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        self.cursor.execute(query, params)
+        rows = rows_from_minor(self.cursor.fetchall())
+
+        next_key = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return rows, next_key
+
+    def iter_transactions(self, start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None,
+                          category_id: Optional[int] = None,
+                          chunk_size: int = PAGE_SIZE) -> Iterator[List[Tuple]]:
+        after = None
+        while True:
+            rows, after = self.get_transactions_page(start_date, end_date, category_id,
+                                                     chunk_size, after)
+            if rows:
+                yield rows
+            if after is None:
+                break
+
+    def _transactions_query(self, start_date: Optional[datetime],
+                            end_date: Optional[datetime],
+                            category_id: Optional[int]) -> Tuple[str, List]:
         query = "SELECT * FROM transactions WHERE 1=1"
         params = []
 
@@ -150,10 +222,7 @@ class Database:
             query += " AND category_id = ?"
             params.append(category_id)
 
-        query += " ORDER BY date DESC"
-
-        self.cursor.execute(query, params)
-        return self.cursor.fetchall()
+        return query, params
 
     def get_categories(self, type_filter: Optional[str] = None) -> List[Tuple]:
         query = "SELECT * FROM categories"
@@ -180,31 +249,17 @@ class Database:
 
     def get_statistics(self, start_date: Optional[datetime] = None,
                        end_date: Optional[datetime] = None) -> Dict:
-        query = '''
-                SELECT type, \
-                       SUM(amount) as total, \
-                       COUNT(*) as count
-                FROM transactions
-                WHERE 1=1 \
-                '''
-        params = []
-
-        if start_date:
-            query += " AND date >= ?"
-            params.append(start_date.strftime('%Y-%m-%d'))
-
-        if end_date:
-            query += " AND date <= ?"
-            params.append(end_date.strftime('%Y-%m-%d'))
-
-        query += " GROUP BY type"
+        # Целые месяцы берутся из monthly_totals, крайние дни - из daily_totals
+        source, params = aggregates.totals_source(start_date, end_date, "type, total, count")
+        query = f"SELECT type, SUM(total), SUM(count) FROM ({source}) GROUP BY type"
 
         self.cursor.execute(query, params)
 
-        stats = {'income': 0, 'expense': 0, 'balance': 0, 'total_count': 0}
+        # Итоги считаются в копейках точно, в рубли переводятся в конце
+        stats = {'income': from_minor(0), 'expense': from_minor(0), 'total_count': 0}
         for row in self.cursor.fetchall():
             type_, total, count = row
-            stats[type_] = total or 0
+            stats[type_] = from_minor(total)
             stats['total_count'] += count or 0
 
         stats['balance'] = stats['income'] - stats['expense']
@@ -215,4 +270,4 @@ class Database:
         self.connection.commit()
 
     def close(self):
-        self.connection.close()
\ No newline at end of file
+        self.connections.close_all()
\ No newline at end of file
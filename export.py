@@ -0,0 +1,204 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+# Форматы выгрузки и расширения файлов
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+
+# Строк в одной порции чтения из базы и записи в файл
+CHUNK_SIZE = 10000
+
+COLUMNS = ('id', 'date', 'amount', 'category', 'description', 'type')
+
+
+class ExportCancelled(Exception):
+    """Выгрузка остановлена пользователем"""
+
+
+class ExportStats:
+    """Счетчики выгрузки"""
+
+    def __init__(self):
+        self.written = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Скорость в строках в секунду"""
+        return self.written / self.elapsed if self.elapsed else 0.0
+
+    def tick(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def __str__(self):
+        return f"Выгружено: {self.written}, {self.rate:.0f} строк/с"
+
+
+class _CsvWriter:
+    def __init__(self, file):
+        self.file = open(file, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows((id_, date, str(amount), category, description, type_)
+                              for id_, date, amount, category, description, type_ in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _JsonLinesWriter:
+    def __init__(self, file):
+        self.file = open(file, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        # Сумма строкой из Decimal, как в CSV: копейки без двоичного округления
+        self.file.writelines(
+            json.dumps(dict(zip(COLUMNS, (id_, date, str(amount), category, description, type_))),
+                       ensure_ascii=False) + '\n'
+            for id_, date, amount, category, description, type_ in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, file):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Для выгрузки в Parquet нужен pyarrow: pip install pyarrow")
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('date', pa.string()),
+            ('amount', pa.decimal128(18, 2)),
+            ('category', pa.string()),
+            ('description', pa.string()),
+            ('type', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(file, self.schema)
+
+    def write(self, rows):
+        # Каждая порция - отдельная группа строк файла
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'csv': _CsvWriter, 'jsonl': _JsonLinesWriter, 'parquet': _ParquetWriter}
+
+
+def format_for(path: str) -> str:
+    """Формат по расширению файла"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Неизвестный формат файла: {extension or path}")
+    return FORMATS[extension]
+
+
+class Exporter:
+    """Потоковая выгрузка транзакций в CSV, JSON Lines или Parquet
+
+    Строки читаются из модели порциями через iter_transactions (keyset),
+    поэтому память не зависит от объема выгрузки. Файл пишется под
+    временным именем и переименовывается только после успешного завершения.
+    Между порциями проверяется cancel (например, threading.Event).
+    """
+
+    def __init__(self, model, fmt: Optional[str] = None,
+                 start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None,
+                 chunk_size: int = CHUNK_SIZE,
+                 progress: Optional[Callable[[ExportStats], None]] = None,
+                 cancel=None):
+        if fmt is not None and fmt not in WRITERS:
+            raise ValueError(f"Неизвестный формат: {fmt}")
+        self.model = model
+        self.fmt = fmt
+        self.start_date = start_date
+        self.end_date = end_date
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.cancel = cancel
+        self.stats = ExportStats()
+
+    def run(self, path: str) -> ExportStats:
+        """Выгрузка в файл, возвращает итоговые счетчики"""
+        self.stats = ExportStats()
+        temp_path = path + '.part'
+        writer = WRITERS[self.fmt or format_for(path)](temp_path)
+        try:
+            for rows in self.chunks():
+                if self.cancel is not None and self.cancel.is_set():
+                    raise ExportCancelled("Выгрузка отменена")
+                writer.write(rows)
+                self.stats.written += len(rows)
+                self.stats.tick()
+                if self.progress:
+                    self.progress(self.stats)
+            writer.close()
+        except BaseException:
+            writer.close()
+            os.unlink(temp_path)
+            raise
+
+        os.replace(temp_path, path)
+        self.stats.tick()
+        return self.stats
+
+    def chunks(self) -> Iterable[list]:
+        """Порции строк (id, date, amount, category, description, type)"""
+        category_name = self.model.get_category_name
+        for chunk in self.model.iter_transactions(self.start_date, self.end_date, self.chunk_size):
+            yield [(id_, date, amount, category_name(category_id), description, type_)
+                   for id_, date, amount, category_id, description, type_ in chunk]
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка операций в CSV, JSON Lines или Parquet")
+    parser.add_argument('path', help="Файл: .csv, .jsonl или .parquet")
+    parser.add_argument('--db', default='finance.db', help="Файл базы данных")
+    parser.add_argument('--format', choices=sorted(WRITERS), default=None,
+                        help="Формат (по умолчанию - по расширению файла)")
+    parser.add_argument('--from', dest='start_date', type=parse_date, help="ГГГГ-ММ-ДД")
+    parser.add_argument('--to', dest='end_date', type=parse_date, help="ГГГГ-ММ-ДД")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from model import FinanceModel
+
+    def report(stats):
+        print(stats, file=sys.stderr)
+
+    # Только чтение: выгрузка не мешает записи из приложения
+    model = FinanceModel(args.db, read_only=True)
+    try:
+        stats = Exporter(model, args.format, args.start_date, args.end_date,
+                         args.chunk_size, progress=report).run(args.path)
+    finally:
+        model.close()
+
+    print(f"Выгрузка завершена за {stats.elapsed:.1f} с. {stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
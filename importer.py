@@ -0,0 +1,227 @@
+import argparse
+import csv
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from money import to_decimal
+
+# Возможные заголовки столбцов в выгрузках банков
+COLUMN_ALIASES = {
+    'date': ('date', 'дата', 'дата операции', 'дата платежа'),
+    'amount': ('amount', 'сумма', 'сумма операции', 'сумма платежа'),
+    'category': ('category', 'категория'),
+    'description': ('description', 'описание', 'назначение платежа'),
+    'type': ('type', 'тип', 'тип операции'),
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d.%m.%Y %H:%M:%S')
+
+TYPE_ALIASES = {
+    'income': 'income', 'доход': 'income', 'пополнение': 'income',
+    'expense': 'expense', 'расход': 'expense', 'списание': 'expense',
+}
+
+# Строк в одной транзакции БД и в одном executemany
+COMMIT_SIZE = 100000
+BATCH_SIZE = 5000
+PROGRESS_EVERY = 10000
+
+
+class ImportStats:
+    """Счетчики импорта"""
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Скорость в строках в секунду"""
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def tick(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def __str__(self):
+        return (f"Прочитано: {self.read}, загружено: {self.imported}, "
+                f"пропущено: {self.skipped}, {self.rate:.0f} строк/с")
+
+
+class CsvImporter:
+    """Потоковый импорт CSV-выписок через генераторы
+
+    Файл читается построчно (память не зависит от размера файла),
+    строки сопоставляются со столбцами date/amount/category/description/type
+    и пишутся в модель большими пакетами через add_transactions_bulk.
+    """
+
+    def __init__(self, model, columns: Optional[Dict[str, str]] = None,
+                 delimiter: str = ',', encoding: str = 'utf-8-sig',
+                 date_format: Optional[str] = None,
+                 batch_size: int = BATCH_SIZE, commit_size: int = COMMIT_SIZE,
+                 progress: Optional[Callable[[ImportStats], None]] = None,
+                 progress_every: int = PROGRESS_EVERY):
+        self.model = model
+        self.columns = dict(columns or {})
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.date_formats = (date_format,) if date_format else DATE_FORMATS
+        self.batch_size = batch_size
+        self.commit_size = commit_size
+        self.progress = progress
+        self.progress_every = progress_every
+        self.stats = ImportStats()
+
+    def run(self, path: str) -> ImportStats:
+        """Импорт файла, возвращает итоговые счетчики"""
+        self.stats = ImportStats()
+        rows = self.map_rows(self.read_rows(path))
+
+        # Фиксация каждые commit_size строк, чтобы журнал не рос бесконечно
+        while True:
+            count = self.model.add_transactions_bulk(islice(rows, self.commit_size),
+                                                     self.batch_size)
+            self.stats.imported += count
+            if count < self.commit_size:
+                break
+
+        self.stats.tick()
+        if self.progress:
+            self.progress(self.stats)
+        return self.stats
+
+    def read_rows(self, path: str) -> Iterator[Dict[str, str]]:
+        """Построчное чтение CSV"""
+        with open(path, newline='', encoding=self.encoding) as file:
+            reader = csv.DictReader(file, delimiter=self.delimiter)
+            self._resolve_columns(reader.fieldnames or [])
+            yield from reader
+
+    def map_rows(self, records: Iterable[Dict[str, str]]) -> Iterator[Tuple]:
+        """Преобразование записей CSV в строки для add_transactions_bulk"""
+        stats = self.stats
+        for record in records:
+            stats.read += 1
+            row = self._map_record(record)
+            if row is None:
+                stats.skipped += 1
+            else:
+                yield row
+
+            if self.progress and stats.read % self.progress_every == 0:
+                stats.tick()
+                self.progress(stats)
+
+    def _resolve_columns(self, fieldnames):
+        """Сопоставление заголовков файла с полями операции"""
+        normalized = {name.strip().lower(): name for name in fieldnames}
+        for field, aliases in COLUMN_ALIASES.items():
+            if field in self.columns:
+                continue
+            for alias in aliases:
+                if alias in normalized:
+                    self.columns[field] = normalized[alias]
+                    break
+
+        missing = [field for field in ('date', 'amount') if field not in self.columns]
+        if missing:
+            raise ValueError(f"В файле нет столбцов: {', '.join(missing)}")
+
+    def _map_record(self, record: Dict[str, str]) -> Optional[Tuple]:
+        columns = self.columns
+        date = self._parse_date(record.get(columns['date']))
+        amount = self._parse_amount(record.get(columns['amount']))
+        if date is None or amount is None or amount == 0:
+            return None
+
+        type_ = None
+        if 'type' in columns:
+            type_ = TYPE_ALIASES.get((record.get(columns['type']) or '').strip().lower())
+        if type_ is None:
+            # Без столбца типа знак суммы определяет доход или расход
+            type_ = 'expense' if amount < 0 else 'income'
+
+        category_id = None
+        if 'category' in columns:
+            category_id = self._category_id(record.get(columns['category']), type_)
+
+        description = ''
+        if 'description' in columns:
+            description = (record.get(columns['description']) or '').strip()
+
+        return date, abs(amount), category_id, description, type_
+
+    def _parse_date(self, value: Optional[str]) -> Optional[str]:
+        value = (value or '').strip()
+        for date_format in self.date_formats:
+            try:
+                return datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+        return None
+
+    @staticmethod
+    def _parse_amount(value: Optional[str]) -> Optional[Decimal]:
+        # Decimal без промежуточного float: копейки из выписки не искажаются
+        value = (value or '').replace('\xa0', '').replace(' ', '').replace(',', '.')
+        try:
+            return to_decimal(value)
+        except ValueError:
+            return None
+
+    def _category_id(self, name: Optional[str], type_: str) -> Optional[int]:
+        """Поиск категории по названию в справочнике модели (в памяти)"""
+        return self.model.get_category_id_by_name(name, type_)
+
+
+def parse_columns(values: Iterable[str]) -> Dict[str, str]:
+    """Разбор сопоставлений вида поле=Заголовок"""
+    columns = {}
+    for value in values:
+        field, _, header = value.partition('=')
+        if field not in COLUMN_ALIASES or not header:
+            raise ValueError(f"Неверное сопоставление столбца: {value}")
+        columns[field] = header
+    return columns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Импорт банковской выписки CSV")
+    parser.add_argument('path', help="CSV-файл")
+    parser.add_argument('--db', default='finance.db', help="Файл базы данных")
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--encoding', default='utf-8-sig')
+    parser.add_argument('--date-format', default=None)
+    parser.add_argument('--column', action='append', default=[],
+                        help="Сопоставление поле=Заголовок, например amount=Сумма")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from model import FinanceModel
+
+    def report(stats):
+        print(stats, file=sys.stderr)
+
+    model = FinanceModel(args.db)
+    try:
+        importer = CsvImporter(model, parse_columns(args.column),
+                               delimiter=args.delimiter, encoding=args.encoding,
+                               date_format=args.date_format,
+                               batch_size=args.batch_size, progress=report)
+        stats = importer.run(args.path)
+    finally:
+        model.close()
+
+    print(f"Импорт завершен за {stats.elapsed:.1f} с. {stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Вызовы дольше порога попадают в журнал медленных запросов, мс
+SLOW_QUERY_MS = 100
+
+# Имя журнала медленных запросов рядом с файлом базы
+SLOW_LOG_NAME = 'slow_queries.log'
+
+# Сколько последних замеров хранится на каждый метод для p50/p95
+SAMPLE_SIZE = 1000
+
+# Методы доступа к данным, которые измеряются по умолчанию
+# (генераторы вроде iter_transactions не подходят: время уходит на чтение)
+TIMED_METHODS = (
+    'get_transactions', 'get_transactions_page', 'get_display_transactions_page',
+    'get_transaction', 'count_transactions', 'get_statistics', 'get_categories',
+    'add_transaction', 'add_transactions_bulk', 'delete_transaction',
+    'get_series', 'get_category_rollup',
+)
+
+# Методы, у которых измеряется только время: массовая запись выполняет
+# сотни тысяч операторов (вместе с триггерами), их запись в журнал
+# стоила бы дороже самой загрузки
+UNTRACED_METHODS = ('add_transactions_bulk',)
+
+# Не больше стольких разных операторов на один медленный вызов
+MAX_STATEMENTS = 50
+
+# Операторы, для которых в журнал пишется EXPLAIN QUERY PLAN
+_EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+
+def _count_rows(result) -> int:
+    """Число строк в результате метода модели"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], list):
+        return len(result[0])  # страница: (строки, ключ)
+    return 1
+
+
+def slow_log_path(db_name: str) -> str:
+    """Журнал медленных запросов в каталоге базы, а не в текущем каталоге"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), SLOW_LOG_NAME)
+
+
+def _percentile(values: List[float], share: float) -> float:
+    """Процентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+class MethodStats:
+    def __init__(self, sample_size: int = SAMPLE_SIZE):
+        self.count = 0
+        self.rows = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=sample_size)
+
+    def add(self, seconds: float, rows: int):
+        self.count += 1
+        self.rows += rows
+        self.total += seconds
+        self.samples.append(seconds)
+
+
+class Instrumentation:
+    """Замеры вызовов модели и журнал медленных запросов
+
+    instrument() оборачивает методы объекта (FinanceModel, Database).
+    Для каждого метода считаются вызовы, строки результата и p50/p95
+    времени. На время измеряемого вызова к соединению потока подключается
+    set_trace_callback; если вызов дольше threshold_ms, выполненные им
+    SQL-операторы (без повторов, не больше MAX_STATEMENTS) пишутся
+    в slow_log вместе с EXPLAIN QUERY PLAN.
+    """
+
+    def __init__(self, slow_log: Optional[str] = None,
+                 threshold_ms: float = SLOW_QUERY_MS,
+                 sample_size: int = SAMPLE_SIZE):
+        self.slow_log = slow_log
+        self.threshold_ms = threshold_ms
+        self.sample_size = sample_size
+        self.stats: Dict[str, MethodStats] = {}
+        self.slow_calls = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def instrument(self, store, methods: Iterable[str] = TIMED_METHODS):
+        """Подключение замеров к модели; возвращает ее же"""
+        for name in methods:
+            method = getattr(store, name, None)
+            if method is not None:
+                connections = None if name in UNTRACED_METHODS else store.connections
+                setattr(store, name, self.timed(name, method, connections))
+        return store
+
+    def timed(self, name: str, method: Callable, connections=None) -> Callable:
+        """Обертка с замером времени
+
+        connections - ConnectionManager, у соединения текущего потока
+        которого на время вызова записываются операторы; None - только время.
+        """
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            local = self._local
+            if not hasattr(local, 'statements'):
+                local.statements = []
+                local.seen = set()
+                local.dropped = 0
+                local.depth = 0
+
+            connection = None
+            if local.depth == 0 and connections is not None:
+                connection = connections.connection
+                connection.set_trace_callback(
+                    lambda statement: self._on_statement(connection, statement))
+
+            start = len(local.statements)
+            dropped = local.dropped
+            local.depth += 1
+            started = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - started
+                local.depth -= 1
+                if connection is not None:
+                    try:
+                        connection.set_trace_callback(None)
+                    except sqlite3.ProgrammingError:
+                        pass  # соединение закрыто внутри вызова
+
+            statements = local.statements[start:]
+            dropped = local.dropped - dropped
+            if local.depth == 0:
+                local.statements = []
+                local.seen = set()
+                local.dropped = 0
+
+            self.record(name, seconds, _count_rows(result))
+            if seconds * 1000 >= self.threshold_ms:
+                self._log_slow(name, seconds, statements, dropped)
+            return result
+
+        return wrapper
+
+    def record(self, name: str, seconds: float, rows: int = 0):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = MethodStats(self.sample_size)
+            stats.add(seconds, rows)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Сводка по методам, по убыванию общего времени; время в мс"""
+        with self._lock:
+            items = [(name, stats.count, stats.rows, stats.total, list(stats.samples))
+                     for name, stats in self.stats.items()]
+
+        result = {}
+        for name, count, rows, total, samples in sorted(items, key=lambda item: -item[3]):
+            result[name] = {
+                'count': count,
+                'rows': rows,
+                'total_ms': total * 1000,
+                'p50_ms': _percentile(samples, 0.5) * 1000,
+                'p95_ms': _percentile(samples, 0.95) * 1000,
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.slow_calls = 0
+
+    def _on_statement(self, connection, statement: str):
+        local = self._local
+        if not getattr(local, 'depth', 0) or getattr(local, 'explaining', False):
+            return
+        if statement in local.seen:
+            return
+        if len(local.statements) >= MAX_STATEMENTS:
+            local.dropped += 1
+            return
+        local.seen.add(statement)
+        local.statements.append((connection, statement))
+
+    def _explain(self, connection, statement: str) -> List[str]:
+        if not statement.lstrip().upper().startswith(_EXPLAINED):
+            return []
+
+        self._local.explaining = True
+        try:
+            rows = connection.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+        except Exception as e:  # например, объект уже удален
+            return [f"(план недоступен: {e})"]
+        finally:
+            self._local.explaining = False
+        return [row[-1] for row in rows]
+
+    def _log_slow(self, name: str, seconds: float, statements, dropped: int = 0):
+        with self._lock:
+            self.slow_calls += 1
+        if not self.slow_log:
+            return
+
+        lines = [f"{datetime.now().isoformat(timespec='seconds')} {name}: {seconds * 1000:.1f} мс"]
+        for connection, statement in statements:
+            lines.append(f"  {' '.join(statement.split())}")
+            lines.extend(f"    {step}" for step in self._explain(connection, statement))
+        if dropped:
+            lines.append(f"  ... еще {dropped} операторов не записано")
+
+        with self._lock:
+            try:
+                with open(self.slow_log, 'a', encoding='utf-8') as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError:
+                # Каталог только для чтения и т.п.: замеры продолжаются без журнала
+                self.slow_log = None
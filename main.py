@@ -1,10 +1,12 @@
+import time
 import tkinter as tk
 from controller import FinanceController
 
 
 def main():
+    started = time.perf_counter()
     root = tk.Tk()
-    app = FinanceController(root)
+    app = FinanceController(root, started=started)
 
     def on_closing():
         app.close()
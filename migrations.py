@@ -0,0 +1,134 @@
+import sqlite3
+from typing import Callable, List
+
+import aggregates
+import categories
+import partitions
+import search
+
+
+def _add_transaction_indexes(cursor: sqlite3.Cursor):
+    """Индексы для фильтрации по дате и подсчета статистики"""
+    cursor.execute('''
+                   CREATE INDEX IF NOT EXISTS idx_transactions_date
+                       ON transactions (date)
+                   ''')
+    cursor.execute('''
+                   CREATE INDEX IF NOT EXISTS idx_transactions_type_date_amount
+                       ON transactions (type, date, amount)
+                   ''')
+    cursor.execute('''
+                   CREATE INDEX IF NOT EXISTS idx_transactions_category_date
+                       ON transactions (category_id, date)
+                   ''')
+
+
+def _create_stats_snapshot(cursor: sqlite3.Cursor):
+    """Последние показанные итоги: выводятся при запуске до первого запроса"""
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS stats_snapshot
+                   (
+                       id INTEGER PRIMARY KEY CHECK (id = 1),
+                       start_date TEXT,
+                       end_date TEXT,
+                       income INTEGER NOT NULL,
+                       expense INTEGER NOT NULL,
+                       total_count INTEGER NOT NULL,
+                       saved_at TEXT DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+
+
+def _amounts_to_minor_units(cursor: sqlite3.Cursor):
+    """Перевод сумм из REAL (рубли) в INTEGER (копейки)
+
+    SQLite не меняет тип столбца, поэтому таблица пересоздается с копированием
+    строк. created_at переносится, если он был в старой схеме.
+    """
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(transactions)")]
+    kept = [column for column in ('created_at',) if column in columns]
+
+    cursor.execute('''
+                   CREATE TABLE transactions_minor
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       date TEXT NOT NULL,
+                       amount INTEGER NOT NULL,
+                       category_id INTEGER,
+                       description TEXT,
+                       type TEXT CHECK (type IN ('income', 'expense')) NOT NULL,
+                       created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                       FOREIGN KEY (category_id) REFERENCES categories (id)
+                   )
+                   ''')
+    names = ", ".join(["id", "date", "amount", "category_id", "description", "type"] + kept)
+    values = ", ".join(["id", "date", "CAST(ROUND(amount * 100) AS INTEGER)",
+                        "category_id", "description", "type"] + kept)
+    cursor.execute(f"INSERT INTO transactions_minor ({names}) SELECT {values} FROM transactions")
+
+    # Счетчик AUTOINCREMENT сохраняется, чтобы id удаленных операций не выдавались снова
+    sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()
+
+    # Вместе с таблицей удаляются ее индексы и триггеры итогов
+    cursor.execute("DROP TABLE transactions")
+    cursor.execute("ALTER TABLE transactions_minor RENAME TO transactions")
+    _add_transaction_indexes(cursor)
+
+    if sequence:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'transactions'",
+                       sequence)
+        if cursor.rowcount == 0:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('transactions', ?)",
+                           sequence)
+
+    cursor.execute("DROP TABLE IF EXISTS daily_totals")
+    cursor.execute("DROP TABLE IF EXISTS monthly_totals")
+    aggregates.create_aggregates(cursor)
+
+
+# Список миграций: версия схемы = позиция в списке + 1.
+# Новые миграции добавляются только в конец.
+MIGRATIONS: List[Callable[[sqlite3.Cursor], None]] = [
+    _add_transaction_indexes,
+    aggregates.create_aggregates,
+    _amounts_to_minor_units,
+    search.create_search_index,
+    categories.create_category_tree,
+    partitions.create_registry,
+    _create_stats_snapshot,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    """Текущая версия схемы базы (PRAGMA user_version)"""
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def is_current(connection: sqlite3.Connection) -> bool:
+    """Проверка, что база не требует миграций"""
+    return get_schema_version(connection) >= SCHEMA_VERSION
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    """Применение недостающих миграций, возвращает итоговую версию"""
+    version = get_schema_version(connection)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    # Каждая миграция выполняется в отдельной транзакции вместе
+    # с обновлением user_version, чтобы сбой не оставил схему наполовину
+    connection.commit()
+    cursor = connection.cursor()
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        try:
+            cursor.execute("BEGIN")
+            MIGRATIONS[number - 1](cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    return SCHEMA_VERSION
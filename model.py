@@ -1,17 +1,71 @@
-import sqlite3
+import heapq
+import itertools
+import os
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 
+import aggregates
+import migrations
+import partitions
+import search
+import series
+from bulk import BULK_BATCH_SIZE, INSERT_TRANSACTION_SQL, insert_transactions, prepare_transaction_row
+from cache import QueryCache, cached_query
+from categories import CATEGORY_COLUMNS, TREE_COLUMNS, TREE_TABLE, CategoryIndex
+from connection import ConnectionManager
+from money import Amount, from_minor, rows_from_minor, to_minor
+
+# Размер страницы при постраничном чтении транзакций
+PAGE_SIZE = 500
+
+TRANSACTION_COLUMNS = "t.id, t.date, t.amount, t.category_id, t.description, t.type"
+
+# Строки для таблицы: названия категорий и типа подставляются в SQL,
+# сумма остается в копейках и форматируется представлением
+DISPLAY_COLUMNS = '''
+                  t.id, t.date, t.amount,
+                  CASE WHEN t.category_id IS NULL THEN 'Без категории'
+                       ELSE COALESCE(c.name, 'Неизвестная категория') END,
+                  t.description,
+                  CASE t.type WHEN 'income' THEN 'Доход' ELSE 'Расход' END,
+                  t.type
+                  '''
 
 class FinanceModel:
-    def __init__(self, db_name='finance.db'):
+    def __init__(self, db_name='finance.db', read_only=False):
         self.db_name = db_name
-        self.connection = sqlite3.connect(db_name)
-        self.cursor = self.connection.cursor()
-        self.create_tables()
+        self.read_only = read_only
+        # У каждого потока свое соединение; read_only - только чтение (отчеты)
+        self.connections = ConnectionManager(db_name, read_only=read_only)
+        self.cache = QueryCache()
+        # Корзины рядов графика: сбрасываются по датам записанных операций
+        self.series_cache = series.SeriesCache()
+        # Счетчики изменений для кэшей вне модели (аналитика): inserts -
+        # добавления операций, revision - все прочие изменения, включая
+        # замеченные по data_version изменения из других соединений
+        self.inserts = 0
+        self.revision = 0
+        self._categories = None
+        self._partitions = None
+        if not read_only:
+            self.create_tables()
+
+    @property
+    def connection(self):
+        """Соединение текущего потока"""
+        return self.connections.connection
+
+    @property
+    def cursor(self):
+        """Курсор соединения текущего потока"""
+        return self.connections.cursor
 
     def create_tables(self):
         """Создание таблиц"""
+        # Актуальная схема: DDL и категории по умолчанию не нужны
+        if migrations.is_current(self.connection):
+            return
+
         self.cursor.execute('''
                             CREATE TABLE IF NOT EXISTS categories
                             (
@@ -54,7 +108,7 @@ class FinanceModel:
                                 NOT
                                 NULL,
                                 amount
-                                REAL
+                                INTEGER
                                 NOT
                                 NULL,
                                 category_id
@@ -75,6 +129,7 @@ class FinanceModel:
 
         self.create_default_categories()
         self.connection.commit()
+        migrations.migrate(self.connection)
 
     def create_default_categories(self):
         """Создание категорий по умолчанию"""
@@ -101,7 +156,7 @@ class FinanceModel:
                 )
             self.connection.commit()
 
-    def add_transaction(self, date: datetime, amount: float,
+    def add_transaction(self, date: datetime, amount: Amount,
                         category_id: Optional[int], description: str,
                         type_: str) -> int:
         """Добавление транзакции"""
@@ -110,99 +165,669 @@ class FinanceModel:
                             VALUES (?, ?, ?, ?, ?)
                             ''', (
                                 date.strftime('%Y-%m-%d'),
-                                amount,
+                                to_minor(amount),
                                 category_id,
                                 description,
                                 type_
                             ))
         self.connection.commit()
+        self.cache.clear()
+        self.series_cache.invalidate([date])
+        self.inserts += 1
         return self.cursor.lastrowid
 
+    def add_transactions_bulk(self, rows: Iterable, batch_size: int = BULK_BATCH_SIZE) -> int:
+        """Пакетное добавление транзакций в одной транзакции БД
+
+        Строки - кортежи (date, amount, category_id, description, type_)
+        или словари с такими ключами. Возвращает количество добавленных строк.
+        """
+        dates = set()
+        try:
+            return insert_transactions(self.cursor, rows, batch_size, dates)
+        finally:
+            self.cache.clear()
+            self.series_cache.invalidate(dates)
+            self.inserts += 1
+
+    def add_transactions(self, rows: Iterable) -> List[int]:
+        """Добавление нескольких транзакций одной транзакцией БД
+
+        Строки - как в add_transactions_bulk. В отличие от него возвращает
+        id добавленных строк по порядку. Ошибка в любой строке отменяет все.
+        """
+        prepared = [prepare_transaction_row(row, number) for number, row in enumerate(rows, 1)]
+        ids = []
+        self.cursor.execute("BEGIN")
+        try:
+            for row in prepared:
+                self.cursor.execute(INSERT_TRANSACTION_SQL, row)
+                ids.append(self.cursor.lastrowid)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            self.cache.clear()
+            self.series_cache.invalidate(row[0] for row in prepared)
+            self.inserts += 1
+        return ids
+
     def get_transactions(self, start_date: Optional[datetime] = None,
                          end_date: Optional[datetime] = None) -> List[Tuple]:
-        """Получение транзакций"""
-        query = "SELECT * FROM transactions WHERE 1=1"
+        """Получение транзакций (вместе с архивами за эти даты)"""
+        return rows_from_minor(self._routed_rows(start_date, end_date))
+
+    def get_transactions_page(self, start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None,
+                              limit: int = PAGE_SIZE,
+                              after: Optional[Tuple[str, int]] = None,
+                              offset: int = 0
+                              ) -> Tuple[List[Tuple], Optional[Tuple[str, int]]]:
+        """Страница транзакций с keyset-пагинацией по (date, id)
+
+        Возвращает строки и ключ для следующей страницы (None - страниц больше нет).
+        offset пропускает строки после ключа - для перехода в произвольное место.
+        """
+        return self._transactions_page(False, start_date, end_date, limit, after, offset)
+
+    def get_display_transactions_page(self, start_date: Optional[datetime] = None,
+                                      end_date: Optional[datetime] = None,
+                                      limit: int = PAGE_SIZE,
+                                      after: Optional[Tuple[str, int]] = None,
+                                      offset: int = 0
+                                      ) -> Tuple[List[Tuple], Optional[Tuple[str, int]]]:
+        """Страница транзакций в готовом для таблицы виде
+
+        Строки: (id, дата, сумма в копейках, название категории, описание,
+        тип по-русски, тип). Названия категорий подставляются JOIN-ом.
+        """
+        return self._transactions_page(True, start_date, end_date, limit, after, offset)
+
+    def get_transaction(self, transaction_id: int, display: bool = False) -> Optional[Tuple]:
+        """Получение одной транзакции (display - в виде строки таблицы)"""
+        query, params = self._transactions_query(None, None, display)
+        self.cursor.execute(query + " AND t.id = ?", params + [transaction_id])
+        row = self.cursor.fetchone()
+        if row is None or display:
+            return row
+        return rows_from_minor([row])[0]
+
+    def _transactions_page(self, display: bool, start_date: Optional[datetime],
+                           end_date: Optional[datetime], limit: int,
+                           after: Optional[Tuple[str, int]], offset: int
+                           ) -> Tuple[List[Tuple], Optional[Tuple[str, int]]]:
+        rows = self._routed_rows(start_date, end_date, display, after, limit, offset)
+        if not display:
+            rows = rows_from_minor(rows)
+
+        next_key = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return rows, next_key
+
+    def iter_transactions(self, start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None,
+                          chunk_size: int = PAGE_SIZE) -> Iterator[List[Tuple]]:
+        """Генератор транзакций порциями по chunk_size строк"""
+        after = None
+        while True:
+            rows, after = self.get_transactions_page(start_date, end_date, chunk_size, after)
+            if rows:
+                yield rows
+            if after is None:
+                break
+
+    def iter_transaction_columns(self, columns: str,
+                                 start_date: Optional[datetime] = None,
+                                 end_date: Optional[datetime] = None,
+                                 after_id: int = 0,
+                                 chunk_size: int = PAGE_SIZE) -> Iterator[List[Tuple]]:
+        """Порции строк с выражениями columns по операциям рабочей базы и архивов
+
+        Для чтения без порядка (аналитика): только операции с id больше
+        after_id, суммы в копейках. Порция прочитывается до подключения
+        следующей группы архивов, поэтому генератор нужно дочитывать.
+        """
+        for schemas in self._schema_groups(start_date, end_date):
+            parts, params = [], []
+            for schema in schemas:
+                query = f"SELECT {columns} FROM {schema}.transactions WHERE id > ?"
+                params.append(after_id)
+                if start_date:
+                    query += " AND date >= ?"
+                    params.append(start_date.strftime('%Y-%m-%d'))
+                if end_date:
+                    query += " AND date <= ?"
+                    params.append(end_date.strftime('%Y-%m-%d'))
+                parts.append(query)
+
+            cursor = self.connection.cursor()
+            cursor.execute(" UNION ALL ".join(parts), params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    @cached_query
+    def count_transactions(self, start_date: Optional[datetime] = None,
+                           end_date: Optional[datetime] = None) -> int:
+        """Количество транзакций в диапазоне дат"""
+        total = 0
+        for schemas in self._schema_groups(start_date, end_date):
+            query, params = self._routed_query(start_date, end_date, schemas)
+            self.cursor.execute(f"SELECT COUNT(*) FROM ({query})", params)
+            total += self.cursor.fetchone()[0]
+        return total
+
+    def _routed_rows(self, start_date: Optional[datetime],
+                     end_date: Optional[datetime],
+                     display: bool = False,
+                     after: Optional[Tuple[str, int]] = None,
+                     limit: Optional[int] = None,
+                     offset: int = 0) -> List[Tuple]:
+        """Строки транзакций по убыванию (date, id) из рабочей базы и архивов
+
+        Если архивы помещаются в одну группу подключения, LIMIT и OFFSET
+        выполняет SQLite. Иначе группы читаются порциями по keyset-ключу
+        и сливаются лениво: в памяти не больше порции на группу.
+        """
+        groups = self._archive_groups(start_date, end_date)
+        if len(groups) == 1:
+            schemas = self._group_schemas(0, groups[0])
+            query, params = self._routed_query(start_date, end_date, schemas, display, after,
+                                               None if limit is None else limit + offset)
+            query += " ORDER BY 2 DESC, 1 DESC LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall()
+
+        streams = [self._group_rows(number, group, start_date, end_date, display, after)
+                   for number, group in enumerate(groups)]
+        merged = heapq.merge(*streams, key=lambda row: (row[1], row[0]), reverse=True)
+        return list(itertools.islice(merged, offset, None if limit is None else offset + limit))
+
+    def _group_rows(self, number: int, group: List[int], start_date: Optional[datetime],
+                    end_date: Optional[datetime], display: bool,
+                    after: Optional[Tuple[str, int]]) -> Iterator[Tuple]:
+        """Строки одной группы схем порциями по PAGE_SIZE
+
+        Каждая порция читается целиком, поэтому между порциями к соединению
+        можно подключать архивы других групп.
+        """
+        while True:
+            schemas = self._group_schemas(number, group)
+            query, params = self._routed_query(start_date, end_date, schemas, display, after,
+                                               PAGE_SIZE)
+            self.cursor.execute(query + " ORDER BY 2 DESC, 1 DESC LIMIT ?", params + [PAGE_SIZE])
+            rows = self.cursor.fetchall()
+            yield from rows
+            if len(rows) < PAGE_SIZE:
+                return
+            after = (rows[-1][1], rows[-1][0])
+
+    def _routed_query(self, start_date: Optional[datetime],
+                      end_date: Optional[datetime],
+                      schemas: List[str],
+                      display: bool = False,
+                      after: Optional[Tuple[str, int]] = None,
+                      limit: Optional[int] = None) -> Tuple[str, List]:
+        """Запрос транзакций по схемам schemas (рабочая база и архивы)
+
+        Части объединяются UNION ALL, порядок задается снаружи по номерам
+        столбцов (2 - дата, 1 - id). limit ограничивает каждую часть, чтобы
+        страница не читала архивы целиком.
+        """
+        parts, params = [], []
+        for schema in schemas:
+            query, part_params = self._transactions_query(start_date, end_date, display, schema=schema)
+            if after:
+                # Эквивалент (date, id) < after, но с диапазоном по индексу date
+                query += " AND t.date <= ? AND (t.date < ? OR t.id < ?)"
+                part_params.extend([after[0], after[0], after[1]])
+            if limit is not None and len(schemas) > 1:
+                query = f"SELECT * FROM ({query} ORDER BY t.date DESC, t.id DESC LIMIT ?)"
+                part_params.append(limit)
+            parts.append(query)
+            params.extend(part_params)
+        return " UNION ALL ".join(parts), params
+
+    def _totals_source(self, start_date: Optional[datetime], end_date: Optional[datetime],
+                       columns: str, schemas: List[str]) -> Tuple[str, List]:
+        """Итоги за период по схемам schemas (рабочая база и архивы)"""
+        parts, params = [], []
+        for schema in schemas:
+            source, source_params = aggregates.totals_source(start_date, end_date, columns, schema)
+            parts.append(source)
+            params.extend(source_params)
+        return " UNION ALL ".join(parts), params
+
+    @property
+    def partitions(self) -> partitions.PartitionRegistry:
+        """Реестр архивных лет, загружаемый один раз"""
+        if self._partitions is None:
+            self.cursor.execute(f"SELECT year, file FROM {partitions.REGISTRY_TABLE}")
+            directory = os.path.dirname(os.path.abspath(self.db_name))
+            self._partitions = partitions.PartitionRegistry(self.cursor.fetchall(), directory)
+        return self._partitions
+
+    def _schema_groups(self, start_date: Optional[datetime],
+                       end_date: Optional[datetime]) -> Iterator[List[str]]:
+        """Схемы для запроса за диапазон: рабочая база и архивы его лет
+
+        Архивы подключаются к соединению потока группами не больше
+        partitions.MAX_ATTACHED, каждая следующая группа - на место
+        предыдущей. Рабочая база входит в первую группу. Результат запроса
+        по группе нужно прочитать до перехода к следующей.
+        """
+        for number, group in enumerate(self._archive_groups(start_date, end_date)):
+            yield self._group_schemas(number, group)
+
+    def _archive_groups(self, start_date: Optional[datetime],
+                        end_date: Optional[datetime]) -> List[List[int]]:
+        """Архивные годы диапазона группами для подключения"""
+        years = self.partitions.overlapping(start_date, end_date) if self.partitions else []
+        return partitions.groups(years)
+
+    def _group_schemas(self, number: int, group: List[int]) -> List[str]:
+        """Подключение группы архивов; рабочая база - в группе 0"""
+        schemas = ['main'] if number == 0 else []
+        if group:
+            schemas += partitions.attach(self.connection, self.partitions, group, self.read_only)
+        return schemas
+
+    def archive_year(self, year: int, vacuum: bool = False) -> int:
+        """Перенос операций закрытого года в архивный файл
+
+        Возвращает число перенесенных строк. vacuum - сразу уменьшить файл
+        рабочей базы. Архив только для чтения: операции в нем не удаляются
+        из приложения и не участвуют в полнотекстовом поиске.
+        """
+        _, moved = partitions.archive_year(self.connection, self.db_name, year)
+        self._partitions = None
+        self.cache.clear()
+        self.series_cache.clear()
+        self.revision += 1
+        if vacuum:
+            self.connection.execute("VACUUM")
+        return moved
+
+    def _transactions_query(self, start_date: Optional[datetime],
+                            end_date: Optional[datetime],
+                            display: bool = False,
+                            type_: Optional[str] = None,
+                            category_id: Optional[int] = None,
+                            match: Optional[str] = None,
+                            schema: str = 'main') -> Tuple[str, List]:
+        """Запрос транзакций с фильтром по датам, типу, категории и тексту"""
+        query = f"SELECT {DISPLAY_COLUMNS if display else TRANSACTION_COLUMNS} FROM "
         params = []
 
+        if match:
+            # Поиск: строки индекса FTS5 соединяются с транзакциями по rowid = id
+            query += f"{search.SEARCH_TABLE} f JOIN transactions t ON t.id = f.rowid"
+        else:
+            query += f"{schema}.transactions t"
+        if display:
+            query += " LEFT JOIN categories c ON c.id = t.category_id"
+
+        if match:
+            query += f" WHERE {search.SEARCH_TABLE} MATCH ?"
+            params.append(match)
+        else:
+            query += " WHERE 1=1"
+
+        if type_:
+            query += " AND t.type = ?"
+            params.append(type_)
+
+        if category_id is not None:
+            # Категория вместе со всеми подкатегориями
+            query += f" AND t.category_id IN (SELECT descendant_id FROM {TREE_TABLE} WHERE ancestor_id = ?)"
+            params.append(category_id)
+
         if start_date:
-            query += " AND date >= ?"
+            query += " AND t.date >= ?"
             params.append(start_date.strftime('%Y-%m-%d'))
 
         if end_date:
-            query += " AND date <= ?"
+            query += " AND t.date <= ?"
             params.append(end_date.strftime('%Y-%m-%d'))
 
-        query += " ORDER BY date DESC"
+        return query, params
+
+    def search_transactions(self, text: str,
+                            start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None,
+                            type_: Optional[str] = None,
+                            category_id: Optional[int] = None,
+                            limit: int = PAGE_SIZE,
+                            offset: int = 0,
+                            display: bool = False) -> Tuple[List[Tuple], Optional[int]]:
+        """Полнотекстовый поиск по описаниям с фильтрами
+
+        Результаты упорядочены по релевантности (bm25), при равной - новые
+        первыми. Возвращает строки (display - в виде строк таблицы) и offset
+        следующей страницы (None - страниц больше нет).
+        """
+        match = search.match_query(text)
+        if not match:
+            return [], None
+
+        query, params = self._transactions_query(start_date, end_date, display,
+                                                 type_, category_id, match)
+        query += " ORDER BY f.rank, t.date DESC, t.id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
 
         self.cursor.execute(query, params)
-        return self.cursor.fetchall()
+        rows = self.cursor.fetchall()
+        if not display:
+            rows = rows_from_minor(rows)
 
-    def get_categories(self, type_filter: Optional[str] = None) -> List[Tuple]:
-        """Получение категорий"""
-        query = "SELECT * FROM categories"
-        params = []
+        return rows, (offset + limit if len(rows) == limit else None)
 
-        if type_filter:
-            query += " WHERE type = ?"
-            params.append(type_filter)
+    def count_search_results(self, text: str,
+                             start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None,
+                             type_: Optional[str] = None,
+                             category_id: Optional[int] = None) -> int:
+        """Количество найденных транзакций"""
+        match = search.match_query(text)
+        if not match:
+            return 0
 
-        query += " ORDER BY name"
+        query, params = self._transactions_query(start_date, end_date, False,
+                                                 type_, category_id, match)
+        self.cursor.execute(f"SELECT COUNT(*) FROM ({query})", params)
+        return self.cursor.fetchone()[0]
 
-        self.cursor.execute(query, params)
+    @property
+    def categories(self) -> CategoryIndex:
+        """Справочник категорий, загружаемый один раз"""
+        if self._categories is None:
+            self.cursor.execute(f"SELECT {CATEGORY_COLUMNS} FROM categories")
+            rows = self.cursor.fetchall()
+            self._categories = CategoryIndex(rows, self._category_paths())
+        return self._categories
+
+    def _category_paths(self) -> List[Tuple]:
+        self.cursor.execute(f"SELECT {TREE_COLUMNS} FROM {TREE_TABLE}")
         return self.cursor.fetchall()
 
+    def get_categories(self, type_filter: Optional[str] = None) -> List[Tuple]:
+        """Получение категорий"""
+        self.check_data_version()
+        return self.categories.of_type(type_filter)
+
     def get_category_name(self, category_id: int) -> str:
         """Получение названия категории"""
         if category_id is None:
             return "Без категории"
 
-        self.cursor.execute("SELECT name FROM categories WHERE id = ?", (category_id,))
-        result = self.cursor.fetchone()
-        return result[0] if result else "Неизвестная категория"
+        category = self.categories.get(category_id)
+        return category[1] if category else "Неизвестная категория"
+
+    def get_category_id_by_name(self, name: str, type_: str) -> Optional[int]:
+        """Поиск категории по названию и типу (без учета регистра)"""
+        category = self.categories.find(name, type_)
+        return category[0] if category else None
+
+    def add_category(self, name: str, type_: str, parent_id: Optional[int] = None) -> int:
+        """Добавление категории, parent_id - родительская категория того же типа"""
+        self._check_parent(type_, parent_id)
+        self.cursor.execute("INSERT INTO categories (name, type, parent_id) VALUES (?, ?, ?)",
+                            (name, type_, parent_id))
+        self.connection.commit()
+        category_id = self.cursor.lastrowid
+        self.categories.add((category_id, name, type_))
+        if parent_id is not None:
+            self.categories.load_tree(self._category_paths())
+        return category_id
+
+    def move_category(self, category_id: int, parent_id: Optional[int]) -> bool:
+        """Перенос категории вместе с подкатегориями; None - в корень"""
+        category = self.categories.get(category_id)
+        if category is None:
+            return False
+        if parent_id is not None and (parent_id == category_id
+                                      or category_id in self.categories.ancestors(parent_id)):
+            raise ValueError("Категорию нельзя вложить в ее же подкатегорию")
+        self._check_parent(category[2], parent_id)
+
+        self.cursor.execute("UPDATE categories SET parent_id = ? WHERE id = ?", (parent_id, category_id))
+        self.connection.commit()
+        self.categories.load_tree(self._category_paths())
+        self.cache.clear()
+        return True
+
+    def _check_parent(self, type_: str, parent_id: Optional[int]):
+        if parent_id is None:
+            return
+        parent = self.categories.get(parent_id)
+        if parent is None:
+            raise ValueError("Родительская категория не найдена")
+        if parent[2] != type_:
+            raise ValueError("Родительская категория должна быть того же типа")
+
+    def rename_category(self, category_id: int, name: str) -> bool:
+        """Переименование категории"""
+        self.cursor.execute("UPDATE categories SET name = ? WHERE id = ?", (name, category_id))
+        self.connection.commit()
+        if self.cursor.rowcount == 0:
+            return False
+
+        self.cursor.execute(f"SELECT {CATEGORY_COLUMNS} FROM categories WHERE id = ?", (category_id,))
+        self.categories.add(self.cursor.fetchone())
+        self.cache.clear()
+        return True
+
+    def delete_category(self, category_id: int) -> bool:
+        """Удаление категории, операции остаются без категории
 
+        Подкатегории переходят к родителю удаленной категории.
+        """
+        parent_id = self.categories.parent(category_id)
+        try:
+            self.cursor.execute("UPDATE transactions SET category_id = NULL WHERE category_id = ?",
+                                (category_id,))
+            self.cursor.execute("UPDATE categories SET parent_id = ? WHERE parent_id = ?",
+                                (parent_id, category_id))
+            self.cursor.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            deleted = self.cursor.rowcount > 0
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+
+        self.categories.remove(category_id)
+        self.categories.load_tree(self._category_paths())
+        self.cache.clear()
+        self.revision += 1
+        return deleted
+
+    @cached_query
     def get_statistics(self, start_date: Optional[datetime] = None,
                        end_date: Optional[datetime] = None) -> Dict:
         """Получение статистики"""
-        query = '''
-                SELECT type, \
-                       SUM(amount) as total, \
-                       COUNT(*) as count
-                FROM transactions
-                WHERE 1=1 \
-                '''
-        params = []
+        # Целые месяцы берутся из monthly_totals, крайние дни - из daily_totals
+        totals = {'income': 0, 'expense': 0}
+        stats = {'total_count': 0}
+        for schemas in self._schema_groups(start_date, end_date):
+            source, params = self._totals_source(start_date, end_date, "type, total, count",
+                                                 schemas)
+            self.cursor.execute(f"SELECT type, SUM(total), SUM(count) FROM ({source}) GROUP BY type",
+                                params)
+            for type_, total, count in self.cursor.fetchall():
+                if type_ in totals:
+                    totals[type_] += total or 0
+                stats['total_count'] += count or 0
 
-        if start_date:
-            query += " AND date >= ?"
-            params.append(start_date.strftime('%Y-%m-%d'))
+        # Суммы складываются в копейках без погрешности, в рубли - только в конце
+        stats['income'] = from_minor(totals['income'])
+        stats['expense'] = from_minor(totals['expense'])
 
-        if end_date:
-            query += " AND date <= ?"
-            params.append(end_date.strftime('%Y-%m-%d'))
+        stats['balance'] = stats['income'] - stats['expense']
+        return stats
 
-        query += " GROUP BY type"
+    @cached_query
+    def get_category_rollup(self, start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None,
+                            level: Optional[int] = None) -> Dict[int, Tuple]:
+        """Итоги по категориям вместе с подкатегориями: {id: (сумма, количество)}
 
-        self.cursor.execute(query, params)
+        Один запрос: итоги за период соединяются с таблицей замыкания, так что
+        операция учитывается в своей категории и во всех ее предках.
+        level - только категории этого уровня (0 - корневые).
+        """
+        totals = {}
+        for schemas in self._schema_groups(start_date, end_date):
+            source, params = self._totals_source(start_date, end_date,
+                                                 "category_id, total, count", schemas)
+            self.cursor.execute(f'''
+                                SELECT tree.ancestor_id, SUM(s.total), SUM(s.count)
+                                FROM ({source}) s
+                                JOIN main.{TREE_TABLE} tree ON tree.descendant_id = s.category_id
+                                GROUP BY tree.ancestor_id
+                                ''', params)
+            for category_id, total, count in self.cursor.fetchall():
+                if level is None or self.categories.level(category_id) == level:
+                    previous_total, previous_count = totals.get(category_id, (0, 0))
+                    totals[category_id] = (previous_total + total, previous_count + count)
+
+        return {category_id: (from_minor(total), count)
+                for category_id, (total, count) in totals.items()}
 
-        stats = {'income': 0.0, 'expense': 0.0, 'balance': 0.0, 'total_count': 0}
-        for row in self.cursor.fetchall():
-            type_, total, count = row
-            if type_ == 'income':
-                stats['income'] = float(total or 0)
-            elif type_ == 'expense':
-                stats['expense'] = float(total or 0)
-            stats['total_count'] += count or 0
+    def get_stats_snapshot(self) -> Optional[Dict]:
+        """Последние сохраненные итоги (None - еще не сохранялись)
 
+        Кроме сумм в словаре период start_date/end_date ('ГГГГ-ММ-ДД' или None)
+        и время сохранения saved_at.
+        """
+        self.cursor.execute('''
+                            SELECT start_date, end_date, income, expense, total_count, saved_at
+                            FROM stats_snapshot WHERE id = 1
+                            ''')
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+
+        start_date, end_date, income, expense, total_count, saved_at = row
+        stats = {'income': from_minor(income), 'expense': from_minor(expense),
+                 'total_count': total_count}
         stats['balance'] = stats['income'] - stats['expense']
+        stats.update(start_date=start_date, end_date=end_date, saved_at=saved_at)
         return stats
 
+    def save_stats_snapshot(self, start_date: Optional[datetime],
+                            end_date: Optional[datetime], stats: Dict):
+        """Сохранение показанных итогов для следующего запуска"""
+        self.cursor.execute('''
+                            INSERT OR REPLACE INTO stats_snapshot
+                                (id, start_date, end_date, income, expense, total_count, saved_at)
+                            VALUES (1, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
+                            ''', (
+                                start_date.strftime('%Y-%m-%d') if start_date else None,
+                                end_date.strftime('%Y-%m-%d') if end_date else None,
+                                to_minor(stats['income']),
+                                to_minor(stats['expense']),
+                                stats['total_count']
+                            ))
+        self.connection.commit()
+
     def delete_transaction(self, transaction_id: int) -> bool:
         """Удаление транзакции"""
+        self.cursor.execute("SELECT date FROM transactions WHERE id = ?", (transaction_id,))
+        dates = [row[0] for row in self.cursor.fetchall()]
         self.cursor.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
         self.connection.commit()
+        self.cache.clear()
+        self.series_cache.invalidate(dates)
+        self.revision += 1
         return self.cursor.rowcount > 0
 
+    def get_series(self, start_date: Optional[datetime] = None,
+                   end_date: Optional[datetime] = None,
+                   bin_: Optional[str] = None) -> Tuple[str, List[Tuple]]:
+        """Доходы и расходы по корзинам дней, недель или месяцев
+
+        Шаг по умолчанию выбирается по длине периода (series.choose_bin),
+        период расширяется до целых корзин. Открытые границы берутся по
+        первой и последней операции. Возвращает шаг и строки
+        (ключ корзины, доходы, расходы), включая пустые корзины.
+        Посчитанные корзины кэшируются, из базы читаются только новые
+        и сброшенные записью.
+        """
+        self.check_data_version()
+        if start_date is None or end_date is None:
+            first, last = self._date_bounds()
+            if first is None:
+                return bin_ or series.DAY, []
+            start_date = start_date or first
+            end_date = end_date or last
+
+        bin_ = bin_ or series.choose_bin(start_date, end_date)
+        keys = series.bucket_keys(start_date, end_date, bin_)
+        missing = self.series_cache.missing(bin_, keys)
+        if missing:
+            self.series_cache.put(bin_, self._series_buckets(bin_, missing))
+
+        return bin_, [(key, from_minor(income), from_minor(expense))
+                      for key, income, expense in self.series_cache.get(bin_, keys)]
+
+    def _series_buckets(self, bin_: str, keys: List[str]) -> Dict[str, Tuple[int, int]]:
+        """Итоги корзин keys одним запросом по таблицам итогов"""
+        low, high = series.key_range(keys[0], keys[-1], bin_)
+        table, column, bucket = series.BUCKET_SQL[bin_]
+        years = (datetime(int(low[:4]), 1, 1), datetime(int(high[:4]), 12, 31))
+
+        # Корзины без операций тоже запоминаются - нулями
+        values = dict.fromkeys(keys, (0, 0))
+        for schemas in self._schema_groups(*years):
+            parts = [f"SELECT {bucket} AS bucket, type, total FROM {schema}.{table} "
+                     f"WHERE {column} >= ? AND {column} <= ?" for schema in schemas]
+            self.cursor.execute(f'''
+                                SELECT bucket,
+                                       SUM(CASE WHEN type = 'income' THEN total ELSE 0 END),
+                                       SUM(CASE WHEN type = 'expense' THEN total ELSE 0 END)
+                                FROM ({" UNION ALL ".join(parts)})
+                                GROUP BY bucket
+                                ''', [low, high] * len(schemas))
+            for key, income, expense in self.cursor.fetchall():
+                if key in values:
+                    values[key] = (values[key][0] + income, values[key][1] + expense)
+        return values
+
+    def _date_bounds(self) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Даты первой и последней операции с учетом архивов"""
+        bounds = []
+        for schemas in self._schema_groups(None, None):
+            parts = [f"SELECT MIN(day) AS first, MAX(day) AS last FROM {schema}.daily_totals"
+                     for schema in schemas]
+            self.cursor.execute(f"SELECT MIN(first), MAX(last) FROM ({' UNION ALL '.join(parts)})")
+            bounds.append(self.cursor.fetchone())
+
+        firsts = [first for first, _ in bounds if first is not None]
+        if not firsts:
+            return None, None
+        first, last = min(firsts), max(last for _, last in bounds if last is not None)
+        return datetime.strptime(first, '%Y-%m-%d'), datetime.strptime(last, '%Y-%m-%d')
+
+    def check_data_version(self):
+        """Сброс кэшей, если базу изменило другое соединение"""
+        # data_version у каждого соединения свой, поэтому хранится по потокам
+        local = self.connections.local
+        version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if version != getattr(local, 'data_version', None):
+            self.cache.clear()
+            self.series_cache.clear()
+            self._categories = None
+            self._partitions = None
+            self.revision += 1
+            local.data_version = version
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Счетчики кэша запросов: hits, misses, size"""
+        return self.cache.stats()
+
     def close(self):
-        """Закрытие соединения"""
-        if hasattr(self, 'connection') and self.connection:
-            self.connection.close()
\ No newline at end of file
+        """Закрытие соединений всех потоков"""
+        self.connections.close_all()
\ No newline at end of file
@@ -0,0 +1,58 @@
+from decimal import ROUND_HALF_UP, Decimal, DecimalException
+from typing import Iterable, List, Tuple, Union
+
+# Суммы хранятся в копейках (целые числа), наружу отдаются рублями Decimal
+MINOR_UNITS = 100
+CURRENCY = '₽'
+
+# Наибольшая сумма в копейках: столбец INTEGER в SQLite - 64 бита
+MAX_MINOR = 2 ** 63 - 1
+
+_KOPECK = Decimal('0.01')
+
+Amount = Union[int, float, str, Decimal]
+
+
+def to_decimal(amount: Amount) -> Decimal:
+    """Сумма в рублях, округленная до копеек
+
+    float переводится через str, чтобы 0.1 стало ровно 0.10. bool, значения
+    вне точности Decimal и суммы больше MAX_MINOR копеек - ValueError.
+    """
+    if isinstance(amount, bool):
+        raise ValueError(f"Неверная сумма: {amount!r}")
+    if isinstance(amount, float):
+        amount = repr(amount)
+    try:
+        value = Decimal(amount)
+        if not value.is_finite():
+            raise ValueError(f"Неверная сумма: {amount!r}")
+        value = value.quantize(_KOPECK, rounding=ROUND_HALF_UP)
+    except (DecimalException, TypeError):
+        raise ValueError(f"Неверная сумма: {amount!r}")
+    if abs(value) * MINOR_UNITS > MAX_MINOR:
+        raise ValueError(f"Слишком большая сумма: {amount!r}")
+    return value
+
+
+def to_minor(amount: Amount) -> int:
+    """Рубли -> копейки"""
+    return int(to_decimal(amount) * MINOR_UNITS)
+
+
+def from_minor(minor: int) -> Decimal:
+    """Копейки -> рубли"""
+    return Decimal(minor or 0).scaleb(-2)
+
+
+def format_minor(minor: int) -> str:
+    """Строка для интерфейса: 1234.50 ₽"""
+    minor = minor or 0
+    sign = '-' if minor < 0 else ''
+    rubles, kopecks = divmod(abs(minor), MINOR_UNITS)
+    return f"{sign}{rubles}.{kopecks:02d} {CURRENCY}"
+
+
+def rows_from_minor(rows: Iterable[Tuple], index: int = 2) -> List[Tuple]:
+    """Строки выборки с суммой в столбце index, переведенной в рубли"""
+    return [row[:index] + (from_minor(row[index]),) + row[index + 1:] for row in rows]
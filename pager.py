@@ -0,0 +1,218 @@
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+# Строк на страницу и число страниц, которые держим в памяти
+PAGE_SIZE = 200
+MAX_CACHED_PAGES = 16
+
+# Страниц результатов поиска, читаемых вместе с количеством
+SEARCH_PREFETCH_PAGES = 3
+
+# fetch_page(limit, after, offset) -> (rows, next_key), как get_transactions_page
+FetchPage = Callable[[int, Optional[Tuple[str, int]], int], Tuple[List[Tuple], Optional[Tuple]]]
+
+# request_rows(offset, limit) - заказ строк фоновому потоку
+RequestRows = Callable[[int, int], None]
+
+# request_page(limit, after, offset, deliver) - заказ страницы фоновому потоку,
+# deliver(rows) по приходу или deliver(None) при ошибке
+RequestPage = Callable[[int, Optional[Tuple[str, int]], int, Callable[[Optional[List[Tuple]]], None]], None]
+
+
+class TransactionPager:
+    """Постраничный доступ к результату запроса по номеру строки
+
+    Страницы подгружаются по мере обращения и хранятся в небольшом LRU-кэше.
+    Для прочитанных страниц запоминаются опорные keyset-ключи (date, id),
+    поэтому последовательная прокрутка не использует OFFSET, а переход
+    в произвольное место пропускает строки от ближайшего известного ключа.
+
+    Если задан request_page, страницы не читаются в потоке окна: недостающая
+    заказывается, а get_rows до ее прихода отдает строки только до нее.
+    Следующая страница заказывается впрок, когда ее опорный ключ уже известен.
+    """
+
+    def __init__(self, fetch_page: Optional[FetchPage], total: int,
+                 page_size: int = PAGE_SIZE, max_pages: int = MAX_CACHED_PAGES,
+                 first_page: Optional[List[Tuple]] = None,
+                 request_page: Optional[RequestPage] = None):
+        self.fetch_page = fetch_page
+        self.request_page = request_page
+        self.total = total
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        # Заказанные страницы и номер состояния кэша: ответ на заказ,
+        # сделанный до вставки или удаления строки, уже не годится
+        self._requested = set()
+        self._version = 0
+        # Номер строки -> ключ строки, стоящей непосредственно перед ней
+        self._anchors = {0: None}
+        self._anchor_offsets = [0]
+
+        # Первая страница, уже прочитанная вместе с количеством строк
+        if first_page is not None:
+            self._store(0, first_page)
+
+    def get_rows(self, offset: int, count: int) -> List[Tuple]:
+        """Строки с offset по offset + count"""
+        rows = []
+        end = min(offset + count, self.total)
+        while offset < end:
+            index, start = divmod(offset, self.page_size)
+            page = self._page(index)
+            if page is None:
+                return rows
+            part = page[start:start + end - offset]
+            if not part:
+                break
+            rows.extend(part)
+            offset += len(part)
+
+        # Окно целиком в кэше: следующая страница заказывается впрок
+        following = (offset + self.page_size - 1) // self.page_size
+        if (self.request_page is not None and rows and following * self.page_size < self.total
+                and following * self.page_size in self._anchors):
+            self._page(following)
+        return rows
+
+    def insert(self, key: Tuple[str, int]):
+        """Учет добавленной строки с ключом (date, id) без перечитывания"""
+        self.total += 1
+        self._shift(lambda anchor: key > anchor, 1)
+
+    def remove(self, key: Tuple[str, int]):
+        """Учет удаленной строки с ключом (date, id)"""
+        self.total -= 1
+        self._shift(lambda anchor: key >= anchor, -1)
+
+    def _shift(self, before_anchor, delta: int):
+        """Сдвиг опорных точек, после которых оказалась измененная строка"""
+        # Страницы после места изменения сместились - остаются только
+        # полные страницы целиком перед ним
+        for index, rows in list(self._pages.items()):
+            if len(rows) < self.page_size or before_anchor((rows[-1][1], rows[-1][0])):
+                del self._pages[index]
+        self._requested.clear()
+        self._version += 1
+
+        anchors = {0: None}
+        for offset, anchor in self._anchors.items():
+            if anchor is not None:
+                anchors[offset + delta if before_anchor(anchor) else offset] = anchor
+        self._anchors = anchors
+        self._anchor_offsets = sorted(anchors)
+
+    def _page(self, index: int) -> Optional[List[Tuple]]:
+        """Страница из кэша, прочитанная сейчас или None, если она заказана"""
+        rows = self._pages.get(index)
+        if rows is not None:
+            self._pages.move_to_end(index)
+            return rows
+
+        target = index * self.page_size
+        known = self._anchor_offsets[bisect_right(self._anchor_offsets, target) - 1]
+        if self.request_page is None:
+            rows, _ = self.fetch_page(self.page_size, self._anchors[known], target - known)
+            self._store(index, rows)
+            return rows
+
+        if index not in self._requested:
+            self._requested.add(index)
+            version = self._version
+            self.request_page(self.page_size, self._anchors[known], target - known,
+                              lambda rows: self._arrived(index, version, rows))
+        return None
+
+    def _arrived(self, index: int, version: int, rows: Optional[List[Tuple]]):
+        """Ответ на заказ страницы; rows - None, если запрос не выполнен"""
+        if version != self._version:
+            return
+        self._requested.discard(index)
+        if rows is not None:
+            self._store(index, rows)
+
+    def _store(self, index: int, rows: List[Tuple]):
+        """Сохранение страницы в кэше и опорной точки после нее"""
+        self._pages[index] = rows
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+        following = index * self.page_size + len(rows)
+        if len(rows) == self.page_size and following not in self._anchors:
+            self._anchors[following] = (rows[-1][1], rows[-1][0])
+            insort(self._anchor_offsets, following)
+
+
+class SearchPager:
+    """Кэш страниц результатов поиска по номеру строки
+
+    Результаты упорядочены по релевантности, keyset-ключей у них нет,
+    а запрос с OFFSET заново ранжирует все совпадения. Поэтому страницы
+    не читаются в потоке окна: недостающие (и одна следующая - впрок)
+    заказываются через request_rows, а get_rows до их прихода отдает
+    строки только до первой недостающей страницы. Пришедшие строки
+    сохраняются через store().
+    """
+
+    def __init__(self, request_rows: RequestRows, total: int,
+                 page_size: int = PAGE_SIZE, max_pages: int = MAX_CACHED_PAGES,
+                 first_rows: Optional[List[Tuple]] = None):
+        self.request_rows = request_rows
+        self.total = total
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        # Заказанные и еще не пришедшие страницы
+        self._requested = set()
+
+        if first_rows:
+            self.store(0, first_rows)
+
+    def get_rows(self, offset: int, count: int) -> List[Tuple]:
+        """Строки с offset по offset + count, уже находящиеся в кэше"""
+        end = min(offset + count, self.total)
+        if offset >= end:
+            return []
+        first, last = offset // self.page_size, (end - 1) // self.page_size
+        self._request(first, min(last + 1, (self.total - 1) // self.page_size))
+
+        rows = []
+        while offset < end:
+            index, start = divmod(offset, self.page_size)
+            page = self._pages.get(index)
+            if page is None:
+                break
+            self._pages.move_to_end(index)
+            part = page[start:start + end - offset]
+            if not part:
+                break
+            rows.extend(part)
+            offset += len(part)
+        return rows
+
+    def store(self, offset: int, rows: List[Tuple]):
+        """Сохранение строк, начиная с offset (на границе страницы)"""
+        for start in range(0, len(rows), self.page_size):
+            index = (offset + start) // self.page_size
+            self._pages[index] = rows[start:start + self.page_size]
+            self._pages.move_to_end(index)
+            self._requested.discard(index)
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+    def failed(self, offset: int, limit: int):
+        """Заказ не выполнен: страницы можно заказать снова"""
+        for index in range(offset // self.page_size, (offset + limit) // self.page_size):
+            self._requested.discard(index)
+
+    def _request(self, first: int, last: int):
+        """Один заказ на диапазон недостающих страниц first..last"""
+        missing = [index for index in range(first, last + 1)
+                   if index not in self._pages and index not in self._requested]
+        if not missing:
+            return
+        self._requested.update(range(missing[0], missing[-1] + 1))
+        self.request_rows(missing[0] * self.page_size,
+                          (missing[-1] - missing[0] + 1) * self.page_size)
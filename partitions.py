@@ -0,0 +1,200 @@
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aggregates
+
+# Реестр архивов в рабочей базе: закрытые годы вынесены в отдельные файлы
+# <имя базы>_<год>.db рядом с ней и подключаются ATTACH только для запросов,
+# диапазон дат которых пересекается с годом
+REGISTRY_TABLE = 'partitions'
+
+SCHEMA_PREFIX = 'archive_'
+
+# SQLite по умолчанию допускает 10 подключенных баз: архивов подключается
+# не больше MAX_ATTACHED, одно место остается для archive_year
+MAX_ATTACHED = 8
+
+ARCHIVE_COLUMNS = "id, date, amount, category_id, description, type, created_at"
+
+
+def create_registry(cursor: sqlite3.Cursor):
+    """Таблица реестра архивов"""
+    cursor.execute(f'''
+                   CREATE TABLE IF NOT EXISTS {REGISTRY_TABLE}
+                   (
+                       year INTEGER PRIMARY KEY,
+                       file TEXT NOT NULL,
+                       row_count INTEGER NOT NULL DEFAULT 0,
+                       archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+
+
+def archive_path(db_name: str, year: int) -> str:
+    """Файл архива года рядом с рабочей базой"""
+    stem = os.path.splitext(db_name)[0]
+    return f"{stem}_{year}.db"
+
+
+def schema_name(year: int) -> str:
+    return f"{SCHEMA_PREFIX}{year}"
+
+
+class PartitionRegistry:
+    """Архивные годы и их файлы (строки реестра: year, file)"""
+
+    def __init__(self, rows, directory: str):
+        self.paths: Dict[int, str] = {year: os.path.join(directory, file) for year, file in rows}
+
+    def __bool__(self):
+        return bool(self.paths)
+
+    def overlapping(self, start_date: Optional[date], end_date: Optional[date]) -> List[int]:
+        """Архивные годы, пересекающиеся с диапазоном дат"""
+        first = start_date.year if start_date else None
+        last = end_date.year if end_date else None
+        return sorted(year for year in self.paths
+                      if (first is None or year >= first) and (last is None or year <= last))
+
+
+def groups(years: List[int], size: int = MAX_ATTACHED) -> List[List[int]]:
+    """Годы группами, которые можно подключить одновременно
+
+    Без архивов - одна пустая группа: запрос идет только к рабочей базе.
+    """
+    return [years[start:start + size] for start in range(0, len(years), size)] or [[]]
+
+
+def attach(connection: sqlite3.Connection, registry: PartitionRegistry,
+           years: List[int], read_only: bool = False) -> List[str]:
+    """Подключение архивов years к соединению, возвращает имена схем
+
+    Уже подключенные архивы не переподключаются. Если вместе с новыми
+    их больше MAX_ATTACHED, ненужные этому запросу отключаются. Больше
+    MAX_ATTACHED лет за раз не подключается - см. groups().
+    """
+    if len(years) > MAX_ATTACHED:
+        raise ValueError(f"За один запрос подключается не больше {MAX_ATTACHED} архивов")
+    attached = {row[1] for row in connection.execute("PRAGMA database_list")
+                if row[1].startswith(SCHEMA_PREFIX)}
+    wanted = [schema_name(year) for year in years]
+    if len(attached | set(wanted)) > MAX_ATTACHED:
+        for schema in attached - set(wanted):
+            connection.execute(f"DETACH DATABASE {schema}")
+            attached.discard(schema)
+
+    for year, schema in zip(years, wanted):
+        if schema in attached:
+            continue
+        path = registry.paths[year]
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Архив за {year} год не найден: {path}")
+        if read_only:
+            path = Path(path).resolve().as_uri() + '?mode=ro'
+        connection.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    return wanted
+
+
+def archive_year(connection: sqlite3.Connection, db_name: str, year: int) -> Tuple[str, int]:
+    """Перенос операций закрытого года в архивный файл
+
+    Сначала строки копируются в архив (своя транзакция, повторный запуск
+    безопасен: строки с теми же id заменяются), затем в одной транзакции
+    рабочей базы удаляются перенесенные строки и обновляется реестр.
+    Операции, добавленные в архивный год позже, дописываются в тот же файл.
+    Архив, подключенный только для переноса, затем отключается.
+    Возвращает путь архива и число перенесенных строк.
+    """
+    if year >= date.today().year:
+        raise ValueError("Архивировать можно только закрытый год")
+
+    first_day, last_day = f"{year}-01-01", f"{year}-12-31"
+    path = archive_path(db_name, year)
+    connection.commit()
+
+    archive = sqlite3.connect(path)
+    try:
+        archive.execute("ATTACH DATABASE ? AS hot", (db_name,))
+        archive.execute('''
+                        CREATE TABLE IF NOT EXISTS transactions
+                        (
+                            id INTEGER PRIMARY KEY,
+                            date TEXT NOT NULL,
+                            amount INTEGER NOT NULL,
+                            category_id INTEGER,
+                            description TEXT,
+                            type TEXT CHECK (type IN ('income', 'expense')) NOT NULL,
+                            created_at TEXT
+                        )
+                        ''')
+        archive.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)")
+        cursor = archive.execute(f'''
+                                 INSERT OR REPLACE INTO transactions ({ARCHIVE_COLUMNS})
+                                 SELECT {ARCHIVE_COLUMNS} FROM hot.transactions
+                                 WHERE date >= ? AND date <= ?
+                                 ''', (first_day, last_day))
+        moved = cursor.rowcount
+        # Итоги архива для статистики - по всем его строкам
+        aggregates.create_aggregates(archive.cursor())
+        archive.commit()
+        archive.execute("DETACH DATABASE hot")
+    finally:
+        archive.close()
+
+    schema = schema_name(year)
+    attached = {row[1] for row in connection.execute("PRAGMA database_list")}
+    if schema not in attached:
+        connection.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute(f'''
+                       DELETE FROM main.transactions
+                       WHERE date >= ? AND date <= ?
+                         AND id IN (SELECT id FROM {schema}.transactions)
+                       ''', (first_day, last_day))
+        # Триггеры итогов оставляют нулевые строки за перенесенные дни
+        cursor.execute("DELETE FROM main.daily_totals WHERE count = 0")
+        cursor.execute("DELETE FROM main.monthly_totals WHERE count = 0")
+        cursor.execute(f'''
+                       INSERT OR REPLACE INTO main.{REGISTRY_TABLE} (year, file, row_count)
+                       VALUES (?, ?, (SELECT COUNT(*) FROM {schema}.transactions))
+                       ''', (year, os.path.basename(path)))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        if schema not in attached:
+            connection.execute(f"DETACH DATABASE {schema}")
+
+    return path, moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перенос закрытых лет в архивные файлы")
+    parser.add_argument('years', nargs='+', type=int, help="Годы для архивации")
+    parser.add_argument('--db', default='finance.db', help="Файл рабочей базы")
+    parser.add_argument('--vacuum', action='store_true', help="Сжать рабочую базу после переноса")
+    args = parser.parse_args(argv)
+
+    from model import FinanceModel
+
+    model = FinanceModel(args.db)
+    try:
+        for number, year in enumerate(sorted(args.years), 1):
+            moved = model.archive_year(year, vacuum=args.vacuum and number == len(args.years))
+            print(f"{year}: перенесено {moved} строк в {archive_path(args.db, year)}")
+    finally:
+        model.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
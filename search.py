@@ -0,0 +1,60 @@
+import re
+import sqlite3
+
+# Полнотекстовый индекс по описаниям операций (FTS5 с внешним содержимым:
+# текст хранится только в transactions, индекс поддерживают триггеры).
+# unicode61 приводит регистр и для кириллицы.
+SEARCH_TABLE = 'transactions_fts'
+
+_WORD = re.compile(r'\w+')
+
+
+def create_search_index(cursor: sqlite3.Cursor):
+    """Таблица FTS5, триггеры синхронизации и заполнение по transactions"""
+    cursor.execute(f'''
+                   CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+                       description,
+                       content='transactions',
+                       content_rowid='id',
+                       tokenize='unicode61 remove_diacritics 2'
+                   )
+                   ''')
+
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_insert
+                       AFTER INSERT ON transactions
+                   BEGIN
+                       INSERT INTO {SEARCH_TABLE} (rowid, description)
+                       VALUES (NEW.id, NEW.description);
+                   END
+                   ''')
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_delete
+                       AFTER DELETE ON transactions
+                   BEGIN
+                       INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, description)
+                       VALUES ('delete', OLD.id, OLD.description);
+                   END
+                   ''')
+    cursor.execute(f'''
+                   CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_update
+                       AFTER UPDATE OF description ON transactions
+                   BEGIN
+                       INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, description)
+                       VALUES ('delete', OLD.id, OLD.description);
+                       INSERT INTO {SEARCH_TABLE} (rowid, description)
+                       VALUES (NEW.id, NEW.description);
+                   END
+                   ''')
+
+    cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def match_query(text: str) -> str:
+    """Выражение MATCH из введенного текста
+
+    Каждое слово ищется как префикс ("такс" найдет "Такси"), все слова
+    должны встретиться. Кавычки и операторы FTS5 во вводе не действуют.
+    Пустая строка - слов нет.
+    """
+    return ' '.join(f'"{word}"*' for word in _WORD.findall(text or ''))
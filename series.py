@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Ряды доходов и расходов для графика. Шаг выбирается по длине периода так,
+# чтобы точек было не больше пары сотен: десять лет - 120 месяцев.
+DAY, WEEK, MONTH = 'day', 'week', 'month'
+
+# Предельная длина периода в днях для дневного и недельного шага
+DAY_BINS_MAX_DAYS = 120
+WEEK_BINS_MAX_DAYS = 3 * 366
+
+# Ключ корзины в SQL: день, понедельник недели или месяц
+BUCKET_SQL = {
+    DAY: ('daily_totals', 'day', 'day'),
+    WEEK: ('daily_totals', 'day', "date(day, '-6 days', 'weekday 1')"),
+    MONTH: ('monthly_totals', 'month', 'month'),
+}
+
+
+def _as_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def choose_bin(start_date, end_date) -> str:
+    """Шаг ряда по длине периода"""
+    days = (_as_date(end_date) - _as_date(start_date)).days + 1
+    if days <= DAY_BINS_MAX_DAYS:
+        return DAY
+    if days <= WEEK_BINS_MAX_DAYS:
+        return WEEK
+    return MONTH
+
+
+def bucket_start(day: date, bin_: str) -> date:
+    """Первый день корзины, в которую попадает day"""
+    if bin_ == WEEK:
+        return day - timedelta(days=day.weekday())
+    if bin_ == MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def bucket_key(day: date, bin_: str) -> str:
+    start = bucket_start(day, bin_)
+    return start.strftime('%Y-%m') if bin_ == MONTH else start.isoformat()
+
+
+def next_bucket(day: date, bin_: str) -> date:
+    """Первый день следующей корзины"""
+    if bin_ == WEEK:
+        return day + timedelta(days=7)
+    if bin_ == MONTH:
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def bucket_keys(start_date, end_date, bin_: str) -> List[str]:
+    """Ключи всех корзин периода, включая пустые, по порядку"""
+    day = bucket_start(_as_date(start_date), bin_)
+    last = _as_date(end_date)
+    keys = []
+    while day <= last:
+        keys.append(bucket_key(day, bin_))
+        day = next_bucket(day, bin_)
+    return keys
+
+
+def key_range(first_key: str, last_key: str, bin_: str) -> Tuple[str, str]:
+    """Границы выборки для корзин first_key..last_key в единицах таблицы итогов"""
+    if bin_ == MONTH:
+        return first_key, last_key
+    last = date.fromisoformat(last_key)
+    if bin_ == WEEK:
+        last += timedelta(days=6)
+    return first_key, last.isoformat()
+
+
+class SeriesCache:
+    """Кэш корзин рядов: {шаг: {ключ: (доходы, расходы) в копейках}}
+
+    Запись операции сбрасывает только корзины ее даты (день, неделю и
+    месяц), остальные остаются посчитанными. recomputed - сколько корзин
+    пришлось прочитать из базы: для проверки и замеров.
+    """
+
+    def __init__(self):
+        self.bins: Dict[str, Dict[str, Tuple[int, int]]] = {DAY: {}, WEEK: {}, MONTH: {}}
+        self.recomputed = 0
+
+    def missing(self, bin_: str, keys: Iterable[str]) -> List[str]:
+        cached = self.bins[bin_]
+        return [key for key in keys if key not in cached]
+
+    def put(self, bin_: str, values: Dict[str, Tuple[int, int]]):
+        self.bins[bin_].update(values)
+        self.recomputed += len(values)
+
+    def get(self, bin_: str, keys: Iterable[str]) -> List[Tuple[str, int, int]]:
+        cached = self.bins[bin_]
+        return [(key,) + cached[key] for key in keys]
+
+    def invalidate(self, dates: Iterable):
+        """Сброс корзин, в которые попадают даты записанных операций"""
+        for value in dates:
+            day = _as_date(value)
+            for bin_, cached in self.bins.items():
+                cached.pop(bucket_key(day, bin_), None)
+
+    def clear(self):
+        for cached in self.bins.values():
+            cached.clear()
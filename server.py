@@ -0,0 +1,418 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from export import parse_date
+from model import PAGE_SIZE, FinanceModel
+
+# Локальный HTTP/JSON API для нескольких пользователей одной finance.db.
+# Чтение - пулом потоков со своими моделями (соединения mode=ro),
+# запись - одним потоком: запросы на добавление, пришедшие пока идет
+# запись, объединяются в одну транзакцию (групповая фиксация).
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+# Потоков чтения (и соединений SQLite в режиме только для чтения)
+READERS = 4
+
+# Предел строк на страницу и строк в одной групповой записи
+MAX_PAGE_SIZE = 1000
+MAX_WRITE_BATCH = 500
+
+# Ожидающих записи запросов; дальше клиенты ждут места в очереди
+WRITE_QUEUE_SIZE = 1000
+
+MAX_BODY_SIZE = 1024 * 1024
+MAX_HEADER_SIZE = 16 * 1024
+
+REASONS = {200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request',
+           404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Неподдерживаемый тип: {type(value).__name__}")
+
+
+def _transaction(row) -> Dict:
+    id_, date, amount, category_id, description, type_ = row
+    return {'id': id_, 'date': date, 'amount': amount, 'category_id': category_id,
+            'description': description, 'type': type_}
+
+
+class ModelPool:
+    """Потоки с собственной FinanceModel у каждого"""
+
+    def __init__(self, db_name: str, workers: int, read_only: bool, name: str):
+        self.db_name = db_name
+        self.read_only = read_only
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._models: List[FinanceModel] = []
+
+    async def run(self, func: Callable, *args):
+        """func(model, *args) в потоке пула"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._call, func, args)
+
+    def _call(self, func, args):
+        model = getattr(self._local, 'model', None)
+        if model is None:
+            model = self._local.model = FinanceModel(self.db_name, read_only=self.read_only)
+            with self._lock:
+                self._models.append(model)
+        return func(model, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with self._lock:
+            models, self._models = self._models, []
+        for model in models:
+            model.close()
+
+
+class WriteBatcher:
+    """Очередь добавлений: все, что накопилось за время записи, - одной транзакцией"""
+
+    def __init__(self, pool: ModelPool, max_batch: int = MAX_WRITE_BATCH,
+                 queue_size: int = WRITE_QUEUE_SIZE):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.batches = 0
+        self.rows = 0
+
+    async def add(self, rows: List[Dict]) -> List[int]:
+        """Добавление строк одного запроса (все или ничего), возвращает id"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            while size < self.max_batch and not self.queue.empty():
+                item = self.queue.get_nowait()
+                batch.append(item)
+                size += len(item[0])
+
+            try:
+                results = await self.pool.run(self._write, [rows for rows, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            self.batches += 1
+            for (rows, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    self.rows += len(result)
+                    future.set_result(result)
+
+    @staticmethod
+    def _write(model: FinanceModel, items: List[List[Dict]]) -> List:
+        """Запись пачки запросов; при ошибке - по одному, чтобы отказал только неверный"""
+        try:
+            ids = model.add_transactions([row for rows in items for row in rows])
+        except Exception:
+            results = []
+            for rows in items:
+                try:
+                    results.append(model.add_transactions(rows))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+        results, start = [], 0
+        for rows in items:
+            results.append(ids[start:start + len(rows)])
+            start += len(rows)
+        return results
+
+
+class FinanceServer:
+    """HTTP/1.1 с keep-alive поверх asyncio, ответы в JSON
+
+    GET    /transactions?from=&to=&limit=&after=ДАТА,ID  - страница (keyset)
+    GET    /transactions/<id>
+    POST   /transactions          - объект или список объектов
+    DELETE /transactions/<id>
+    GET    /search?q=&from=&to=&limit=&offset=
+    GET    /categories?type=
+    GET    /statistics?from=&to=
+    GET    /statistics/categories?from=&to=&level=
+    """
+
+    def __init__(self, db_name: str = 'finance.db', host: str = HOST, port: int = PORT,
+                 readers: int = READERS):
+        self.db_name = db_name
+        self.host = host
+        self.port = port
+        # Схема создается и обновляется до запуска пулов: читатели ее не меняют
+        FinanceModel(db_name).close()
+        self.readers = ModelPool(db_name, readers, read_only=True, name='finance-read')
+        self.writer = ModelPool(db_name, 1, read_only=False, name='finance-write')
+        self.batcher: Optional[WriteBatcher] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._batcher_task = None
+        self.routes = [
+            ('GET', ('transactions',), self.list_transactions),
+            ('POST', ('transactions',), self.add_transactions),
+            ('GET', ('transactions', None), self.get_transaction),
+            ('DELETE', ('transactions', None), self.delete_transaction),
+            ('GET', ('search',), self.search),
+            ('GET', ('categories',), self.categories),
+            ('GET', ('statistics',), self.statistics),
+            ('GET', ('statistics', 'categories'), self.category_statistics),
+        ]
+
+    async def start(self):
+        self.batcher = WriteBatcher(self.writer)
+        self._batcher_task = asyncio.create_task(self.batcher.run())
+        self.server = await asyncio.start_server(self.handle, self.host, self.port,
+                                                 limit=MAX_HEADER_SIZE)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._batcher_task is not None:
+            self._batcher_task.cancel()
+        self.readers.close()
+        self.writer.close()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    # --- HTTP ---
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HttpError as e:
+            self._write_response(writer, e.status, {'error': str(e)}, False)
+        except Exception as e:
+            # Клиент получает ответ при любой ошибке разбора, соединение закрывается
+            self._write_response(writer, 500, {'error': str(e)}, False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(413, "Слишком большие заголовки")
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HttpError(400, "Неверная строка запроса")
+
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HttpError(400, "Неверный Content-Length")
+        if length < 0:
+            raise HttpError(400, "Неверный Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HttpError(413, "Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        body = b'' if payload is None else json.dumps(
+            payload, ensure_ascii=False, default=_json_value).encode('utf-8')
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                f"Content-Length: {len(body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if body:
+            head.append("Content-Type: application/json; charset=utf-8")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, object]:
+        """Выбор обработчика по методу и пути; ошибки - в виде {"error": ...}"""
+        url = urlsplit(target)
+        parts = tuple(part for part in url.path.split('/') if part)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        matched = False
+        for route_method, pattern, handler in self.routes:
+            if len(pattern) != len(parts) or any(
+                    expected is not None and expected != part for expected, part in zip(pattern, parts)):
+                continue
+            matched = True
+            if route_method != method:
+                continue
+            args = [part for expected, part in zip(pattern, parts) if expected is None]
+            try:
+                return await handler(query, body, *args)
+            except HttpError as e:
+                return e.status, {'error': str(e)}
+            except ValueError as e:
+                return 400, {'error': str(e)}
+            except Exception as e:
+                return 500, {'error': str(e)}
+
+        if matched:
+            return 405, {'error': "Метод не поддерживается"}
+        return 404, {'error': "Не найдено"}
+
+    # --- обработчики ---
+
+    async def list_transactions(self, query, body):
+        start_date, end_date = self._dates(query)
+        limit = self._limit(query)
+        after = None
+        if query.get('after'):
+            date, _, id_ = query['after'].partition(',')
+            after = (parse_date(date).strftime('%Y-%m-%d'), self._int(id_, 'after'))
+
+        rows, next_key = await self.readers.run(
+            lambda model: model.get_transactions_page(start_date, end_date, limit, after))
+        return 200, {'items': [_transaction(row) for row in rows],
+                     'next': f"{next_key[0]},{next_key[1]}" if next_key else None}
+
+    async def get_transaction(self, query, body, transaction_id):
+        row = await self.readers.run(
+            lambda model: model.get_transaction(self._int(transaction_id, 'id')))
+        if row is None:
+            raise HttpError(404, "Операция не найдена")
+        return 200, _transaction(row)
+
+    async def add_transactions(self, query, body):
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            raise HttpError(400, "Тело запроса - не JSON")
+
+        rows = data if isinstance(data, list) else [data]
+        if not rows or not all(isinstance(row, dict) for row in rows):
+            raise HttpError(400, "Ожидается объект операции или список объектов")
+
+        ids = await self.batcher.add(rows)
+        return 201, ({'ids': ids} if isinstance(data, list) else {'id': ids[0]})
+
+    async def delete_transaction(self, query, body, transaction_id):
+        deleted = await self.writer.run(
+            lambda model: model.delete_transaction(self._int(transaction_id, 'id')))
+        if not deleted:
+            raise HttpError(404, "Операция не найдена")
+        return 204, None
+
+    async def search(self, query, body):
+        start_date, end_date = self._dates(query)
+        limit = self._limit(query)
+        offset = self._int(query.get('offset', 0), 'offset')
+        rows, next_offset = await self.readers.run(
+            lambda model: model.search_transactions(query.get('q', ''), start_date, end_date,
+                                                    limit=limit, offset=offset))
+        return 200, {'items': [_transaction(row) for row in rows], 'next': next_offset}
+
+    async def categories(self, query, body):
+        def load(model):
+            index = model.categories
+            return [{'id': id_, 'name': name, 'type': type_,
+                     'parent_id': index.parent(id_), 'path': index.path(id_)}
+                    for id_, name, type_ in model.get_categories(query.get('type'))]
+
+        return 200, {'items': await self.readers.run(load)}
+
+    async def statistics(self, query, body):
+        start_date, end_date = self._dates(query)
+        stats = await self.readers.run(lambda model: model.get_statistics(start_date, end_date))
+        return 200, stats
+
+    async def category_statistics(self, query, body):
+        start_date, end_date = self._dates(query)
+        level = self._int(query['level'], 'level') if 'level' in query else None
+        rollup = await self.readers.run(
+            lambda model: model.get_category_rollup(start_date, end_date, level))
+        return 200, {'items': [{'category_id': id_, 'total': total, 'count': count}
+                               for id_, (total, count) in sorted(rollup.items())]}
+
+    # --- параметры ---
+
+    @staticmethod
+    def _dates(query):
+        return parse_date(query.get('from')), parse_date(query.get('to'))
+
+    def _limit(self, query) -> int:
+        limit = self._int(query.get('limit', PAGE_SIZE), 'limit')
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            raise HttpError(400, f"limit должен быть от 1 до {MAX_PAGE_SIZE}")
+        return limit
+
+    @staticmethod
+    def _int(value, name: str) -> int:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise HttpError(400, f"Неверное значение {name}: {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальный HTTP/JSON API учета финансов")
+    parser.add_argument('--db', default='finance.db', help="Файл базы данных")
+    parser.add_argument('--host', default=HOST, help="Адрес (0.0.0.0 - для всей сети)")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--readers', type=int, default=READERS, help="Потоков чтения")
+    args = parser.parse_args(argv)
+
+    server = FinanceServer(args.db, args.host, args.port, args.readers)
+    print(f"Сервер: http://{args.host}:{args.port}/", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
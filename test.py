@@ -1,8 +1,39 @@
 import unittest
+import asyncio
 import tempfile
 import os
+import csv
+import http.client
+import importlib.util
+import io
+import json
+import subprocess
+import sys
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import Mock, patch
+from urllib.parse import quote
+
+import analytics
+import benchmark
+import categories
+import cli
+import migrations
+import partitions
+import search
+import series
+import server
 from database import Database
+from export import ExportCancelled, Exporter, format_for
+from model import FinanceModel
+from importer import CsvImporter
+from instrumentation import MAX_STATEMENTS, Instrumentation, slow_log_path
+from money import MAX_MINOR, format_minor, to_decimal, to_minor
+from pager import SearchPager, TransactionPager
+from worker import QueryExecutor
 
 
 class TestDatabase(unittest.TestCase):
@@ -157,6 +188,1351 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(len(feb_transactions), 1)
         self.assertEqual(feb_transactions[0][4], "Февраль")
 
+    def test_add_transactions_bulk(self):
+        """Тест пакетного добавления транзакций"""
+        category_id = self.db.get_categories('expense')[0][0]
+        rows = ((datetime(2024, 3, day), 10.0 * day, category_id, f"Покупка {day}", "expense")
+                for day in range(1, 6))
+
+        count = self.db.add_transactions_bulk(rows, batch_size=2)
+
+        self.assertEqual(count, 5)
+        self.assertEqual(len(self.db.get_transactions()), 5)
+        self.assertEqual(self.db.get_statistics()['expense'], 150.0)
+
+    def test_add_transactions_bulk_rollback(self):
+        """Тест отката пакета с ошибочной строкой"""
+        rows = [
+            ('2024-03-01', 100.0, None, "Верная строка", 'income'),
+            ('2024-03-02', -5.0, None, "Отрицательная сумма", 'income'),
+        ]
+
+        with self.assertRaises(ValueError):
+            self.db.add_transactions_bulk(rows)
+
+        self.assertEqual(len(self.db.get_transactions()), 0)
+
+    def test_invalid_amounts_rejected(self):
+        """Тест отказа для сумм вне точности, вне INTEGER и bool"""
+        for amount in ("1e30", "1e400", "99999999999999999", 10 ** 17, True, "abc", "NaN", None):
+            with self.assertRaises(ValueError, msg=amount):
+                to_decimal(amount)
+        self.assertEqual(to_minor("92233720368547758.07"), MAX_MINOR)
+
+    def test_transactions_pages(self):
+        """Тест keyset-пагинации транзакций"""
+        # По две операции на день, чтобы проверить порядок по id внутри даты
+        rows = [(f'2024-04-{day:02d}', 1.0, None, f"{day}-{n}", 'expense')
+                for day in range(1, 6) for n in range(2)]
+        self.db.add_transactions_bulk(rows)
+
+        page, after = self.db.get_transactions_page(limit=4)
+        self.assertEqual(len(page), 4)
+        self.assertEqual(after, (page[-1][1], page[-1][0]))
+
+        chunks = list(self.db.iter_transactions(chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 3, 1])
+
+        streamed = [row for chunk in chunks for row in chunk]
+        self.assertEqual(streamed, self.db.get_transactions())
+
+
+class TestFinanceModel(unittest.TestCase):
+    """Тесты модели приложения"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+
+    def tearDown(self):
+        self.model.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def test_add_transactions_bulk(self):
+        """Тест пакетного добавления из словарей"""
+        category_id = self.model.get_categories('income')[0][0]
+        rows = [{'date': '2024-01-10', 'amount': 500, 'category_id': category_id,
+                 'description': "Аванс", 'type': 'income'}] * 3
+
+        count = self.model.add_transactions_bulk(iter(rows))
+
+        self.assertEqual(count, 3)
+        stats = self.model.get_statistics()
+        self.assertEqual(stats['income'], 1500.0)
+        self.assertEqual(stats['total_count'], 3)
+
+    def test_iter_transactions_with_filter(self):
+        """Тест потокового чтения с фильтром по датам"""
+        rows = [(datetime(2024, 1, 1) + timedelta(days=n), 10, None, str(n), 'income')
+                for n in range(60)]
+        self.model.add_transactions_bulk(rows)
+
+        start, end = datetime(2024, 1, 11), datetime(2024, 1, 30)
+        chunks = list(self.model.iter_transactions(start, end, chunk_size=7))
+
+        streamed = [row for chunk in chunks for row in chunk]
+        self.assertEqual(len(streamed), 20)
+        self.assertEqual(streamed, self.model.get_transactions(start, end))
+        self.assertTrue(all(len(chunk) <= 7 for chunk in chunks))
+
+    def test_statistics_cache(self):
+        """Тест кэша статистики и его сброса при записи"""
+        start, end = datetime(2024, 1, 1), datetime(2024, 1, 31)
+        self.model.add_transaction(datetime(2024, 1, 5), 100, None, "Доход", 'income')
+
+        first = self.model.get_statistics(start, end)
+        first['income'] = -1
+        second = self.model.get_statistics(start, end)
+        self.assertEqual(second['income'], 100)
+        self.assertEqual(self.model.cache_stats()['hits'], 1)
+
+        self.model.add_transaction(datetime(2024, 1, 6), 50, None, "Доход", 'income')
+        self.assertEqual(self.model.get_statistics(start, end)['income'], 150)
+
+    def test_cache_invalidated_by_external_write(self):
+        """Тест сброса кэша при записи из другого соединения"""
+        self.assertEqual(self.model.count_transactions(), 0)
+
+        other = FinanceModel(self.db_path)
+        try:
+            other.add_transaction(datetime(2024, 2, 1), 10, None, "Снаружи", 'expense')
+        finally:
+            other.close()
+
+        self.assertEqual(self.model.count_transactions(), 1)
+        self.assertEqual(self.model.cache_stats()['hits'], 0)
+
+    def test_category_index(self):
+        """Тест справочника категорий в памяти"""
+        products_id = self.model.get_category_id_by_name("продукты", 'expense')
+        self.assertEqual(self.model.get_category_name(products_id), "Продукты")
+
+        statements = []
+        self.model.connection.set_trace_callback(statements.append)
+        for _ in range(10):
+            self.model.get_category_name(products_id)
+            self.model.get_category_id_by_name("Зарплата", 'income')
+        self.model.connection.set_trace_callback(None)
+        self.assertEqual(statements, [])
+
+        gifts_id = self.model.add_category("Подарки", 'income')
+        self.assertIn("Подарки", [cat[1] for cat in self.model.get_categories('income')])
+
+        self.model.rename_category(gifts_id, "Подарки и бонусы")
+        self.assertEqual(self.model.get_category_name(gifts_id), "Подарки и бонусы")
+        self.assertIsNone(self.model.get_category_id_by_name("Подарки", 'income'))
+
+        self.model.add_transaction(datetime(2024, 1, 1), 100, gifts_id, "Бонус", 'income')
+        self.assertTrue(self.model.delete_category(gifts_id))
+        self.assertEqual(self.model.get_category_name(gifts_id), "Неизвестная категория")
+        self.assertIsNone(self.model.get_transactions()[0][3])
+
+    def test_category_tree_rollup(self):
+        """Тест подкатегорий, таблицы замыкания и свертки итогов"""
+        food_id = self.model.add_category("Еда", 'expense')
+        products_id = self.model.get_category_id_by_name("Продукты", 'expense')
+        self.model.move_category(products_id, food_id)
+        cafe_id = self.model.add_category("Кафе", 'expense', food_id)
+        coffee_id = self.model.add_category("Кофе", 'expense', cafe_id)
+
+        self.assertEqual(self.model.categories.ancestors(coffee_id), (cafe_id, food_id))
+        self.assertEqual(self.model.categories.path(coffee_id), "Еда / Кафе / Кофе")
+        self.assertEqual(set(self.model.categories.descendants(food_id)),
+                         {products_id, cafe_id, coffee_id})
+
+        with self.assertRaises(ValueError):
+            self.model.move_category(food_id, coffee_id)
+        with self.assertRaises(ValueError):
+            self.model.add_category("Премия", 'income', food_id)
+
+        day = datetime(2024, 3, 10)
+        self.model.add_transaction(day, Decimal('100.10'), products_id, "Магазин", 'expense')
+        self.model.add_transaction(day, Decimal('50.05'), coffee_id, "Латте", 'expense')
+        self.model.add_transaction(day, 30, cafe_id, "Обед", 'expense')
+
+        rollup = self.model.get_category_rollup()
+        self.assertEqual(rollup[food_id], (Decimal('180.15'), 3))
+        self.assertEqual(rollup[cafe_id], (Decimal('80.05'), 2))
+        self.assertEqual(rollup[coffee_id], (Decimal('50.05'), 1))
+        self.assertEqual(self.model.get_category_rollup(level=0), {food_id: (Decimal('180.15'), 3)})
+        self.assertEqual(self.model.get_category_rollup(datetime(2024, 4, 1)), {})
+        self.assertEqual(self.model.count_search_results("латте", category_id=food_id), 1)
+
+        # Удаление промежуточной категории: Кофе переходит к Еде
+        self.model.delete_category(cafe_id)
+        self.assertEqual(self.model.categories.ancestors(coffee_id), (food_id,))
+        self.assertEqual(self.model.get_category_rollup()[food_id], (Decimal('150.15'), 2))
+
+    def test_stats_snapshot(self):
+        """Тест снимка итогов для быстрого запуска"""
+        self.assertIsNone(self.model.get_stats_snapshot())
+
+        self.model.add_transaction(datetime(2024, 1, 5), Decimal('10.10'), None, "a", 'income')
+        stats = self.model.get_statistics(datetime(2024, 1, 1), None)
+        self.model.save_stats_snapshot(datetime(2024, 1, 1), None, stats)
+
+        snapshot = self.model.get_stats_snapshot()
+        self.assertEqual(snapshot['income'], Decimal('10.10'))
+        self.assertEqual(snapshot['balance'], Decimal('10.10'))
+        self.assertEqual(snapshot['total_count'], 1)
+        self.assertEqual((snapshot['start_date'], snapshot['end_date']), ('2024-01-01', None))
+
+    def test_warm_start_skips_ddl(self):
+        """Тест запуска на актуальной схеме без DDL и категорий по умолчанию"""
+        with patch.object(FinanceModel, 'create_default_categories') as defaults, \
+                patch.object(migrations, 'migrate') as migrate:
+            other = FinanceModel(self.db_path)
+            other.close()
+
+        defaults.assert_not_called()
+        migrate.assert_not_called()
+
+    def test_exact_minor_unit_sums(self):
+        """Тест точного суммирования в копейках"""
+        self.model.add_transactions_bulk(
+            [(datetime(2024, 1, 1), 0.1, None, 'a', 'income') for _ in range(1000)]
+            + [(datetime(2024, 1, 2), '0.30', None, 'b', 'expense')])
+
+        stats = self.model.get_statistics()
+        self.assertEqual(stats['income'], Decimal('100.00'))
+        self.assertEqual(stats['balance'], Decimal('99.70'))
+        self.assertEqual(self.model.get_transactions()[0][2], Decimal('0.30'))
+        self.assertEqual(format_minor(-12345), '-123.45 ₽')
+
+    def test_display_transactions_page(self):
+        """Тест готовых к показу строк с названиями категорий"""
+        category_id = [cat[0] for cat in self.model.get_categories('expense') if cat[1] == 'Транспорт'][0]
+        self.model.add_transaction(datetime(2024, 5, 2), 350.5, category_id, "Такси", 'expense')
+        self.model.add_transaction(datetime(2024, 5, 1), 1000, None, "Перевод", 'income')
+
+        rows, after = self.model.get_display_transactions_page()
+
+        self.assertIsNone(after)
+        self.assertEqual(rows[0][1:], ('2024-05-02', 35050, 'Транспорт', 'Такси', 'Расход', 'expense'))
+        self.assertEqual(rows[1][1:], ('2024-05-01', 100000, 'Без категории', 'Перевод', 'Доход', 'income'))
+
+
+class TestPager(unittest.TestCase):
+    """Тесты постраничного доступа для виртуальной таблицы"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+        rows = [(datetime(2023, 1, 1) + timedelta(days=n // 3), n + 1, None, str(n), 'expense')
+                for n in range(250)]
+        self.model.add_transactions_bulk(rows)
+
+    def tearDown(self):
+        self.model.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def make_pager(self, calls):
+        def fetch_page(limit, after, offset):
+            calls.append((after, offset))
+            return self.model.get_transactions_page(None, None, limit, after, offset)
+
+        return TransactionPager(fetch_page, self.model.count_transactions(),
+                                page_size=20, max_pages=3)
+
+    def test_rows_match_full_query(self):
+        """Тест совпадения окон с полным результатом"""
+        expected = self.model.get_transactions()
+        pager = self.make_pager([])
+
+        self.assertEqual(pager.total, 250)
+        for offset, count in ((0, 30), (15, 40), (200, 60), (235, 30), (100, 1)):
+            self.assertEqual(pager.get_rows(offset, count), expected[offset:offset + count])
+
+    def test_sequential_scroll_uses_keys(self):
+        """Тест последовательной прокрутки без OFFSET"""
+        calls = []
+        pager = self.make_pager(calls)
+
+        for offset in range(0, 250, 10):
+            pager.get_rows(offset, 25)
+
+        self.assertTrue(all(offset == 0 for _, offset in calls))
+        self.assertEqual(len(calls), 13)
+
+    def test_insert_and_remove_keep_positions(self):
+        """Тест учета вставки и удаления без пересоздания пейджера"""
+        pager = self.make_pager([])
+        pager.get_rows(0, 250)
+
+        new_id = self.model.add_transaction(datetime(2023, 2, 1), 7, None, "Новая", 'expense')
+        pager.insert(('2023-02-01', new_id))
+        removed = self.model.get_transactions()[30]
+        self.model.delete_transaction(removed[0])
+        pager.remove((removed[1], removed[0]))
+
+        expected = self.model.get_transactions()
+        self.assertEqual(pager.total, len(expected))
+        for offset in range(0, 250, 20):
+            self.assertEqual(pager.get_rows(offset, 20), expected[offset:offset + 20])
+
+    def test_background_pages(self):
+        """Тест заказа страниц фоновому потоку вместо чтения в потоке окна"""
+        requests = []
+
+        def request_page(limit, after, offset, deliver):
+            requests.append((offset, lambda: deliver(self.model.get_transactions_page(
+                None, None, limit, after, offset)[0])))
+
+        expected = self.model.get_transactions()
+        pager = TransactionPager(None, len(expected), page_size=20, max_pages=3,
+                                 first_page=expected[:20], request_page=request_page)
+
+        # Окно в кэше: следующая страница заказана впрок по ключу
+        self.assertEqual(pager.get_rows(0, 15), expected[:15])
+        self.assertEqual([offset for offset, _ in requests], [0])
+        self.assertEqual(pager.get_rows(10, 20), expected[10:20])
+        self.assertEqual(len(requests), 1)
+        requests.pop()[1]()
+        self.assertEqual(pager.get_rows(10, 20), expected[10:30])
+
+        # Ответ на заказ до удаления строки отбрасывается
+        pager.get_rows(100, 10)
+        stale = requests.pop()[1]
+        removed = expected[5]
+        self.model.delete_transaction(removed[0])
+        pager.remove((removed[1], removed[0]))
+        stale()
+        requests.clear()
+        expected = self.model.get_transactions()
+        self.assertEqual(pager.get_rows(100, 10), [])
+        self.assertEqual(len(requests), 1)
+        requests.pop()[1]()
+        self.assertEqual(pager.get_rows(100, 10), expected[100:110])
+
+    def test_search_pages_requested_once(self):
+        """Тест страниц поиска: кэш по смещению и заказ недостающих в фоне"""
+        expected = self.model.search_transactions('1', limit=1000)[0]
+        requests = []
+        pager = SearchPager(lambda offset, limit: requests.append((offset, limit)), len(expected),
+                            page_size=20, max_pages=4, first_rows=expected[:40])
+
+        # Видимые страницы есть, заказывается одна следующая
+        self.assertEqual(pager.get_rows(5, 30), expected[5:35])
+        self.assertEqual(requests, [(40, 20)])
+        self.assertEqual(pager.get_rows(10, 30), expected[10:40])
+        self.assertEqual(requests, [(40, 20)])
+
+        # До прихода страницы отдаются строки только до нее
+        self.assertEqual(pager.get_rows(30, 20), expected[30:40])
+        pager.store(40, expected[40:60])
+        self.assertEqual(pager.get_rows(30, 20), expected[30:50])
+        self.assertEqual(requests, [(40, 20), (60, 20)])
+
+        # Переход в конец: один заказ на недостающий диапазон
+        pager.get_rows(len(expected) - 30, 30)
+        self.assertEqual(len(requests), 3)
+        offset, limit = requests[-1]
+        pager.store(offset, expected[offset:offset + limit])
+        self.assertEqual(pager.get_rows(len(expected) - 30, 30), expected[-30:])
+
+
+class FakeRoot:
+    """Замена Tk: отложенные вызовы выполняются вручную"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+
+    def run_pending(self):
+        while self.callbacks:
+            self.callbacks.pop(0)()
+
+
+class TestQueryExecutor(unittest.TestCase):
+    """Тесты фонового выполнения запросов"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.root = FakeRoot()
+        self.busy = []
+        self.executor = QueryExecutor(self.root, self.db_path, on_busy=self.busy.append)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def test_results_delivered_by_polling(self):
+        """Тест передачи результата и ошибки через root.after"""
+        results, errors = [], []
+        self.executor.submit(None, lambda model, n: model.count_transactions() + n, 5,
+                             on_done=results.append)
+        self.executor.submit(None, lambda model: model.get_transaction(None)[0],
+                             on_error=errors.append)
+        self.root.run_pending()
+
+        self.assertEqual(results, [5])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(self.busy, [True, True, False])
+
+    def test_superseded_result_dropped(self):
+        """Тест отбрасывания устаревших результатов с тем же ключом"""
+        results = []
+        for n in range(3):
+            self.executor.submit('load', lambda model, n: n, n, on_done=results.append)
+        self.root.run_pending()
+
+        self.assertEqual(results, [2])
+
+    def test_running_query_interrupted(self):
+        """Тест прерывания выполняемого запроса новым с тем же ключом"""
+        started = threading.Event()
+        results, errors = [], []
+
+        def slow(model):
+            # started() вызывается уже внутри выполняемого оператора
+            model.connection.create_function('started', 0, lambda: started.set() or 1)
+            return model.connection.execute(
+                "WITH RECURSIVE n(i) AS (SELECT started() UNION ALL SELECT i + 1 FROM n "
+                "WHERE i < 1000000000) SELECT count(*) FROM n").fetchone()
+
+        self.executor.submit('load', slow, on_done=results.append, on_error=errors.append)
+        self.assertTrue(started.wait(5))
+        self.assertTrue(self.executor.pending('load'))
+        self.executor.submit('load', lambda model: 'latest', on_done=results.append,
+                             on_error=errors.append)
+        self.root.run_pending()
+
+        self.assertEqual(results, ['latest'])
+        self.assertEqual(errors, [])
+        self.assertEqual(self.executor.interrupted, 1)
+        self.assertFalse(self.executor.pending('load'))
+
+
+class TestConnections(unittest.TestCase):
+    """Тесты соединений по потокам и режима WAL"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+
+    def tearDown(self):
+        self.model.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def test_wal_and_thread_connections(self):
+        """Тест режима WAL и отдельного соединения у каждого потока"""
+        self.assertEqual(self.model.connections.journal_mode(), 'wal')
+
+        other = {}
+        thread = threading.Thread(target=lambda: other.update(
+            connection=self.model.connection, count=self.model.count_transactions()))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(other['connection'], self.model.connection)
+        self.assertEqual(other['count'], 0)
+
+    def test_read_only_reader_during_write(self):
+        """Тест чтения отчета во время незавершенной записи"""
+        self.model.add_transaction(datetime(2023, 1, 1), 100, None, 'a', 'income')
+        reader = FinanceModel(self.db_path, read_only=True)
+        try:
+            self.model.cursor.execute("BEGIN IMMEDIATE")
+            self.model.cursor.execute(
+                "INSERT INTO transactions (date, amount, description, type) "
+                "VALUES ('2023-01-02', 5000, 'b', 'income')")
+
+            self.assertEqual(reader.get_statistics()['income'], 100)
+            self.model.connection.commit()
+            self.assertEqual(reader.get_statistics()['income'], 150)
+
+            with self.assertRaises(sqlite3.OperationalError):
+                reader.add_transaction(datetime(2023, 1, 3), 1, None, 'c', 'income')
+        finally:
+            reader.close()
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Тесты замеров запросов и журнала медленных запросов"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.log_path = self.db_path + '.log'
+        self.model = FinanceModel(self.db_path)
+
+    def tearDown(self):
+        self.model.close()
+        for path in (self.db_path, self.log_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def test_summary_counts_calls_and_rows(self):
+        """Тест счетчиков вызовов, строк и процентилей"""
+        instrumentation = Instrumentation()
+        instrumentation.instrument(self.model)
+        for day in range(1, 4):
+            self.model.add_transaction(datetime(2024, 1, day), 10, None, 'a', 'income')
+        self.model.get_transactions()
+        self.model.get_transactions_page(limit=2)
+
+        summary = instrumentation.summary()
+        self.assertEqual(summary['add_transaction']['count'], 3)
+        self.assertEqual(summary['get_transactions']['rows'], 3)
+        self.assertEqual(summary['get_transactions_page']['rows'], 2)
+        self.assertLessEqual(summary['add_transaction']['p50_ms'], summary['add_transaction']['p95_ms'])
+        self.assertEqual(instrumentation.slow_calls, 0)
+
+    def test_slow_log_contains_query_plan(self):
+        """Тест записи медленного вызова с SQL и планом выполнения"""
+        instrumentation = Instrumentation(slow_log=self.log_path, threshold_ms=0)
+        instrumentation.instrument(self.model)
+        self.model.get_transactions(datetime(2024, 1, 1), datetime(2024, 1, 31))
+
+        with open(self.log_path, encoding='utf-8') as f:
+            log = f.read()
+        self.assertIn('get_transactions:', log)
+        self.assertIn("t.date >= '2024-01-01'", log)
+        self.assertIn('idx_transactions_date', log)
+
+    def test_statements_deduplicated_and_capped(self):
+        """Тест журнала без повторов, с ограничением числа операторов"""
+        instrumentation = Instrumentation(slow_log=self.log_path, threshold_ms=0)
+
+        def queries():
+            for n in range(MAX_STATEMENTS * 2):
+                self.model.connection.execute("SELECT 1").fetchall()
+                self.model.connection.execute(f"SELECT {n + 2}").fetchall()
+
+        instrumentation.timed('queries', queries, self.model.connections)()
+        # Вне измеряемого вызова операторы не записываются
+        self.model.connection.execute("SELECT 'после'").fetchall()
+
+        with open(self.log_path, encoding='utf-8') as f:
+            lines = [line.strip() for line in f if line.startswith('  SELECT')]
+        self.assertEqual(lines.count('SELECT 1'), 1)
+        self.assertEqual(len(lines), MAX_STATEMENTS)
+        self.assertNotIn("SELECT 'после'", lines)
+
+    def test_slow_log_location(self):
+        """Тест журнала рядом с базой и работы без доступа к журналу"""
+        self.assertEqual(slow_log_path(self.db_path),
+                         os.path.join(os.path.dirname(self.db_path), 'slow_queries.log'))
+
+        missing = os.path.join(self.db_path + '.missing', 'slow.log')
+        instrumentation = Instrumentation(slow_log=missing, threshold_ms=0)
+        instrumentation.instrument(self.model)
+        self.model.get_transactions()
+        self.assertIsNone(instrumentation.slow_log)
+        self.assertEqual(instrumentation.slow_calls, 1)
+
+    def test_bulk_insert_not_traced(self):
+        """Тест массовой записи: в журнал попадает только время"""
+        instrumentation = Instrumentation(slow_log=self.log_path, threshold_ms=0)
+        instrumentation.instrument(self.model)
+        self.model.add_transactions_bulk(
+            [(datetime(2024, 1, 1), 10, None, str(n), 'income') for n in range(100)])
+
+        with open(self.log_path, encoding='utf-8') as f:
+            log = f.read()
+        self.assertIn('add_transactions_bulk:', log)
+        self.assertNotIn('INSERT', log)
+        self.assertEqual(instrumentation.summary()['add_transactions_bulk']['count'], 1)
+
+
+class TestSearch(unittest.TestCase):
+    """Тесты полнотекстового поиска по описаниям"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+        self.transport_id = self.model.get_category_id_by_name('Транспорт', 'expense')
+        self.model.add_transactions_bulk([
+            ('2024-01-01', 300, self.transport_id, 'Такси до дома', 'expense'),
+            ('2024-01-05', 150, None, 'Метро', 'expense'),
+            ('2024-02-01', 900, self.transport_id, 'такси такси в аэропорт', 'expense'),
+            ('2024-02-03', 500, None, 'Возврат за такси', 'income'),
+        ])
+
+    def tearDown(self):
+        self.model.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def descriptions(self, rows):
+        return [row[4] for row in rows]
+
+    def test_ranked_prefix_search(self):
+        """Тест поиска по префиксу без учета регистра с ранжированием"""
+        rows, after = self.model.search_transactions('ТАКС')
+        self.assertIsNone(after)
+        self.assertEqual(rows[0][4], 'такси такси в аэропорт')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(self.model.count_search_results('такси аэро'), 1)
+        self.assertEqual(self.model.search_transactions('  '), ([], None))
+        self.assertEqual(search.match_query('такси" OR *'), '"такси"* "OR"*')
+
+    def test_filters_and_pages(self):
+        """Тест фильтров по датам, типу и категории и постраничной выдачи"""
+        rows, _ = self.model.search_transactions('такси', start_date=datetime(2024, 2, 1),
+                                                 type_='expense')
+        self.assertEqual(self.descriptions(rows), ['такси такси в аэропорт'])
+
+        rows, _ = self.model.search_transactions('такси', category_id=self.transport_id,
+                                                 display=True)
+        self.assertEqual({row[3] for row in rows}, {'Транспорт'})
+
+        first, after = self.model.search_transactions('такси', limit=2)
+        second, last = self.model.search_transactions('такси', limit=2, offset=after)
+        self.assertIsNone(last)
+        self.assertEqual(len(first + second), 3)
+        self.assertFalse(set(self.descriptions(first)) & set(self.descriptions(second)))
+
+    def test_index_follows_changes(self):
+        """Тест синхронизации индекса триггерами"""
+        metro_id = self.model.search_transactions('метро')[0][0][0]
+        self.model.cursor.execute("UPDATE transactions SET description = 'Автобус' WHERE id = ?",
+                                  (metro_id,))
+        self.model.connection.commit()
+        self.assertEqual(self.model.count_search_results('метро'), 0)
+        self.assertEqual(self.model.count_search_results('автобус'), 1)
+
+        self.model.delete_transaction(metro_id)
+        self.assertEqual(self.model.count_search_results('автобус'), 0)
+
+
+class TestPartitions(unittest.TestCase):
+    """Тесты архивов закрытых лет"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'finance.db')
+        self.model = FinanceModel(self.db_path)
+        products_id = self.model.get_category_id_by_name("Продукты", 'expense')
+        self.model.add_transactions_bulk([
+            (datetime(2021, 3, 1), '10.50', products_id, "Старый магазин", 'expense'),
+            (datetime(2021, 12, 31), 1000, None, "Премия", 'income'),
+            (datetime(2022, 6, 15), '20.25', products_id, "Магазин", 'expense'),
+            (datetime(2023, 1, 10), 500, None, "Зарплата", 'income'),
+        ])
+
+    def tearDown(self):
+        self.model.close()
+        for name in os.listdir(self.directory):
+            os.unlink(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def attached(self):
+        return {row[1] for row in self.model.connection.execute("PRAGMA database_list")}
+
+    def test_archive_and_route(self):
+        """Тест переноса года и чтения только нужных архивов"""
+        before = self.model.get_transactions()
+        stats_before = self.model.get_statistics()
+
+        self.assertEqual(self.model.archive_year(2021), 2)
+        self.assertTrue(os.path.exists(partitions.archive_path(self.db_path, 2021)))
+        self.assertEqual(self.model.connection.execute(
+            "SELECT COUNT(*) FROM main.transactions").fetchone()[0], 2)
+        self.assertNotIn('archive_2021', self.attached())
+
+        # Запрос за 2023 год архив не подключает
+        self.assertEqual(len(self.model.get_transactions(datetime(2023, 1, 1))), 1)
+        self.assertNotIn('archive_2021', self.attached())
+
+        self.assertEqual(self.model.get_transactions(), before)
+        self.assertEqual(self.model.get_statistics(), stats_before)
+        self.assertIn('archive_2021', self.attached())
+        self.assertEqual(self.model.get_statistics(datetime(2021, 12, 1), datetime(2021, 12, 31))['income'],
+                         1000)
+        self.assertEqual(self.model.count_transactions(), 4)
+
+        rows, after = self.model.get_transactions_page(limit=3)
+        more, _ = self.model.get_transactions_page(limit=3, after=after)
+        self.assertEqual([row[0] for row in rows + more], [row[0] for row in before])
+
+    def test_late_rows_appended_to_archive(self):
+        """Тест дописывания операций, добавленных в архивный год позже"""
+        self.model.archive_year(2021)
+        self.model.add_transaction(datetime(2021, 5, 5), 7, None, "Поздняя", 'expense')
+
+        self.assertEqual(self.model.get_statistics(datetime(2021, 1, 1), datetime(2021, 12, 31))['expense'],
+                         Decimal('17.50'))
+        self.assertEqual(self.model.archive_year(2021), 1)
+        self.assertEqual(self.model.count_transactions(datetime(2021, 1, 1), datetime(2021, 12, 31)), 3)
+        self.assertEqual(self.model.count_transactions(), 5)
+
+    def test_reader_and_open_year(self):
+        """Тест архива в модели только для чтения и запрета текущего года"""
+        self.model.archive_year(2021)
+        reader = FinanceModel(self.db_path, read_only=True)
+        try:
+            self.assertEqual(reader.count_transactions(), 4)
+        finally:
+            reader.close()
+
+        with self.assertRaises(ValueError):
+            self.model.archive_year(datetime.now().year)
+
+    def test_more_archives_than_attach_limit(self):
+        """Тест запросов по большему числу архивов, чем можно подключить"""
+        years = range(2008, 2021)
+        self.model.add_transactions_bulk(
+            [(datetime(year, month, 10), year - 2000, None, f"{year}-{month}", 'expense')
+             for year in years for month in (2, 11)])
+        before = self.model.get_transactions()
+        stats_before = self.model.get_statistics()
+        rollup_before = self.model.get_category_rollup()
+        _, series_before = self.model.get_series()
+
+        for year in list(years) + [2021]:
+            self.model.archive_year(year)
+        self.assertLessEqual(len(self.attached()), 2)
+
+        self.model.close()
+        self.model = FinanceModel(self.db_path)
+        self.assertEqual(self.model.get_transactions(), before)
+        self.assertEqual(self.model.get_statistics(), stats_before)
+        self.assertEqual(self.model.get_category_rollup(), rollup_before)
+        self.assertEqual(self.model.get_series()[1], series_before)
+        self.assertEqual(self.model.count_transactions(), len(before))
+
+        rows, after = self.model.get_transactions_page(limit=7)
+        more, _ = self.model.get_transactions_page(limit=7, after=after)
+        skipped, _ = self.model.get_transactions_page(limit=5, offset=9)
+        self.assertEqual(rows + more, before[:14])
+        self.assertEqual(skipped, before[9:14])
+
+        # Группы читаются порциями: несколько порций на группу
+        with patch('model.PAGE_SIZE', 3):
+            self.assertEqual(self.model.get_transactions(), before)
+            self.assertEqual(self.model.get_transactions_page(limit=4, offset=11)[0],
+                             before[11:15])
+        self.assertLessEqual(len(self.attached()) - 2, partitions.MAX_ATTACHED)
+
+
+class TestAggregates(unittest.TestCase):
+    """Тесты итогов по дням и месяцам"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+        rows = [(datetime(2023, 11, 20) + timedelta(days=n % 130), n % 7 + 1, n % 4 or None,
+                 str(n), 'income' if n % 3 == 0 else 'expense')
+                for n in range(400)]
+        self.model.add_transactions_bulk(rows)
+
+    def tearDown(self):
+        self.model.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def scan_statistics(self, start_date, end_date):
+        stats = {'income': 0, 'expense': 0, 'total_count': 0}
+        for row in self.model.get_transactions(start_date, end_date):
+            stats[row[5]] += row[2]
+            stats['total_count'] += 1
+        return stats
+
+    def assert_matches_scan(self):
+        ranges = [
+            (None, None),
+            (datetime(2023, 12, 1), datetime(2024, 2, 29)),
+            (datetime(2023, 12, 15), datetime(2024, 3, 10)),
+            (datetime(2024, 1, 5), datetime(2024, 1, 20)),
+            (datetime(2024, 1, 31), datetime(2024, 2, 1)),
+            (datetime(2024, 2, 1), None),
+            (None, datetime(2024, 1, 17)),
+            (datetime(2024, 3, 1), datetime(2024, 1, 1)),
+        ]
+        for start_date, end_date in ranges:
+            stats = self.model.get_statistics(start_date, end_date)
+            expected = self.scan_statistics(start_date, end_date)
+            for key in ('income', 'expense', 'total_count'):
+                self.assertEqual(stats[key], expected[key], msg=(start_date, end_date, key))
+
+    def test_statistics_match_scan(self):
+        """Тест совпадения итогов с полным просмотром"""
+        self.assert_matches_scan()
+
+    def test_triggers_follow_changes(self):
+        """Тест поддержки итогов триггерами при изменениях"""
+        for row in self.model.get_transactions()[::5]:
+            self.model.delete_transaction(row[0])
+        self.model.connection.execute(
+            "UPDATE transactions SET date = '2024-01-02', amount = amount * 2, type = 'income' "
+            "WHERE id % 11 = 0"
+        )
+        self.model.connection.commit()
+
+        self.assert_matches_scan()
+
+
+class TestSeries(unittest.TestCase):
+    """Тесты рядов по корзинам для графика"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+        # Операции через день, пропуски между 2024-02-10 и 2024-02-20
+        rows = [(datetime(2023, 12, 1) + timedelta(days=n * 2), n % 9 + 1, None,
+                 str(n), 'income' if n % 4 == 0 else 'expense')
+                for n in range(120) if not 35 < n < 41]
+        self.model.add_transactions_bulk(rows)
+
+    def tearDown(self):
+        self.model.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def scan(self, keys_of):
+        totals = {}
+        for row in self.model.get_transactions():
+            key = keys_of(datetime.strptime(row[1], '%Y-%m-%d').date())
+            income, expense = totals.get(key, (Decimal('0'), Decimal('0')))
+            if row[5] == 'income':
+                income += row[2]
+            else:
+                expense += row[2]
+            totals[key] = (income, expense)
+        return totals
+
+    def test_choose_bin(self):
+        """Тест выбора шага по длине периода"""
+        self.assertEqual(series.choose_bin(datetime(2024, 1, 1), datetime(2024, 3, 31)), series.DAY)
+        self.assertEqual(series.choose_bin(datetime(2024, 1, 1), datetime(2025, 6, 30)), series.WEEK)
+        self.assertEqual(series.choose_bin(datetime(2015, 1, 1), datetime(2024, 12, 31)),
+                         series.MONTH)
+        self.assertEqual(len(series.bucket_keys(datetime(2015, 1, 1), datetime(2024, 12, 31),
+                                                series.MONTH)), 120)
+
+    def test_sums_match_scan(self):
+        """Тест совпадения корзин с полным просмотром для каждого шага"""
+        start_date, end_date = datetime(2023, 12, 1), datetime(2024, 7, 31)
+        for bin_ in (series.DAY, series.WEEK, series.MONTH):
+            expected = self.scan(lambda day: series.bucket_key(day, bin_))
+            result_bin, points = self.model.get_series(start_date, end_date, bin_)
+            self.assertEqual(result_bin, bin_)
+            self.assertEqual([key for key, _, _ in points],
+                             series.bucket_keys(start_date, end_date, bin_))
+            for key, income, expense in points:
+                self.assertEqual((income, expense), expected.get(key, (0, 0)), msg=(bin_, key))
+
+    def test_week_keys_are_mondays(self):
+        """Тест ключей недель: понедельник, пустые недели - нулями"""
+        bin_, points = self.model.get_series(datetime(2024, 1, 3), datetime(2024, 3, 20))
+        self.assertEqual(bin_, series.DAY)
+
+        _, points = self.model.get_series(datetime(2024, 1, 3), datetime(2024, 3, 20), series.WEEK)
+        for key, _, _ in points:
+            self.assertEqual(datetime.strptime(key, '%Y-%m-%d').weekday(), 0)
+        self.assertIn(('2024-02-12', Decimal('0'), Decimal('0')), points)
+
+    def test_open_range_uses_data_bounds(self):
+        """Тест периода без границ: от первой до последней операции"""
+        bin_, points = self.model.get_series()
+        self.assertEqual(bin_, series.WEEK)
+        self.assertEqual(points[0][0], '2023-11-27')
+        self.assertEqual(sum(income + expense for _, income, expense in points),
+                         sum(row[2] for row in self.model.get_transactions()))
+
+    def test_write_recomputes_touched_buckets(self):
+        """Тест пересчета только корзин, затронутых записью"""
+        start_date, end_date = datetime(2023, 12, 1), datetime(2024, 7, 31)
+        for bin_ in (series.DAY, series.WEEK, series.MONTH):
+            self.model.get_series(start_date, end_date, bin_)
+
+        recomputed = self.model.series_cache.recomputed
+        self.model.get_series(start_date, end_date, series.MONTH)
+        self.assertEqual(self.model.series_cache.recomputed, recomputed)
+
+        transaction_id = self.model.add_transaction(datetime(2024, 3, 6), Decimal('500'), None,
+                                                    "новая", 'income')
+        _, points = self.model.get_series(start_date, end_date, series.MONTH)
+        self.assertEqual(self.model.series_cache.recomputed, recomputed + 1)
+        march = dict((key, income) for key, income, _ in points)['2024-03']
+
+        self.model.get_series(start_date, end_date, series.DAY)
+        self.model.get_series(start_date, end_date, series.WEEK)
+        self.assertEqual(self.model.series_cache.recomputed, recomputed + 3)
+
+        self.model.delete_transaction(transaction_id)
+        _, points = self.model.get_series(start_date, end_date, series.MONTH)
+        self.assertEqual(dict((key, income) for key, income, _ in points)['2024-03'],
+                         march - Decimal('500'))
+        self.assertEqual(self.model.series_cache.recomputed, recomputed + 4)
+
+
+@unittest.skipUnless(analytics.np is not None, "numpy не установлен")
+class TestAnalytics(unittest.TestCase):
+    """Тесты столбцовой аналитики"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+        self.food_id = self.model.get_category_id_by_name('Продукты', 'expense')
+        self.salary_id = self.model.get_category_id_by_name('Зарплата', 'income')
+        self.model.add_transactions_bulk([
+            ('2024-01-01', 1000, self.salary_id, 'a', 'income'),   # понедельник
+            ('2024-01-01', 100.5, self.food_id, 'b', 'expense'),
+            ('2024-01-03', 20, None, 'c', 'expense'),
+            ('2024-02-05', 300, self.food_id, 'd', 'expense'),
+        ])
+        self.analytics = analytics.LedgerAnalytics(self.model)
+
+    def tearDown(self):
+        self.model.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def test_group_by(self):
+        """Тест группировки по категориям, месяцам и дням недели"""
+        by_category = self.analytics.group_by('category')
+        totals = dict(zip(by_category['key'].tolist(), by_category['expense'].tolist()))
+        self.assertEqual(totals, {0: 2000, self.salary_id: 0, self.food_id: 40050})
+
+        by_month = self.analytics.group_by('month', datetime(2024, 1, 1), datetime(2024, 1, 31))
+        self.assertEqual([str(key) for key in by_month['key']], ['2024-01'])
+        self.assertEqual(by_month['count'].tolist(), [3])
+
+        by_weekday = self.analytics.group_by('weekday')
+        self.assertEqual(by_weekday['key'].tolist(), [0, 2])
+        self.assertEqual(by_weekday['expense'].tolist(), [40050, 2000])
+
+    def test_top_categories_and_running_balance(self):
+        """Тест топа категорий и нарастающего баланса"""
+        top = self.analytics.top_categories(2)
+        self.assertEqual(top, [(self.food_id, 'Продукты', Decimal('400.50')),
+                               (None, 'Без категории', Decimal('20.00'))])
+
+        days, balance = self.analytics.running_balance(datetime(2024, 1, 2))
+        self.assertEqual([str(day) for day in days], ['2024-01-03', '2024-02-05'])
+        self.assertEqual(balance.tolist(), [87950, 57950])
+
+    def test_snapshot_extended_incrementally(self):
+        """Тест дозагрузки новых строк и полной перезагрузки после удаления"""
+        self.assertEqual(len(self.analytics.snapshot()), 4)
+
+        new_id = self.model.add_transaction(datetime(2024, 3, 1), 5, None, 'e', 'income')
+        self.assertEqual(len(self.analytics.snapshot()), 5)
+        self.assertEqual(self.analytics.reloads, 1)
+
+        self.model.delete_transaction(new_id)
+        self.assertEqual(len(self.analytics.snapshot()), 4)
+        self.assertEqual(self.analytics.reloads, 2)
+
+    def test_changes_with_same_totals_reload(self):
+        """Тест перезагрузки после изменений, не меняющих суммы по месяцам"""
+        self.assertEqual(self.analytics.top_categories(1)[0][0], self.food_id)
+
+        self.model.delete_category(self.food_id)
+        self.assertEqual(self.analytics.top_categories(1),
+                         [(None, 'Без категории', Decimal('420.50'))])
+
+        # Дата изменена другим соединением в пределах того же месяца
+        connection = sqlite3.connect(self.db_path)
+        connection.execute("UPDATE transactions SET date = '2024-01-02' WHERE description = 'a'")
+        connection.commit()
+        connection.close()
+        by_weekday = self.analytics.group_by('weekday')
+        self.assertEqual(by_weekday['income'].tolist(), [0, 100000, 0])
+        self.assertEqual(self.analytics.reloads, 3)
+
+    def test_archived_years_included(self):
+        """Тест аналитики по архивам закрытых лет"""
+        directory = tempfile.mkdtemp()
+        model = FinanceModel(os.path.join(directory, 'finance.db'))
+        try:
+            model.add_transactions_bulk([
+                ('2022-03-01', 10, None, 'a', 'expense'),
+                ('2022-07-01', 20, None, 'b', 'income'),
+                ('2024-01-01', 5, None, 'c', 'expense'),
+            ])
+            ledger = analytics.LedgerAnalytics(model)
+            self.assertEqual(len(ledger.snapshot()), 3)
+
+            model.archive_year(2022)
+            by_month = ledger.group_by('month', datetime(2022, 1, 1), datetime(2022, 12, 31))
+            self.assertEqual([str(key) for key in by_month['key']], ['2022-03', '2022-07'])
+            self.assertEqual(len(ledger.snapshot()), 3)
+
+            days, balance = ledger.running_balance(datetime(2024, 1, 1))
+            self.assertEqual(balance.tolist(), [500])
+        finally:
+            model.close()
+            for name in os.listdir(directory):
+                os.unlink(os.path.join(directory, name))
+            os.rmdir(directory)
+
+    def test_snapshot_limited_to_range(self):
+        """Тест загрузки только запрошенного диапазона"""
+        january = self.analytics.snapshot(datetime(2024, 1, 1), datetime(2024, 1, 31))
+        self.assertEqual(len(january), 3)
+
+        # Диапазон внутри загруженного не перечитывается
+        self.analytics.group_by('month', datetime(2024, 1, 2), datetime(2024, 1, 31))
+        self.assertEqual(self.analytics.reloads, 1)
+
+        self.model.add_transaction(datetime(2024, 1, 20), 7, None, 'f', 'expense')
+        self.model.add_transaction(datetime(2024, 3, 20), 9, None, 'g', 'expense')
+        self.assertEqual(len(self.analytics.snapshot(datetime(2024, 1, 1), datetime(2024, 1, 31))), 4)
+        self.assertEqual(self.analytics.reloads, 1)
+
+        self.assertEqual(len(self.analytics.snapshot()), 6)
+        self.assertEqual(self.analytics.reloads, 2)
+
+
+class TestImporter(unittest.TestCase):
+    """Тесты импорта CSV"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+
+        self.csv_file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False,
+                                                    encoding='utf-8', newline='')
+        self.csv_file.write("Дата;Сумма;Категория;Описание\n"
+                            "15.01.2024;-1 200,50;Продукты;Магазин\n"
+                            "16.01.2024;50000;зарплата;Аванс\n"
+                            "не дата;100;Продукты;Ошибка\n"
+                            "17.01.2024;-300;Неизвестная;Такси\n"
+                            "18.01.2024;1e30;Продукты;Опечатка\n"
+                            "19.01.2024;99999999999999999;Продукты;Переполнение\n")
+        self.csv_file.close()
+
+    def tearDown(self):
+        self.model.close()
+        for path in (self.db_path, self.csv_file.name):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def test_import_csv(self):
+        """Тест импорта выписки с русскими заголовками"""
+        progress = []
+        importer = CsvImporter(self.model, delimiter=';', batch_size=2,
+                               progress=progress.append)
+
+        stats = importer.run(self.csv_file.name)
+
+        self.assertEqual(stats.read, 6)
+        self.assertEqual(stats.imported, 3)
+        self.assertEqual(stats.skipped, 3)
+        self.assertTrue(progress)
+
+        statistics = self.model.get_statistics()
+        self.assertEqual(statistics['income'], 50000.0)
+        self.assertAlmostEqual(statistics['expense'], 1500.5)
+
+        categories = {cat[0]: cat[1] for cat in self.model.get_categories()}
+        by_description = {row[4]: row[3] for row in self.model.get_transactions()}
+        self.assertEqual(categories[by_description["Магазин"]], "Продукты")
+        self.assertEqual(categories[by_description["Аванс"]], "Зарплата")
+        self.assertIsNone(by_description["Такси"])
+
+
+class TestExport(unittest.TestCase):
+    """Тесты потоковой выгрузки"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.model = FinanceModel(self.db_path)
+        self.out_dir = tempfile.mkdtemp()
+
+        category_id = self.model.get_category_id_by_name("Продукты", 'expense')
+        base = datetime(2024, 1, 1)
+        for i in range(5):
+            self.model.add_transaction(base + timedelta(days=i), Decimal('100.10') + i,
+                                       category_id, f"Покупка {i}", 'expense')
+
+    def tearDown(self):
+        self.model.close()
+        for name in os.listdir(self.out_dir):
+            os.unlink(os.path.join(self.out_dir, name))
+        os.rmdir(self.out_dir)
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def test_export_csv(self):
+        """Тест выгрузки в CSV порциями"""
+        path = os.path.join(self.out_dir, 'out.csv')
+        progress = []
+
+        stats = Exporter(self.model, chunk_size=2, progress=progress.append).run(path)
+
+        self.assertEqual(stats.written, 5)
+        self.assertEqual(len(progress), 3)
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(sorted(row['amount'] for row in rows),
+                         ['100.10', '101.10', '102.10', '103.10', '104.10'])
+        self.assertEqual({row['category'] for row in rows}, {"Продукты"})
+        self.assertEqual(os.listdir(self.out_dir), ['out.csv'])
+
+    def test_export_jsonl_with_dates(self):
+        """Тест выгрузки в JSON Lines за период"""
+        path = os.path.join(self.out_dir, 'out.jsonl')
+
+        Exporter(self.model, start_date=datetime(2024, 1, 2),
+                 end_date=datetime(2024, 1, 3)).run(path)
+
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(sorted(row['amount'] for row in rows), ['101.10', '102.10'])
+        self.assertEqual({row['type'] for row in rows}, {'expense'})
+
+    def test_jsonl_amounts_match_csv(self):
+        """Тест точных сумм в JSON Lines: те же копейки, что в CSV и в базе"""
+        self.model.add_transaction(datetime(2024, 2, 1), 0.1 + 0.2, None, "Сумма", 'income')
+        paths = [os.path.join(self.out_dir, name) for name in ('out.csv', 'out.jsonl')]
+        for path in paths:
+            Exporter(self.model, start_date=datetime(2024, 2, 1)).run(path)
+
+        with open(paths[0], encoding='utf-8-sig', newline='') as f:
+            csv_amount = next(csv.DictReader(f))['amount']
+        with open(paths[1], encoding='utf-8') as f:
+            json_amount = json.loads(f.readline())['amount']
+        self.assertEqual(json_amount, csv_amount)
+        self.assertEqual(Decimal(json_amount), Decimal('0.30'))
+        self.assertEqual(Decimal(json_amount), self.model.get_transactions(datetime(2024, 2, 1))[0][2])
+
+    def test_cancel_removes_file(self):
+        """Тест отмены: ни итогового, ни временного файла"""
+        path = os.path.join(self.out_dir, 'out.csv')
+        cancel = threading.Event()
+
+        exporter = Exporter(self.model, chunk_size=2, cancel=cancel,
+                            progress=lambda stats: cancel.set())
+        with self.assertRaises(ExportCancelled):
+            exporter.run(path)
+
+        self.assertEqual(os.listdir(self.out_dir), [])
+
+    def test_unknown_format(self):
+        """Тест неизвестного расширения"""
+        with self.assertRaises(ValueError):
+            format_for('report.xlsx')
+        self.assertEqual(format_for('REPORT.JSONL'), 'jsonl')
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow не установлен")
+    def test_export_parquet(self):
+        """Тест выгрузки в Parquet с точными суммами"""
+        import pyarrow.parquet as pq
+        path = os.path.join(self.out_dir, 'out.parquet')
+
+        Exporter(self.model, chunk_size=2).run(path)
+
+        table = pq.read_table(path)
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(sorted(table.column('amount').to_pylist())[0], Decimal('100.10'))
+
+
+class TestCli(unittest.TestCase):
+    """Тесты консольных отчетов"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        model = FinanceModel(self.db_path)
+        try:
+            food_id = model.add_category("Еда", 'expense')
+            products_id = model.get_category_id_by_name("Продукты", 'expense')
+            model.move_category(products_id, food_id)
+            model.add_transaction(datetime(2024, 1, 2), Decimal('12.30'), products_id, "Хлеб", 'expense')
+            model.add_transaction(datetime(2024, 1, 3), 1000, None, "Аванс", 'income')
+            model.add_transaction(datetime(2024, 2, 1), 5, food_id, "Чай", 'expense')
+        finally:
+            model.close()
+
+    def tearDown(self):
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def run_cli(self, *args):
+        output = io.StringIO()
+        with patch('sys.stdout', output):
+            code = cli.main(list(args) + ['--db', self.db_path])
+        self.assertEqual(code, 0)
+        return output.getvalue()
+
+    def test_stats_json(self):
+        """Тест итогов за период в JSON"""
+        row = json.loads(self.run_cli('stats', '--from', '2024-01-01', '--to', '2024-01-31',
+                                      '--format', 'json'))
+        self.assertEqual(row['income'], 1000.0)
+        self.assertEqual(row['expense'], 12.3)
+        self.assertEqual(row['count'], 2)
+
+    def test_categories_csv(self):
+        """Тест свертки по категориям в CSV"""
+        rows = list(csv.DictReader(io.StringIO(self.run_cli('categories', '--format', 'csv'))))
+        totals = {row['category']: row['total'] for row in rows}
+        self.assertEqual(totals, {"Еда": '17.30', "Еда / Продукты": '12.30'})
+
+    def test_list_streams_rows(self):
+        """Тест списка операций порциями"""
+        lines = self.run_cli('list', '--format', 'json', '--chunk-size', '1').splitlines()
+        self.assertEqual([json.loads(line)['description'] for line in lines], ["Чай", "Аванс", "Хлеб"])
+
+        text = self.run_cli('list', '--to', '2024-01-02')
+        self.assertEqual(len(text.splitlines()), 2)
+        self.assertIn("12.30", text)
+
+    def test_no_tkinter(self):
+        """Тест запуска без tkinter"""
+        result = subprocess.run(
+            [sys.executable, '-c', "import sys, cli; cli.main(sys.argv[1:]); "
+                                   "sys.exit('tkinter' in sys.modules)",
+             'stats', '--db', self.db_path],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class TestServer(unittest.TestCase):
+    """Тесты HTTP/JSON API"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+        self.server = server.FinanceServer(self.db_path, port=0, readers=2)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result(5)
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.unlink(self.db_path + suffix)
+
+    def request(self, method, path, body=None, connection=None):
+        client = connection or http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+        client.request(method, path, body=None if body is None else json.dumps(body))
+        response = client.getresponse()
+        data = response.read()
+        if connection is None:
+            client.close()
+        return response.status, json.loads(data) if data else None
+
+    def test_add_page_and_statistics(self):
+        """Тест добавления, постраничного чтения и итогов"""
+        status, result = self.request('POST', '/transactions', {
+            'date': '2024-01-02', 'amount': '12.30', 'description': "Хлеб", 'type': 'expense'})
+        self.assertEqual(status, 201)
+        status, result = self.request('POST', '/transactions', [
+            {'date': '2024-01-03', 'amount': 1000, 'description': "Аванс", 'type': 'income'},
+            {'date': '2024-01-04', 'amount': 5, 'description': "Чай", 'type': 'expense'}])
+        self.assertEqual(len(result['ids']), 2)
+
+        # Несколько запросов по одному соединению (keep-alive)
+        client = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+        try:
+            _, first = self.request('GET', '/transactions?limit=2', connection=client)
+            _, second = self.request('GET', f"/transactions?limit=2&after={first['next']}",
+                                     connection=client)
+        finally:
+            client.close()
+        self.assertEqual([item['description'] for item in first['items'] + second['items']],
+                         ["Чай", "Аванс", "Хлеб"])
+        self.assertIsNone(second['next'])
+
+        _, stats = self.request('GET', '/statistics?from=2024-01-03')
+        self.assertEqual((stats['income'], stats['expense'], stats['total_count']), (1000.0, 5.0, 2))
+
+        _, found = self.request('GET', '/search?q=' + quote("хлеб"))
+        self.assertEqual([item['amount'] for item in found['items']], [12.3])
+
+    def test_errors(self):
+        """Тест ответов на неверные запросы"""
+        self.assertEqual(self.request('POST', '/transactions', {'date': 'вчера', 'amount': 1,
+                                                               'type': 'income'})[0], 400)
+        for amount in ("1e400", "99999999999999999", True):
+            self.assertEqual(self.request('POST', '/transactions', {
+                'date': '2024-01-02', 'amount': amount, 'type': 'income'})[0], 400)
+        self.assertEqual(self.request('GET', '/transactions?limit=0')[0], 400)
+        self.assertEqual(self.request('GET', '/transactions/999')[0], 404)
+        self.assertEqual(self.request('DELETE', '/transactions/999')[0], 404)
+        self.assertEqual(self.request('PUT', '/transactions')[0], 405)
+        self.assertEqual(self.request('GET', '/unknown')[0], 404)
+
+        for length in ('abc', '-5'):
+            client = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+            try:
+                client.putrequest('POST', '/transactions')
+                client.putheader('Content-Length', length)
+                client.endheaders()
+                self.assertEqual(client.getresponse().status, 400)
+            finally:
+                client.close()
+
+    def test_concurrent_writes_batched(self):
+        """Тест групповой записи параллельных добавлений"""
+        def add(number):
+            return self.request('POST', '/transactions', {
+                'date': '2024-02-01', 'amount': number + 1, 'description': str(number),
+                'type': 'income'})[0]
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            statuses = list(pool.map(add, range(200)))
+
+        self.assertEqual(set(statuses), {201})
+        self.assertEqual(self.server.batcher.rows, 200)
+        self.assertLessEqual(self.server.batcher.batches, 200)
+        _, stats = self.request('GET', '/statistics')
+        self.assertEqual(stats['total_count'], 200)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Тесты генератора журнала и сравнения прогонов"""
+
+    def test_generator_is_reproducible(self):
+        """Тест одинакового журнала при одинаковом seed"""
+        first = list(benchmark.generate_transactions(300, seed=7))
+        self.assertEqual(first, list(benchmark.generate_transactions(300, seed=7)))
+        self.assertNotEqual(first, list(benchmark.generate_transactions(300, seed=8)))
+        self.assertTrue(all(row[1] > 0 and row[4] in ('income', 'expense') for row in first))
+        self.assertTrue(all(row[0] <= benchmark.END_DATE.isoformat() for row in first))
+
+    def test_run_and_compare(self):
+        """Тест прогона без GUI и поиска регрессий"""
+        report = benchmark.run(sizes=(200,), seed=1, repeat=1, gui=False)
+        names = {(result['target'], result['name']) for result in report['results']}
+        self.assertIn(('FinanceModel', 'insert'), names)
+        self.assertIn(('Database', 'statistics_month'), names)
+
+        slower = {'results': [dict(result, median=result['median'] * 2)
+                              for result in report['results']]}
+        self.assertEqual(benchmark.compare(report, report), [])
+        self.assertEqual(len(benchmark.compare(slower, report)), len(report['results']))
+
 
 class TestAppLogic(unittest.TestCase):
     """Тесты бизнес-логики приложения"""
@@ -200,6 +1576,165 @@ class TestAppLogic(unittest.TestCase):
         with self.assertRaises(ValueError):
             datetime.strptime("15-01-2024", "%Y-%m-%d")
 
+    def test_opened_chart_loaded_at_once(self):
+        """Тест загрузки графика сразу после открытия, до отрисовки панели"""
+        from controller import FinanceController
+        from view import FinanceView
+
+        view = FinanceView.__new__(FinanceView)
+        view.chart = Mock()
+        view.chart.winfo_ismapped.return_value = False  # панель еще не отрисована
+        view.chart_shown = False
+        view.table_frame = None
+
+        controller = FinanceController.__new__(FinanceController)
+        controller.view = view
+        controller.executor = Mock()
+        controller.filter_dates = (datetime(2024, 1, 1), datetime(2024, 1, 31))
+
+        controller.toggle_chart()
+        self.assertTrue(view.chart_visible())
+        view.chart.pack.assert_called_once()
+        key, query = controller.executor.submit.call_args[0]
+        self.assertEqual(key, 'chart')
+
+        temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        temp_file.close()
+        model = FinanceModel(temp_file.name)
+        try:
+            products_id = model.get_category_id_by_name("Продукты", 'expense')
+            model.add_transaction(datetime(2024, 1, 5), 100, products_id, "Хлеб", 'expense')
+            bin_, points, categories = query(model)
+        finally:
+            model.close()
+            os.unlink(temp_file.name)
+        self.assertEqual(bin_, 'day')
+        self.assertEqual(len(points), 31)
+        self.assertEqual(categories, [("Продукты", Decimal('100.00'))])
+
+        controller.executor.reset_mock()
+        controller.toggle_chart()
+        self.assertFalse(view.chart_visible())
+        view.chart.pack_forget.assert_called_once()
+        controller.executor.submit.assert_not_called()
+
+
+class TestMigrations(unittest.TestCase):
+    """Тесты миграций схемы"""
+
+    def setUp(self):
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_file.close()
+        self.db_path = self.temp_file.name
+
+    def tearDown(self):
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+
+    def get_indexes(self, connection):
+        cursor = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='transactions'"
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    def test_new_database_is_current(self):
+        """Тест версии схемы и индексов новой базы"""
+        model = FinanceModel(self.db_path)
+        try:
+            self.assertEqual(migrations.get_schema_version(model.connection),
+                             migrations.SCHEMA_VERSION)
+            indexes = self.get_indexes(model.connection)
+            self.assertIn('idx_transactions_date', indexes)
+            self.assertIn('idx_transactions_type_date_amount', indexes)
+            self.assertIn('idx_transactions_category_date', indexes)
+        finally:
+            model.close()
+
+    def test_existing_hierarchy_gets_closure_table(self):
+        """Тест заполнения таблицы замыкания по уже заданным parent_id"""
+        db = Database(self.db_path)
+        db.close()
+        connection = sqlite3.connect(self.db_path)
+        connection.execute(f"DELETE FROM {categories.TREE_TABLE}")
+        connection.execute("INSERT INTO categories (id, name, type) VALUES (100, 'Дом', 'expense')")
+        connection.execute("INSERT INTO categories (id, name, type, parent_id) "
+                           "VALUES (101, 'Ремонт', 'expense', 100)")
+        connection.execute("INSERT INTO categories (id, name, type, parent_id) "
+                           "VALUES (102, 'Краска', 'expense', 101)")
+        connection.execute("PRAGMA user_version = 4")
+        connection.commit()
+        connection.close()
+
+        model = FinanceModel(self.db_path)
+        try:
+            self.assertEqual(model.categories.ancestors(102), (101, 100))
+            self.assertEqual(model.categories.level(100), 0)
+        finally:
+            model.close()
+
+    def test_legacy_database_upgraded(self):
+        """Тест обновления существующей базы без версии"""
+        connection = sqlite3.connect(self.db_path)
+        connection.execute('''CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              name TEXT NOT NULL, type TEXT NOT NULL)''')
+        connection.execute('''CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              date TEXT NOT NULL, amount REAL NOT NULL, category_id INTEGER,
+                              description TEXT, type TEXT NOT NULL)''')
+        connection.execute("INSERT INTO transactions (date, amount, description, type) "
+                           "VALUES ('2024-01-01', 10, 'Кэшбэк', 'income')")
+        connection.commit()
+        connection.close()
+
+        db = Database(self.db_path)
+        try:
+            self.assertEqual(migrations.get_schema_version(db.connection),
+                             migrations.SCHEMA_VERSION)
+            self.assertIn('idx_transactions_date', self.get_indexes(db.connection))
+            self.assertEqual(len(db.get_transactions()), 1)
+            self.assertEqual(db.get_statistics()['income'], 10)
+            self.assertEqual(db.connection.execute(
+                "SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH 'кэшбэк'").fetchall(), [(1,)])
+        finally:
+            db.close()
+
+    def test_amounts_converted_to_minor_units(self):
+        """Тест перевода сумм REAL в копейки с сохранением счетчика id"""
+        connection = sqlite3.connect(self.db_path)
+        connection.execute('''CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              date TEXT NOT NULL, amount REAL NOT NULL, category_id INTEGER,
+                              description TEXT, type TEXT NOT NULL)''')
+        connection.executemany("INSERT INTO transactions (date, amount, type) VALUES (?, ?, ?)",
+                               [('2024-01-01', 0.29, 'income'), ('2024-01-02', 1500.5, 'expense'),
+                                ('2024-01-03', 7, 'income')])
+        connection.execute("DELETE FROM transactions WHERE id = 3")
+        connection.commit()
+        connection.close()
+
+        model = FinanceModel(self.db_path)
+        try:
+            stored = model.connection.execute(
+                "SELECT amount, typeof(amount) FROM transactions ORDER BY id").fetchall()
+            self.assertEqual(stored, [(29, 'integer'), (150050, 'integer')])
+
+            stats = model.get_statistics()
+            self.assertEqual(stats['income'], Decimal('0.29'))
+            self.assertEqual(stats['balance'], Decimal('-1500.21'))
+            self.assertEqual(model.add_transaction(datetime(2024, 2, 1), 1, None, 'a', 'income'), 4)
+        finally:
+            model.close()
+
+    def test_warm_start_skips_ddl(self):
+        """Тест пропуска DDL при актуальной схеме"""
+        FinanceModel(self.db_path).close()
+
+        with patch('migrations.migrate') as migrate, \
+                patch.object(FinanceModel, 'create_default_categories') as defaults:
+            model = FinanceModel(self.db_path)
+            model.close()
+
+        migrate.assert_not_called()
+        defaults.assert_not_called()
+
 
 def run_tests():
     """Запуск всех тестов"""
@@ -209,7 +1744,23 @@ def run_tests():
     # Добавляем тесты
     suite = unittest.TestSuite()
     suite.addTests(loader.loadTestsFromTestCase(TestDatabase))
+    suite.addTests(loader.loadTestsFromTestCase(TestFinanceModel))
+    suite.addTests(loader.loadTestsFromTestCase(TestPager))
+    suite.addTests(loader.loadTestsFromTestCase(TestQueryExecutor))
+    suite.addTests(loader.loadTestsFromTestCase(TestConnections))
+    suite.addTests(loader.loadTestsFromTestCase(TestInstrumentation))
+    suite.addTests(loader.loadTestsFromTestCase(TestSearch))
+    suite.addTests(loader.loadTestsFromTestCase(TestPartitions))
+    suite.addTests(loader.loadTestsFromTestCase(TestAggregates))
+    suite.addTests(loader.loadTestsFromTestCase(TestSeries))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnalytics))
+    suite.addTests(loader.loadTestsFromTestCase(TestImporter))
+    suite.addTests(loader.loadTestsFromTestCase(TestExport))
+    suite.addTests(loader.loadTestsFromTestCase(TestCli))
+    suite.addTests(loader.loadTestsFromTestCase(TestServer))
+    suite.addTests(loader.loadTestsFromTestCase(TestBenchmark))
     suite.addTests(loader.loadTestsFromTestCase(TestAppLogic))
+    suite.addTests(loader.loadTestsFromTestCase(TestMigrations))
 
     # Запускаем тесты
     runner = unittest.TextTestRunner(verbosity=2)
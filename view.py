@@ -2,6 +2,21 @@ import tkinter as tk
 from tkinter import ttk
 from datetime import datetime, timedelta
 
+from money import format_minor
+
+# Виртуальная таблица: запас строк за пределами видимой области,
+# шаг прокрутки колесом и размеры строки/заголовка по умолчанию
+OVERSCAN = 20
+WHEEL_STEP = 3
+ROW_HEIGHT = 20
+HEADING_HEIGHT = 25
+
+# Пауза после ввода в поле поиска перед запросом, мс
+SEARCH_DELAY = 300
+
+# Пауза после изменения дат фильтра перед запросом, мс
+FILTER_DELAY = 500
+
 
 class FinanceView:
     def __init__(self, root):
@@ -38,6 +53,20 @@ class FinanceView:
         self.refresh_button = ttk.Button(control_frame, text="Обновить")
         self.refresh_button.pack(side='left', padx=5)
 
+        self.import_button = ttk.Button(control_frame, text="Импорт CSV")
+        self.import_button.pack(side='left', padx=5)
+
+        self.export_button = ttk.Button(control_frame, text="Экспорт")
+        self.export_button.pack(side='left', padx=5)
+
+        # График создается при первом открытии
+        self.chart_button = ttk.Button(control_frame, text="График")
+        self.chart_button.pack(side='left', padx=5)
+        self.chart = None
+        # winfo_ismapped() становится True только после отрисовки, поэтому
+        # открытость панели хранится отдельно
+        self.chart_shown = False
+
         # Фильтры
         filter_frame = ttk.LabelFrame(control_frame, text="Фильтры", padding="5")
         filter_frame.pack(side='left', padx=20)
@@ -54,12 +83,36 @@ class FinanceView:
 
         self.filter_button = ttk.Button(filter_frame, text="Применить фильтр")
         self.filter_button.pack(side='left', padx=5)
+        self._filter_job = None
+        self._on_filter = None
+
+        # Поиск по описанию: запрос уходит после паузы во вводе
+        ttk.Label(filter_frame, text="Поиск:").pack(side='left', padx=(10, 0))
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=20)
+        self.search_entry.pack(side='left', padx=5)
+        self._search_job = None
+        self._on_search = None
+
+        # Строка состояния: сообщения слева, время последнего обновления справа
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side='bottom', fill='x')
+
+        self.status_label = ttk.Label(status_frame, text="", anchor='w', padding=(10, 2))
+        self.status_label.pack(side='left', fill='x', expand=True)
+
+        self.timing_label = ttk.Label(status_frame, text="", anchor='e', padding=(10, 2),
+                                      foreground='gray')
+        self.timing_label.pack(side='right')
+
+        self.loading_label = ttk.Label(filter_frame, text="", foreground='gray')
+        self.loading_label.pack(side='right', padx=5)
 
         # Таблица транзакций
-        table_frame = ttk.Frame(self.root)
-        table_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        self.table_frame = ttk.Frame(self.root)
+        self.table_frame.pack(fill='both', expand=True, padx=10, pady=5)
 
-        self.create_transactions_table(table_frame)
+        self.create_transactions_table(self.table_frame)
 
     def create_transactions_table(self, parent):
         columns = ('id', 'date', 'amount', 'category', 'description', 'type')
@@ -80,11 +133,26 @@ class FinanceView:
         self.tree.column('type', width=80)
 
         # Прокрутка
-        scrollbar = ttk.Scrollbar(parent, orient='vertical', command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(parent, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
 
         self.tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.tree.tag_configure('income', foreground='green')
+        self.tree.tag_configure('expense', foreground='red')
+
+        # Виртуальный режим: в дереве только видимое окно строк
+        self.virtual_total = 0
+        self.virtual_offset = 0
+        self._fetch_rows = None
+        self._window_start = 0
+        self._window_keys = []
+        self._render_pending = False
+
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.tree.bind(sequence, self._on_mouse_wheel)
+        self.tree.bind('<Configure>', lambda e: self._schedule_render())
 
         # Контекстное меню
         self.context_menu = tk.Menu(self.root, tearoff=0)
@@ -99,30 +167,198 @@ class FinanceView:
 
     def load_transactions(self, transactions):
         """Загрузка транзакций в таблицу"""
+        # Обычный режим: все строки в дереве, прокрутка средствами Treeview
+        self._fetch_rows = None
+        self.scrollbar.config(command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+
         # Очистка таблицы
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.tree.delete(*self.tree.get_children())
 
         # Загрузка данных
         for row in transactions:
-            id_, date_str, amount, category_id, description, type_ = row
-
-            tags = ('income',) if type_ == 'income' else ('expense',)
-
-            self.tree.insert('', 'end',
-                             values=(
-                                 id_,
-                                 date_str,
-                                 f"{amount:.2f} ₽",
-                                 category_id,  # Будет заменено контроллером
-                                 description,
-                                 "Доход" if type_ == 'income' else "Расход"
-                             ),
-                             tags=tags
-                             )
-
-        self.tree.tag_configure('income', foreground='green')
-        self.tree.tag_configure('expense', foreground='red')
+            values, tags = self._format_row(row)
+            self.tree.insert('', 'end', values=values, tags=tags)
+
+    def load_virtual(self, total, fetch_rows):
+        """Загрузка таблицы в виртуальном режиме
+
+        fetch_rows(offset, count) возвращает строки результата по номеру,
+        в дереве хранятся только видимые строки и запас OVERSCAN сверху и снизу.
+        """
+        self.virtual_total = total
+        self.virtual_offset = 0
+        self._fetch_rows = fetch_rows
+        self.scrollbar.config(command=self._on_scrollbar)
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+
+        self.tree.delete(*self.tree.get_children())
+        self._render_window()
+
+    def _format_row(self, row):
+        """Значения и теги строки таблицы
+
+        Строка уже готова к показу (см. get_display_transactions_page), кроме
+        суммы в копейках - она форматируется здесь. Последний элемент - тип
+        операции для цвета строки.
+        """
+        return row[:2] + (format_minor(row[2]),) + row[3:6], (row[6],)
+
+    def _visible_rows(self):
+        """Количество строк, помещающихся в таблицу"""
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return int(self.tree.cget('height'))
+
+        rowheight = ttk.Style().lookup('Treeview', 'rowheight') or ROW_HEIGHT
+        return max(1, (height - HEADING_HEIGHT) // int(rowheight))
+
+    def _render_window(self):
+        """Отрисовка окна строк вокруг текущей позиции"""
+        self._render_pending = False
+        if self._fetch_rows is None:
+            return
+
+        visible = self._visible_rows()
+        self.virtual_offset = max(0, min(self.virtual_offset, self.virtual_total - visible))
+        start = max(0, self.virtual_offset - OVERSCAN)
+        rows = self._fetch_rows(start, self.virtual_offset - start + visible + OVERSCAN)
+
+        # Строки, уже находящиеся в дереве, не пересоздаются: порядок
+        # сортировки общий, поэтому новые вставляются на свои позиции
+        wanted = [str(row[0]) for row in rows]
+        wanted_set = set(wanted)
+        stale = [iid for iid in self.tree.get_children() if iid not in wanted_set]
+        if stale:
+            self.tree.delete(*stale)
+
+        for index, row in enumerate(rows):
+            if not self.tree.exists(wanted[index]):
+                values, tags = self._format_row(row)
+                self.tree.insert('', index, iid=wanted[index], values=values, tags=tags)
+
+        self._window_start = start
+        self._window_keys = [(row[1], row[0]) for row in rows]
+        self._scroll_to_offset()
+        self._update_scrollbar(visible)
+
+    def insert_row(self, row):
+        """Вставка одной новой строки на ее место в сортировке (date, id)"""
+        if self._fetch_rows is None:
+            return
+
+        key = (row[1], row[0])
+        keys = self._window_keys
+        total = self.virtual_total
+        self.virtual_total += 1
+
+        if keys and key > keys[0] and self._window_start > 0:
+            # Выше окна: видимые строки не меняются, сдвигается только позиция
+            self._window_start += 1
+            self.virtual_offset += 1
+        elif not keys or key > keys[-1] or self._window_start + len(keys) == total:
+            index = sum(1 for window_key in keys if window_key > key)
+            values, tags = self._format_row(row)
+            self.tree.insert('', index, iid=str(row[0]), values=values, tags=tags)
+            keys.insert(index, key)
+            if index < self.virtual_offset - self._window_start:
+                self.virtual_offset += 1
+
+            # Окно не растет: лишняя нижняя строка убирается
+            if len(keys) > self._window_limit():
+                self.tree.delete(str(keys.pop()[1]))
+            self._scroll_to_offset()
+
+        self._update_scrollbar(self._visible_rows())
+
+    def delete_row(self, key):
+        """Удаление одной строки с ключом (date, id)"""
+        if self._fetch_rows is None:
+            return
+
+        keys = self._window_keys
+        self.virtual_total -= 1
+        iid = str(key[1])
+
+        if self.tree.exists(iid):
+            index = self.tree.index(iid)
+            self.tree.delete(iid)
+            keys.pop(index)
+            if index < self.virtual_offset - self._window_start:
+                self.virtual_offset -= 1
+
+            # Окно дополняется одной строкой снизу, если она уже в кэше;
+            # иначе страница заказывается и окно перерисуется по ее приходу
+            following = self._window_start + len(keys)
+            if following < self.virtual_total:
+                for row in self._fetch_rows(following, 1):
+                    values, tags = self._format_row(row)
+                    self.tree.insert('', 'end', iid=str(row[0]), values=values, tags=tags)
+                    keys.append((row[1], row[0]))
+            self._scroll_to_offset()
+        elif keys and key > keys[0]:
+            self._window_start -= 1
+            self.virtual_offset -= 1
+
+        self._update_scrollbar(self._visible_rows())
+
+    def _window_limit(self):
+        """Наибольший размер окна строк"""
+        return self._visible_rows() + 2 * OVERSCAN
+
+    def _scroll_to_offset(self):
+        """Прокрутка дерева так, чтобы строка virtual_offset была первой"""
+        if self._window_keys:
+            self.tree.yview_moveto((self.virtual_offset - self._window_start) / len(self._window_keys))
+
+    def refresh_rows(self):
+        """Перерисовка окна строк, например после фоновой подгрузки страниц"""
+        self._schedule_render()
+
+    def _schedule_render(self):
+        if self._fetch_rows is not None and not self._render_pending:
+            self._render_pending = True
+            self.root.after_idle(self._render_window)
+
+    def _update_scrollbar(self, visible):
+        """Положение ползунка пропорционально всему результату"""
+        if self.virtual_total:
+            first = self.virtual_offset / self.virtual_total
+            last = min(1.0, (self.virtual_offset + visible) / self.virtual_total)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.virtual_offset = int(float(args[1]) * self.virtual_total)
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self._visible_rows()
+            self.virtual_offset += step
+        self._render_window()
+
+    def _on_mouse_wheel(self, event):
+        if self._fetch_rows is None:
+            return None
+
+        if event.num == 4 or event.delta > 0:
+            self.virtual_offset -= WHEEL_STEP
+        else:
+            self.virtual_offset += WHEEL_STEP
+        self._render_window()
+        return 'break'
+
+    def _on_tree_scroll(self, first, last):
+        """Прокрутка внутри окна (клавиатура) сдвигает позицию"""
+        if not self._window_keys:
+            return
+
+        offset = self._window_start + round(float(first) * len(self._window_keys))
+        if offset != self.virtual_offset:
+            self.virtual_offset = offset
+            self._schedule_render()
 
     def update_statistics(self, stats):
         """Обновление статистики"""
@@ -133,6 +369,93 @@ class FinanceView:
         self.income_label.config(text=f"Доходы: {stats['income']:.2f} ₽")
         self.expense_label.config(text=f"Расходы: {stats['expense']:.2f} ₽")
 
+    def set_status(self, text):
+        """Вывод сообщения в строке состояния"""
+        self.status_label.config(text=text)
+        self.root.update_idletasks()
+
+    def bind_search(self, callback):
+        """callback(text) вызывается после паузы во вводе поискового текста"""
+        self._on_search = callback
+        self.search_var.trace_add('write', lambda *args: self._schedule_search())
+        self.search_entry.bind('<Return>', lambda e: self._run_search())
+
+    def _schedule_search(self):
+        # Каждое нажатие откладывает запрос: уходит только последний текст
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DELAY, self._run_search)
+
+    def _run_search(self):
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+            self._search_job = None
+        if self._on_search:
+            self._on_search(self.get_search_text())
+
+    def bind_filter(self, callback):
+        """callback(final) - применение фильтра дат
+
+        Кнопка и Enter применяют фильтр сразу (final=True), ввод дат -
+        после паузы (final=False: неполная дата не считается ошибкой).
+        """
+        self._on_filter = callback
+        self.filter_button.config(command=lambda: self._run_filter(True))
+        for entry in (self.start_date_entry, self.end_date_entry):
+            entry.bind('<KeyRelease>', self._schedule_filter)
+            entry.bind('<Return>', lambda e: self._run_filter(True))
+
+    def _schedule_filter(self, event=None):
+        if event is not None and event.keysym == 'Return':
+            return
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(FILTER_DELAY, lambda: self._run_filter(False))
+
+    def _run_filter(self, final):
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+            self._filter_job = None
+        if self._on_filter:
+            self._on_filter(final)
+
+    def get_search_text(self):
+        return self.search_var.get().strip()
+
+    def set_timing(self, query_ms, render_ms):
+        """Время последнего обновления: запросы и отрисовка"""
+        self.timing_label.config(text=f"Запросы: {query_ms:.1f} мс, отрисовка: {render_ms:.1f} мс")
+
+    def set_startup_timing(self, frame_ms, data_ms):
+        """Время запуска: до первого кадра и до первых данных"""
+        frame = f"{frame_ms:.0f} мс" if frame_ms is not None else "-"
+        self.timing_label.config(text=f"Запуск: окно {frame}, данные {data_ms:.0f} мс")
+
+    def toggle_chart(self):
+        """Показ и скрытие панели графика, возвращает True, если она открыта"""
+        if self.chart is None:
+            from chart import ChartPanel
+            self.chart = ChartPanel(self.root)
+        if self.chart_shown:
+            self.chart.pack_forget()
+        else:
+            self.chart.pack(fill='x', padx=10, pady=5, before=self.table_frame)
+        self.chart_shown = not self.chart_shown
+        return self.chart_shown
+
+    def chart_visible(self):
+        return self.chart_shown
+
+    def show_chart(self, bin_, points, categories):
+        """Ряд доходов и расходов и итоги категорий расходов"""
+        if self.chart is not None:
+            self.chart.show(bin_, points, categories)
+
+    def set_loading(self, loading):
+        """Индикатор выполнения фоновых запросов"""
+        self.loading_label.config(text="Загрузка..." if loading else "")
+        self.root.config(cursor='watch' if loading else '')
+
     def get_selected_transaction_id(self):
         """Получение ID выбранной транзакции"""
         selected = self.tree.selection()
@@ -155,12 +478,4 @@ class FinanceView:
 
             return start_date, end_date
         except ValueError:
-            return None, None
-
-    def update_category_names(self, category_map):
-        """Обновление названий категорий в таблице"""
-        for item in self.tree.get_children():
-            values = list(self.tree.item(item)['values'])
-            category_id = values[3]
-            values[3] = category_map.get(category_id, "Неизвестная категория")
-            self.tree.item(item, values=values)
\ No newline at end of file
+            return None, None
\ No newline at end of file
@@ -0,0 +1,148 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, List, Optional
+
+from model import FinanceModel
+
+# Период опроса готовых результатов из потока Tk, мс
+POLL_INTERVAL = 30
+
+
+class _Task:
+    def __init__(self, future, key, generation, on_done, on_error):
+        self.future = future
+        self.key = key
+        self.generation = generation
+        self.on_done = on_done
+        self.on_error = on_error
+
+
+class QueryExecutor:
+    """Выполнение вызовов модели в фоновом потоке
+
+    У фонового потока своя FinanceModel со своим соединением SQLite.
+    Результаты передаются в поток Tk опросом через root.after, поэтому
+    обработчики on_done/on_error вызываются только в главном потоке.
+    Задачи с одинаковым key вытесняют друг друга: ожидающие отменяются,
+    а выполняемая прерывается через Connection.interrupt() и ее результат
+    (ошибка "interrupted") отбрасывается.
+    """
+
+    def __init__(self, root, db_name: str = 'finance.db',
+                 poll_interval: int = POLL_INTERVAL,
+                 on_busy: Optional[Callable[[bool], None]] = None,
+                 on_model: Optional[Callable[[FinanceModel], None]] = None,
+                 read_only: bool = False):
+        self.root = root
+        self.db_name = db_name
+        # read_only - модель потока только читает (отчеты, выгрузка)
+        self.read_only = read_only
+        self.poll_interval = poll_interval
+        self.on_busy = on_busy
+        # Настройка модели потока после создания (например, замеры запросов)
+        self.on_model = on_model
+        self._local = threading.local()
+        self._tasks: List[_Task] = []
+        self._generations = {}
+        # Выполняемая задача: (key, соединение потока) - для прерывания
+        self._lock = threading.Lock()
+        self._running = None
+        self.interrupted = 0
+        self._polling = False
+        # Один поток: записи SQLite все равно выполняются последовательно,
+        # а порядок задач сохраняется
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='finance-db')
+
+    def submit(self, key: Optional[Hashable], func: Callable, *args,
+               on_done: Optional[Callable] = None,
+               on_error: Optional[Callable[[Exception], None]] = None):
+        """Запуск func(model, *args) в фоне
+
+        key=None - задача не вытесняется (например, запись).
+        """
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            if key is not None:
+                self._generations[key] = generation
+                for task in self._tasks:
+                    if task.key == key:
+                        task.future.cancel()
+                self._interrupt(key)
+
+        future = self._executor.submit(self._run, key, generation, func, args)
+        self._tasks.append(_Task(future, key, generation, on_done, on_error))
+
+        if self.on_busy:
+            self.on_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def is_current(self, key: Hashable, generation: int) -> bool:
+        return key is None or self._generations.get(key) == generation
+
+    def pending(self, key: Hashable) -> bool:
+        """Есть ли невыполненная задача с таким ключом"""
+        return any(task.key == key and not task.future.done() for task in self._tasks)
+
+    def shutdown(self):
+        """Отмена ожидающих задач и закрытие соединения потока"""
+        for task in self._tasks:
+            task.future.cancel()
+        self._tasks.clear()
+        self._executor.submit(self._close_model)
+        self._executor.shutdown(wait=True)
+
+    def _model(self) -> FinanceModel:
+        model = getattr(self._local, 'model', None)
+        if model is None:
+            model = self._local.model = FinanceModel(self.db_name, read_only=self.read_only)
+            if self.on_model:
+                self.on_model(model)
+        return model
+
+    def _run(self, key, generation, func, args):
+        model = self._model()
+        with self._lock:
+            # Задача могла устареть, пока ждала очереди
+            if not self.is_current(key, generation):
+                return None
+            self._running = (key, model.connection)
+        try:
+            return func(model, *args)
+        finally:
+            with self._lock:
+                self._running = None
+
+    def _interrupt(self, key: Hashable):
+        # Вызывается под self._lock: задача не может смениться во время прерывания
+        if self._running is not None and self._running[0] == key:
+            self._running[1].interrupt()
+            self.interrupted += 1
+
+    def _close_model(self):
+        model = getattr(self._local, 'model', None)
+        if model is not None:
+            model.close()
+            self._local.model = None
+
+    def _poll(self):
+        finished = [task for task in self._tasks if task.future.done()]
+        for task in finished:
+            self._tasks.remove(task)
+            if task.future.cancelled() or not self.is_current(task.key, task.generation):
+                continue
+
+            error = task.future.exception()
+            if error is not None:
+                if task.on_error:
+                    task.on_error(error)
+            elif task.on_done:
+                task.on_done(task.future.result())
+
+        if self._tasks:
+            self.root.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
+            if self.on_busy:
+                self.on_busy(False)